@@ -2,26 +2,26 @@
 """
 Agent 4: 공정 변수와 가이드워드를 결합하여 이탈 시나리오 생성 (개선 버전 v3)
 CSV 데이터베이스의 전문 failure scenarios를 참고하여 고품질 deviation 생성
-+ 확률 기반 분석 및 시각화 기능 추가
++ 확률 기반 분석 (그래프는 render_probability_charts.py에서 후처리)
 """
 
 # 공통 유틸리티 및 설정
 from config import config
 from hazop_utils import (
     read_txt,
-    call_openai_api,
+    call_openai_json,
     create_text_payload,
     write_txt,
     get_output_path
 )
+from prompt_budget import estimate_prompt_tokens, fit_items
+from prompt_encoding import encode_records
+from guideword_matrix import GUIDEWORDS, load_matrix, combinations, is_applicable
 import json
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # GUI 없이 그래프 생성
-import requests
 import math
+from concurrent.futures import ThreadPoolExecutor
 
 # 환경변수에서 대상 노드 번호 읽기 (기본값: 1)
 target_node = int(os.getenv('TARGET_NODE', '1'))
@@ -67,7 +67,16 @@ except Exception as e:
     print(f"[ERROR] Agent3 JSON 파싱 실패: {e}")
     exit(1)
 
+
+def render_csv_scenarios(entries):
+    """CSV 시나리오 항목들을 프롬프트 섹션으로 변환"""
+    if not entries:
+        return ""
+    return "\n\n## 전문 Failure Scenarios 데이터베이스 (참고용)\n\n" + "".join(text for _, text in entries)
+
+
 # CSV 데이터베이스 로드 (전문 failure scenarios)
+csv_entries = []  # (Operational Deviations, 프롬프트 텍스트)
 csv_scenarios = ""
 try:
     csv_path = config.CSV_SCENARIOS_PATH
@@ -76,13 +85,13 @@ try:
         print(f"[INFO] CSV 데이터베이스 로드: {len(df)}개 시나리오")
 
         # CSV 데이터를 텍스트로 변환 (LLM이 참고할 수 있도록)
-        csv_scenarios = "\n\n## 전문 Failure Scenarios 데이터베이스 (참고용)\n\n"
         for idx, row in df.iterrows():
-            csv_scenarios += f"**{row['Operational Deviations']}**\n"
-            csv_scenarios += f"- Scenario: {row['Failure Scenarios']}\n"
+            entry = f"**{row['Operational Deviations']}**\n"
+            entry += f"- Scenario: {row['Failure Scenarios']}\n"
             if pd.notna(row.get('Inherently Safer/Passive')):
-                csv_scenarios += f"- Safeguards: {row['Inherently Safer/Passive']}\n"
-            csv_scenarios += "\n"
+                entry += f"- Safeguards: {row['Inherently Safer/Passive']}\n"
+            csv_entries.append((str(row['Operational Deviations']), entry + "\n"))
+        csv_scenarios = render_csv_scenarios(csv_entries)
     else:
         print(f"[WARNING] CSV 파일을 찾을 수 없습니다: {csv_path}")
         print(f"[WARNING] 기본 deviation 생성 모드로 진행합니다.")
@@ -90,8 +99,17 @@ except Exception as e:
     print(f"[WARNING] CSV 로드 실패: {e}")
     print(f"[WARNING] 기본 deviation 생성 모드로 진행합니다.")
 
-# 가이드워드 정의
-guidewords = ['None', 'More', 'Less', 'As well as', 'Other than', 'Part of', 'Reverse']
+# 가이드워드 정의 및 적용 가능 행렬 (행렬 비활성화 시 모든 조합)
+guidewords = GUIDEWORDS
+guideword_matrix = load_matrix() if config.GUIDEWORD_MATRIX_ENABLED else {'*': list(guidewords)}
+parameter_combinations = combinations(parameters, guideword_matrix)
+combination_count = sum(len(g) for _, g in parameter_combinations)
+if combination_count < len(parameters) * len(guidewords):
+    print(f"[INFO] 가이드워드 행렬 적용: {combination_count}/{len(parameters) * len(guidewords)}개 조합 검토")
+parameters = [parameter for parameter, _ in parameter_combinations]
+if not parameters:
+    print("[ERROR] 가이드워드 행렬에서 적용 가능한 조합이 없습니다.")
+    exit(1)
 
 # System Prompt (개선됨)
 system_prompt = """당신은 HAZOP deviation 시나리오 생성 전문가입니다.
@@ -128,22 +146,13 @@ system_prompt = """당신은 HAZOP deviation 시나리오 생성 전문가입니
 - description은 2-3문장으로 구체적인 시나리오 작성
 """
 
-# User Prompt (개선됨)
-user_text = f"""
-다음 공정 변수들에 대해 전문가 수준의 HAZOP deviation을 생성하세요.
-
-## 노드 정보
-- Node {target_node}: {node_name}
-- 설계 의도: {target_node_data.get('design_intent', '')}
-- 장비: {', '.join(target_node_data.get('equipment_tags', []))}
-- 계기: {', '.join(target_node_data.get('instrument_tags', []))}
-
+# 공통 지시 (모든 노드/변수 그룹에서 동일, 시스템 프롬프트와 함께 프롬프트 캐시되는 앞부분)
+def build_shared_text():
+    """공정 개요, 가이드워드, CSV 시나리오, 출력 형식 (csv_scenarios 확정 후 호출)"""
+    return f"""
 ## 공정 개요
 {config.HAZOP_OBJECT}
 
-## 공정 변수
-{', '.join(parameters)}
-
 ## 가이드워드
 {', '.join(guidewords)}
 
@@ -152,27 +161,34 @@ user_text = f"""
 ## JSON 출력 형식
 
 {{
-  "node_id": {target_node},
-  "node_name": "{node_name}",
+  "node_id": 1,
+  "node_name": "노드명",
   "deviations": [
     {{
       "parameter": "Flow",
       "guideword": "None",
       "deviation": "유량 없음 (No Flow)",
-      "description": "가스 공급원 차단 또는 BL-1101 블로워 정지로 인한 유량 완전 차단. 하류 공정 중단 및 압력 강하 발생"
+      "description": "가스 공급원 차단 또는 BL-1101 블로워 정지로 인한 유량 완전 차단. 하류 공정 중단 및 압력 강하 발생",
+      "probability_score": 6
     }},
     {{
       "parameter": "Pressure",
       "guideword": "More",
       "deviation": "압력 증가 (High Pressure / Overpressure)",
-      "description": "하류 밸브 폐쇄 또는 D-1101 제습장치 출구 막힘으로 인해 설계 압력 0.3 bar.g 초과. 배관 및 장비 과압으로 안전밸브 작동 가능"
+      "description": "하류 밸브 폐쇄 또는 D-1101 제습장치 출구 막힘으로 인해 설계 압력 0.3 bar.g 초과. 배관 및 장비 과압으로 안전밸브 작동 가능",
+      "probability_score": 7
     }}
   ]
 }}
 
+## 발생 가능성 점수 (probability_score, 1-10 정수)
+1-3: 발생 가능성 매우 낮음 (극히 드문 상황)
+4-6: 발생 가능성 보통 (일반적인 고장 상황)
+7-10: 발생 가능성 높음 (흔한 고장, 운전 오류)
+
 ## 주의사항
-1. 각 변수에 대해 가능한 모든 가이드워드 조합을 검토
-2. 적용 불가능한 조합은 제외 (예: Reverse Flow가 물리적으로 불가능한 경우)
+1. 공정 변수별로 제시된 가이드워드 조합만 검토 (제시되지 않은 조합은 생성하지 않음)
+2. 제시된 조합 중에서도 이 노드에서 적용 불가능한 조합은 제외 (예: Reverse Flow가 물리적으로 불가능한 경우)
 3. deviation은 영문 표준 용어 포함 (예: No Flow, High Pressure, Overpressure)
 4. description은 **반드시 구체적인 원인과 결과를 포함**:
    - 어떤 장비 고장/오작동으로 인해 (원인)
@@ -180,38 +196,249 @@ user_text = f"""
    - 어떤 영향이 있는지 (결과)
 5. 제공된 전문 Failure Scenarios를 참고하여 산업 표준 수준으로 작성
 6. 노드의 장비 태그를 적극 활용
+7. 모든 deviation에 probability_score (1-10 정수)를 반드시 포함
+"""
+
+
+def render_combinations(param_group):
+    """변수별 적용 가능한 가이드워드 목록"""
+    return '\n'.join(f"- {parameter}: {', '.join(gws)}"
+                     for parameter, gws in parameter_combinations if parameter in param_group)
 
-모든 변수에 대해 가능한 deviation을 JSON으로 출력하세요.
+
+# User Prompt (노드/변수 그룹별 내용, 마지막에 배치)
+def build_user_text(param_group):
+    """공정 변수 그룹에 대한 deviation 생성 프롬프트"""
+    return f"""
+다음 공정 변수들에 대해 전문가 수준의 HAZOP deviation을 생성하세요.
+
+## 노드 정보
+- Node {target_node}: {node_name}
+- 설계 의도: {target_node_data.get('design_intent', '')}
+- 장비: {', '.join(target_node_data.get('equipment_tags', []))}
+- 계기: {', '.join(target_node_data.get('instrument_tags', []))}
+
+## 공정 변수별 검토할 가이드워드
+{render_combinations(param_group)}
+
+위 조합에 대해 가능한 deviation을 위 JSON 형식으로 출력하세요.
+(node_id는 {target_node}, node_name은 "{node_name}")
 """
 
-# API 호출
-print(f"[INFO] Agent 4 실행 중: Node {target_node} deviation 생성...")
-print(f"[INFO] CSV 데이터베이스 참조 모드: {'활성화' if csv_scenarios else '비활성화'}")
-payload = create_text_payload(system_prompt, user_text)
-content = call_openai_api(payload)
 
-# 응답 출력
-print("\n" + "="*60)
-print(f"Agent 4 분석 결과 (Node {target_node})")
-print("="*60)
-print(content)
+# 토큰 예산: CSV 시나리오가 예산을 넘으면 노드의 공정 변수와 관련된 시나리오부터 남김
+if csv_entries:
+    csv_scenarios = ""  # 시나리오를 뺀 나머지 프롬프트 크기 측정
+    available = config.PROMPT_INPUT_TOKEN_BUDGET - estimate_prompt_tokens(
+        system_prompt, build_shared_text() + build_user_text(parameters))
+    lowered = [p.lower() for p in parameters]
+    ranked = sorted(csv_entries, key=lambda entry: not any(p in entry[0].lower() for p in lowered))
+    kept, dropped = fit_items(ranked, render_csv_scenarios, available)
+    if dropped:
+        print(f"[INFO] 토큰 예산 초과: CSV 시나리오 {len(kept)}개 사용, {dropped}개 제외 (공정 변수 관련 시나리오 우선)")
+        # 원래 CSV 순서 유지 (노드 간 공통 앞부분이 최대한 같도록)
+        csv_entries = [entry for entry in csv_entries if entry in kept]
+    csv_scenarios = render_csv_scenarios(csv_entries)
 
-# JSON 검증
-parsed_json = None
-deviations = []
-try:
+
+def parse_deviation_json(content):
+    """LLM 응답에서 deviation JSON 추출 (실패 시 json.JSONDecodeError)"""
     if "```json" in content:
         json_str = content.split("```json")[1].split("```")[0].strip()
     elif "```" in content:
         json_str = content.split("```")[1].split("```")[0].strip()
     else:
         json_str = content
+    return json.loads(json_str)
+
+
+def deviation_key(dev):
+    """중복 판정 키 (parameter, guideword, deviation)"""
+    return tuple(str(dev.get(k, '')).strip().lower() for k in ('parameter', 'guideword', 'deviation'))
+
+
+def normalize_probability_score(value):
+    """probability_score를 1-10 정수로 정규화 (유효하지 않으면 None)"""
+    try:
+        score = int(round(float(value)))
+    except (TypeError, ValueError):
+        return None
+    return score if 1 <= score <= 10 else None
+
+
+def score_missing_deviations(missing_deviations):
+    """
+    점수가 누락된 deviation만 deviation_id 기준으로 한 번에 재평가
+
+    Returns:
+        {deviation_id: probability_score} 딕셔너리
+    """
+    scoring_targets = [
+        {
+            'deviation_id': dev['deviation_id'],
+            'parameter': dev.get('parameter', ''),
+            'guideword': dev.get('guideword', ''),
+            'deviation': dev.get('deviation', '')
+        }
+        for dev in missing_deviations
+    ]
+
+    scoring_prompt = f"""
+다음 deviation들에 대해 발생 가능성을 1-10 점수로 평가하세요.
+
+## 노드 정보
+- Node {target_node}: {node_name}
+- 장비: {', '.join(target_node_data.get('equipment_tags', []))}
+
+## Deviations
+{encode_records(scoring_targets, config.PROMPT_ENCODING)}
+
+## 평가 기준
+1-3: 발생 가능성 매우 낮음 (극히 드문 상황)
+4-6: 발생 가능성 보통 (일반적인 고장 상황)
+7-10: 발생 가능성 높음 (흔한 고장, 운전 오류)
+
+## JSON 출력 형식
+{{
+  "scores": [
+    {{"deviation_id": 1, "probability_score": 7}}
+  ]
+}}
+
+모든 deviation_id에 대해 점수를 JSON으로 출력하세요.
+"""
 
-    parsed_json = json.loads(json_str)
+    payload = create_text_payload(
+        "당신은 HAZOP 전문가로서 deviation의 발생 가능성을 평가합니다.",
+        scoring_prompt,
+        schema='agent4_scores'
+    )
+    content, _ = call_openai_json(payload, 'agent4_scores')
+    scores_json = parse_deviation_json(content)
 
-    deviations = parsed_json.get("deviations", [])
+    scores = {}
+    for item in scores_json.get('scores', []):
+        score = normalize_probability_score(item.get('probability_score'))
+        if score is not None:
+            scores[int(item.get('deviation_id'))] = score
+    return scores
+
+
+def generate_deviations(param_group):
+    """공정 변수 그룹 하나에 대한 deviation 생성 API 호출"""
+    payload = create_text_payload(system_prompt, build_user_text(param_group), shared_text=shared_text,
+                                  schema='agent4')
+    content, _ = call_openai_json(payload, 'agent4')
+    return content
+
+
+shared_text = build_shared_text()
+
+# 공정 변수 그룹 분할 (AGENT4_PARAM_GROUP_SIZE > 0이면 그룹별 병렬 생성)
+group_size = config.AGENT4_PARAM_GROUP_SIZE
+if group_size > 0 and len(parameters) > group_size:
+    param_groups = [parameters[i:i + group_size] for i in range(0, len(parameters), group_size)]
+else:
+    param_groups = [parameters]
+
+# API 호출
+print(f"[INFO] Agent 4 실행 중: Node {target_node} deviation 생성...")
+print(f"[INFO] CSV 데이터베이스 참조 모드: {'활성화' if csv_scenarios else '비활성화'}")
+if len(param_groups) == 1:
+    contents = [generate_deviations(parameters)]
+else:
+    max_workers = max(1, min(config.AGENT4_MAX_WORKERS, len(param_groups)))
+    print(f"[INFO] 병렬 생성 모드: {len(param_groups)}개 변수 그룹, 동시 요청 {max_workers}개")
+    for i, group in enumerate(param_groups):
+        print(f"  - 그룹 {i+1}: {', '.join(group)}")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        contents = list(executor.map(generate_deviations, param_groups))
+
+# 응답 출력
+for i, group_content in enumerate(contents):
+    print("\n" + "="*60)
+    if len(contents) == 1:
+        print(f"Agent 4 분석 결과 (Node {target_node})")
+    else:
+        print(f"Agent 4 분석 결과 (Node {target_node}, 그룹 {i+1}/{len(contents)})")
+    print("="*60)
+    print(group_content)
+
+# JSON 파싱 (실패한 그룹은 새 요청으로 한 번 더 생성, 그래도 실패하면 일부 변수가 빠진 결과를 저장하지 않고 종료)
+group_jsons = []
+for i, group_content in enumerate(contents):
+    label = "" if len(contents) == 1 else f"그룹 {i+1} "
+    try:
+        group_jsons.append(parse_deviation_json(group_content))
+        continue
+    except json.JSONDecodeError as e:
+        print(f"[WARNING] {label}JSON 파싱 실패: {e} → 다시 생성")
+    contents[i] = generate_deviations(param_groups[i])
+    print(f"\n[INFO] {label}재생성 결과:\n{contents[i]}")
+    try:
+        group_jsons.append(parse_deviation_json(contents[i]))
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] {label}JSON 파싱 실패: {e}")
+        print(f"[ERROR] 공정 변수 {', '.join(param_groups[i])}의 deviation을 생성하지 못해 Node {target_node} 결과를 저장하지 않습니다.")
+        exit(1)
+
+# JSON 검증 (그룹 결과 병합 및 중복 제거)
+parsed_json = None
+deviations = []
+seen_keys = set()
+duplicate_count = 0
+excluded_count = 0
+for group_json in group_jsons:
+    if parsed_json is None:
+        parsed_json = group_json
+
+    for dev in group_json.get("deviations", []):
+        if not is_applicable(dev.get('parameter', ''), dev.get('guideword', ''), guideword_matrix):
+            excluded_count += 1
+            continue
+        key = deviation_key(dev)
+        if key in seen_keys:
+            duplicate_count += 1
+            continue
+        seen_keys.add(key)
+        deviations.append(dev)
+
+if parsed_json is not None:
+    # deviation_id 부여 및 probability_score 검증 (응답 내 구조화 필드)
+    deviations = [
+        {'deviation_id': i, **{k: v for k, v in dev.items() if k != 'deviation_id'}}
+        for i, dev in enumerate(deviations, 1)
+    ]
+    for dev in deviations:
+        score = normalize_probability_score(dev.get('probability_score'))
+        if score is None:
+            dev.pop('probability_score', None)
+        else:
+            dev['probability_score'] = score
+
+    # 누락된 점수만 ID 기반 단일 요청으로 보완
+    missing = [dev for dev in deviations if 'probability_score' not in dev]
+    if missing:
+        print(f"[WARNING] probability_score 누락: {len(missing)}개 → ID 기반 재평가 요청")
+        try:
+            scores = score_missing_deviations(missing)
+            for dev in missing:
+                if dev['deviation_id'] in scores:
+                    dev['probability_score'] = scores[dev['deviation_id']]
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
+            print(f"[WARNING] 확률 재평가 실패: {e}")
+
+        unscored = sum(1 for dev in deviations if 'probability_score' not in dev)
+        if unscored:
+            print(f"[WARNING] 점수 미할당 deviation {unscored}개 (확률 분석에서 제외)")
+
+    parsed_json["deviations"] = deviations
     print(f"\n[VALIDATION] JSON 파싱 성공")
     print(f"[VALIDATION] 생성된 deviation 수: {len(deviations)}")
+    if duplicate_count > 0:
+        print(f"[VALIDATION] 중복 제거된 deviation 수: {duplicate_count}")
+    if excluded_count > 0:
+        print(f"[VALIDATION] 가이드워드 행렬에 없는 조합 제외: {excluded_count}개")
 
     # Parameter별 통계
     param_count = {}
@@ -239,183 +466,47 @@ try:
         json.dump(parsed_json, f, ensure_ascii=False, indent=2)
     print(f"[SUCCESS] JSON 저장 완료: {json_path}")
 
-except json.JSONDecodeError as e:
-    print(f"[ERROR] JSON 파싱 실패: {e}")
+# 텍스트 버전: 단일 요청은 원문, 병렬 모드는 병합된 JSON
+if len(contents) == 1:
+    content = contents[0]
+elif parsed_json is not None:
+    content = json.dumps(parsed_json, ensure_ascii=False, indent=2)
+else:
+    content = '\n\n'.join(contents)
 
 # 텍스트 저장
 file_path = get_output_path("Agent4.txt")
 write_txt(file_path, content)
 print(f"[SUCCESS] 텍스트 저장 완료: {file_path}")
 
-# ========== 확률 분석 및 그래프 생성 ==========
+# ========== 확률 분석 ==========
+# 그래프는 후처리 단계(render_probability_charts.py)에서 모든 노드를 일괄 생성
 print(f"\n{'='*60}")
-print(f"확률 분석 시작 (각 deviation의 발생 가능성 평가)")
+print(f"확률 분석 시작 (deviation별 probability_score 기반)")
 print(f"{'='*60}")
 
-if parsed_json and deviations:
-    try:
-        # 각 deviation에 대해 발생 가능성을 1-10 점수로 평가 요청
-        probability_prompt = f"""
-다음 deviation들에 대해 발생 가능성을 1-10 점수로 평가하세요.
+scored_deviations = [dev for dev in deviations if 'probability_score' in dev]
 
-## 노드 정보
-- Node {target_node}: {node_name}
-- 장비: {', '.join(target_node_data.get('equipment_tags', []))}
-
-## Deviations
-{json.dumps(deviations, ensure_ascii=False, indent=2)}
-
-## 평가 기준
-1-3: 발생 가능성 매우 낮음 (극히 드문 상황)
-4-6: 발생 가능성 보통 (일반적인 고장 상황)
-7-10: 발생 가능성 높음 (흔한 고장, 운전 오류)
-
-각 deviation에 대해 순서대로 1-10 사이의 숫자 하나만 출력하세요.
-예시 출력: 7, 5, 8, 3, 9, 6, 4
+if parsed_json and scored_deviations:
+    prob_scores = [dev['probability_score'] for dev in scored_deviations]
 
-{len(deviations)}개의 숫자를 쉼표로 구분하여 출력하세요.
-"""
-
-        # 확률 평가 API 호출
-        prob_payload = {
-            "model": config.MODEL_NAME,
-            "messages": [
-                {"role": "system", "content": "당신은 HAZOP 전문가로서 deviation의 발생 가능성을 평가합니다."},
-                {"role": "user", "content": probability_prompt}
-            ],
-            "max_tokens": 100,
-            "temperature": 0.3  # 일관성을 위해 낮은 온도
-        }
+    # 통계 출력
+    print(f"\n{'='*60}")
+    print(f"확률 분석 통계")
+    print(f"{'='*60}")
+    print(f"평균 발생 가능성 점수: {sum(prob_scores)/len(prob_scores):.2f}/10")
+    print(f"최고 위험 deviation: {scored_deviations[prob_scores.index(max(prob_scores))]['deviation']} (점수: {max(prob_scores)})")
+    print(f"최저 위험 deviation: {scored_deviations[prob_scores.index(min(prob_scores))]['deviation']} (점수: {min(prob_scores)})")
 
-        headers = config.API_HEADERS
-        prob_response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=prob_payload,
-            timeout=config.API_TIMEOUT
-        )
-        prob_response.raise_for_status()
-        prob_content = prob_response.json()['choices'][0]['message']['content']
-
-        print(f"[INFO] 확률 평가 결과: {prob_content}")
-
-        # 숫자 추출
-        import re
-        numbers = re.findall(r'\d+', prob_content)
-        probabilities = [int(n) for n in numbers if 1 <= int(n) <= 10]
-
-        if len(probabilities) != len(deviations):
-            print(f"[WARNING] 확률 개수 불일치: 기대 {len(deviations)}개, 실제 {len(probabilities)}개")
-            # 부족하면 평균값(5)로 채우기
-            while len(probabilities) < len(deviations):
-                probabilities.append(5)
-            # 초과하면 자르기
-            probabilities = probabilities[:len(deviations)]
-
-        # Deviation에 확률 추가
-        for i, dev in enumerate(deviations):
-            dev['probability_score'] = probabilities[i]
-
-        # 확률 점수를 JSON에 추가하여 다시 저장
-        parsed_json['deviations'] = deviations
-        json_path = get_output_path(f"Agent4_node{target_node}.json")
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(parsed_json, f, ensure_ascii=False, indent=2)
-        print(f"[SUCCESS] 확률 정보가 추가된 JSON 저장 완료")
-
-        # ========== 그래프 생성 ==========
-        print(f"\n[INFO] 그래프 생성 중...")
-
-        # 한글 폰트 설정 (Windows)
-        plt.rcParams['font.family'] = 'Malgun Gothic'
-        plt.rcParams['axes.unicode_minus'] = False
-
-        # 그래프 데이터 준비
-        deviation_labels = [f"{i+1}. {dev['deviation'][:30]}..." if len(dev['deviation']) > 30
-                           else f"{i+1}. {dev['deviation']}"
-                           for i, dev in enumerate(deviations)]
-        prob_scores = [dev['probability_score'] for dev in deviations]
-
-        # 누적 확률 계산 (정규화)
-        total_score = sum(prob_scores)
-        normalized_probs = [score / total_score for score in prob_scores]
-        cumulative_probs = []
-        current_sum = 0
-        for prob in normalized_probs:
-            current_sum += prob
-            cumulative_probs.append(current_sum)
-
-        # Figure 생성
-        fig, ax1 = plt.subplots(figsize=(14, 8), dpi=300)
-
-        # Bar plot (발생 가능성 점수)
-        color_primary = '#3776ab'
-        x_pos = range(len(deviation_labels))
-        ax1.set_xlabel('Deviation Number', fontsize=12)
-        ax1.set_ylabel('Probability Score (1-10)', color=color_primary, fontsize=12)
-        bars = ax1.bar(x_pos, prob_scores, color=color_primary, alpha=0.7)
-        ax1.tick_params(axis='y', labelcolor=color_primary)
-        ax1.set_ylim(0, 10)
-        ax1.grid(axis='y', alpha=0.3)
-
-        # 막대 위에 점수 표시
-        for i, (bar, score) in enumerate(zip(bars, prob_scores)):
-            height = bar.get_height()
-            ax1.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{score}',
-                    ha='center', va='bottom', fontsize=9)
-
-        # Cumulative probability (누적 확률)
-        ax2 = ax1.twinx()
-        color_secondary = '#ab373b'
-        ax2.set_ylabel('Cumulative Probability', color=color_secondary, fontsize=12)
-        ax2.plot(x_pos, cumulative_probs, color=color_secondary, marker='o', linewidth=2, markersize=6)
-        ax2.tick_params(axis='y', labelcolor=color_secondary)
-        ax2.set_ylim(0, 1.0)
-
-        # 제목 및 레이블
-        plt.title(f'Deviation Probability Analysis - Node {target_node}: {node_name}',
-                 fontsize=14, fontweight='bold', pad=20)
-        ax1.set_xticks(x_pos)
-        ax1.set_xticklabels([str(i+1) for i in x_pos], rotation=0)
-
-        # 범례
-        from matplotlib.lines import Line2D
-        legend_elements = [
-            Line2D([0], [0], color=color_primary, lw=4, label='Probability Score'),
-            Line2D([0], [0], color=color_secondary, lw=4, label='Cumulative Probability')
-        ]
-        ax1.legend(handles=legend_elements, loc='upper left', fontsize=10)
-
-        fig.tight_layout()
-
-        # 그래프 저장
-        graph_path = get_output_path(f"Agent4_node{target_node}_probability_graph.png")
-        plt.savefig(graph_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        print(f"[SUCCESS] 확률 그래프 저장: {graph_path}")
-
-        # 통계 출력
-        print(f"\n{'='*60}")
-        print(f"확률 분석 통계")
-        print(f"{'='*60}")
-        print(f"평균 발생 가능성 점수: {sum(prob_scores)/len(prob_scores):.2f}/10")
-        print(f"최고 위험 deviation: {deviations[prob_scores.index(max(prob_scores))]['deviation']} (점수: {max(prob_scores)})")
-        print(f"최저 위험 deviation: {deviations[prob_scores.index(min(prob_scores))]['deviation']} (점수: {min(prob_scores)})")
-
-        # 고위험 deviation 목록
-        high_risk = [dev for dev in deviations if dev['probability_score'] >= 7]
-        if high_risk:
-            print(f"\n고위험 Deviations (점수 7 이상): {len(high_risk)}개")
-            for dev in high_risk:
-                print(f"  - [{dev['probability_score']}점] {dev['deviation']}")
-
-    except Exception as e:
-        print(f"[WARNING] 확률 분석 실패: {e}")
-        print(f"[INFO] 기본 deviation 생성은 완료되었습니다.")
-        import traceback
-        traceback.print_exc()
+    # 고위험 deviation 목록
+    high_risk = [dev for dev in scored_deviations if dev['probability_score'] >= 7]
+    if high_risk:
+        print(f"\n고위험 Deviations (점수 7 이상): {len(high_risk)}개")
+        for dev in high_risk:
+            print(f"  - [{dev['probability_score']}점] {dev['deviation']}")
 
+elif parsed_json:
+    print(f"[SKIP] probability_score가 있는 deviation이 없어 확률 분석을 건너뜁니다.")
 else:
     print(f"[SKIP] JSON 파싱 실패로 확률 분석을 건너뜁니다.")
 
@@ -1,10 +1,9 @@
 # -*- coding: utf-8 -*-
 """
 Agent 6: 최종 HAZOP 테이블 생성 (Excel) - 개선 버전
-Agent5 JSON 결과를 파싱하여 DataFrame 생성
+Agent5 JSON 결과를 파싱하여 DataFrame 생성 (행 변환은 hazop_table.py)
 """
 import pandas as pd
-import json
 import os
 import glob
 
@@ -14,56 +13,11 @@ from hazop_utils import (
     read_txt,
     get_output_path
 )
+from hazop_table import empty_table, load_node_rows
 
 # 환경변수에서 대상 노드 번호 읽기 (기본값: 1)
 target_node = int(os.getenv('TARGET_NODE', '1'))
 
-# Agent5 JSON 결과 파싱
-def parse_agent5_json(json_data):
-    """
-    Agent5 JSON 출력을 파싱하여 HAZOP 테이블 데이터 추출
-    """
-    data = {
-        '노드': [],
-        '노드명': [],
-        '파라미터': [],
-        '가이드워드': [],
-        '이탈': [],
-        '원인': [],
-        '결과': [],
-        '심각도': [],
-        '안전장치': [],
-        '개선사항': []
-    }
-
-    node_id = json_data.get('node_id', 0)
-    node_name = json_data.get('node_name', '')
-    hazop_analysis = json_data.get('hazop_analysis', [])
-
-    for analysis in hazop_analysis:
-        data['노드'].append(f"Node {node_id}")
-        data['노드명'].append(node_name)
-        data['파라미터'].append(analysis.get('parameter', ''))
-        data['가이드워드'].append(analysis.get('guideword', ''))
-        data['이탈'].append(analysis.get('deviation', ''))
-
-        # 리스트를 줄바꿈으로 연결
-        causes = analysis.get('causes', [])
-        data['원인'].append('\n'.join(f"- {c}" for c in causes))
-
-        consequences = analysis.get('consequences', [])
-        data['결과'].append('\n'.join(f"- {c}" for c in consequences))
-
-        data['심각도'].append(analysis.get('severity', ''))
-
-        safeguards = analysis.get('safeguards', [])
-        data['안전장치'].append('\n'.join(f"- {s}" for s in safeguards))
-
-        recommendations = analysis.get('recommendations', [])
-        data['개선사항'].append('\n'.join(f"- {r}" for r in recommendations))
-
-    return data
-
 # 모든 노드의 Agent5 JSON 파일 찾기
 print("[INFO] Agent5 JSON 파일 검색 중...")
 output_dir = config.BASE_DIRECTORY
@@ -75,28 +29,13 @@ if not agent5_files:
 
 print(f"[INFO] {len(agent5_files)}개의 Agent5 JSON 파일 발견")
 
-# 모든 노드 데이터 수집
-all_data = {
-    '노드': [],
-    '노드명': [],
-    '파라미터': [],
-    '가이드워드': [],
-    '이탈': [],
-    '원인': [],
-    '결과': [],
-    '심각도': [],
-    '안전장치': [],
-    '개선사항': []
-}
+# 모든 노드 데이터 수집 (통합 실행에서 미리 만든 노드별 조각이 최신이면 조각 사용)
+all_data = empty_table()
 
 for agent5_file in sorted(agent5_files):
-    print(f"[INFO] 파싱 중: {os.path.basename(agent5_file)}")
-
     try:
-        with open(agent5_file, 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
-
-        node_data = parse_agent5_json(json_data)
+        node_data, from_fragment = load_node_rows(agent5_file)
+        print(f"[INFO] {'조각 사용' if from_fragment else '파싱 중'}: {os.path.basename(agent5_file)}")
 
         # 데이터 병합
         for key in all_data.keys():
@@ -9,11 +9,12 @@ from config import config
 from hazop_utils import (
     encode_image,
     read_txt,
-    call_openai_api,
+    call_openai_json,
     create_vision_payload,
     write_txt,
     get_output_path
 )
+from prompt_budget import estimate_prompt_tokens, compact_json_text
 
 # 이전 결과 읽기
 answer_before = read_txt(get_output_path('공정요소.txt'))
@@ -45,14 +46,16 @@ system_prompt = """당신은 HAZOP 노드 분리 전문가입니다.
 """
 
 # User Prompt
-input_ = f"""
+def build_user_text(equipment_list):
+    """Agent1 장비 목록을 포함한 노드 분리 프롬프트"""
+    return f"""
 P&ID 도면과 Agent1의 장비 목록을 참고하여 공정을 HAZOP 노드로 분리하세요.
 
 ## 공정 개요
 {config.HAZOP_OBJECT}
 
 ## Agent1에서 식별한 장비 목록
-{answer_before}
+{equipment_list}
 
 ## JSON 출력 형식
 
@@ -81,12 +84,22 @@ P&ID 도면과 Agent1의 장비 목록을 참고하여 공정을 HAZOP 노드로
 P&ID 이미지와 장비 목록을 보고 노드를 분리하여 JSON으로 출력하세요.
 """
 
+
+input_ = build_user_text(answer_before)
+
+# 토큰 예산: 초과 시 Agent1 결과를 공백 없는 JSON으로 압축
+prompt_tokens = estimate_prompt_tokens(system_prompt, input_, base64_image)
+if prompt_tokens > config.PROMPT_INPUT_TOKEN_BUDGET:
+    input_ = build_user_text(compact_json_text(answer_before))
+    compacted_tokens = estimate_prompt_tokens(system_prompt, input_, base64_image)
+    print(f"[INFO] 토큰 예산 초과: 장비 목록 압축 {prompt_tokens:,} → {compacted_tokens:,} tokens")
+
 # API 호출
 print("[INFO] Agent 2 실행 중: HAZOP 노드 분리...")
 print(f"[INFO] 분석 대상: {config.HAZOP_OBJECT}")
 
-payload = create_vision_payload(system_prompt, input_, base64_image)
-content = call_openai_api(payload)
+payload = create_vision_payload(system_prompt, input_, base64_image, schema='agent2')
+content, _ = call_openai_json(payload, 'agent2')
 
 # 응답 출력
 print("\n" + "="*60)
@@ -10,11 +10,12 @@ from config import config
 from hazop_utils import (
     encode_image,
     read_txt,
-    call_openai_api,
+    call_openai_json,
     create_vision_payload,
     write_txt,
     get_output_path
 )
+from parameter_preselector import accepted_preselection, load_equipment_types
 
 # 환경변수에서 대상 노드 번호 읽기 (기본값: 1)
 target_node = int(os.getenv('TARGET_NODE', '1'))
@@ -47,6 +48,19 @@ except Exception as e:
     print(f"[ERROR] Agent2 결과 파싱 실패: {e}")
     exit(1)
 
+# 규칙 기반 사전 선택 (신뢰도가 충분하면 LLM 호출 없이 저장)
+preselected = accepted_preselection(target_node_data, load_equipment_types())
+if preselected:
+    print(f"[INFO] Node {target_node}: 규칙 기반 선택 (신뢰도 {preselected['confidence']:.2f}), LLM 호출 생략")
+    print(f"[VALIDATION] 선택된 변수: {', '.join(preselected['selected_parameters'])}")
+    json_path = get_output_path(f"Agent3_node{target_node}.json")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(preselected, f, ensure_ascii=False, indent=2)
+    print(f"[SUCCESS] JSON 저장 완료: {json_path}")
+    write_txt(get_output_path("Agent3.txt"), json.dumps(preselected, ensure_ascii=False, indent=2))
+    print(f"\n[INFO] Agent 3 완료 (Node {target_node})")
+    exit(0)
+
 # 이미지 준비
 image_path = config.DEFAULT_IMAGE
 base64_image = encode_image(image_path)
@@ -77,16 +91,8 @@ system_prompt = """당신은 HAZOP 공정변수 식별 전문가입니다.
 - **Maintenance**: 모든 노드 적용 가능 (우선순위 낮음)
 """
 
-# User Prompt
-input_ = f"""
-Node {target_node}에 대해 적용 가능한 공정 변수를 선택하세요.
-
-## 노드 정보
-- 노드명: {target_node_data.get('node_name')}
-- 목적: {target_node_data.get('design_intent')}
-- 장비: {', '.join(target_node_data.get('equipment_tags', []))}
-- 계기: {', '.join(target_node_data.get('instrument_tags', []))}
-
+# 공통 지시 (모든 노드에서 동일, 시스템 프롬프트·이미지와 함께 프롬프트 캐시되는 앞부분)
+shared_text = f"""
 ## 공정 개요
 {config.HAZOP_OBJECT}
 
@@ -98,8 +104,8 @@ Node {target_node}에 대해 적용 가능한 공정 변수를 선택하세요.
 ## JSON 출력 형식
 
 {{
-  "node_id": {target_node},
-  "node_name": "{target_node_data.get('node_name')}",
+  "node_id": 1,
+  "node_name": "노드명",
   "applicable_parameters": [
     {{
       "parameter": "Flow",
@@ -120,16 +126,28 @@ Node {target_node}에 대해 적용 가능한 공정 변수를 선택하세요.
 - 계측기가 있으면 해당 변수는 거의 확실히 적용됨
 - 너무 많이 선택하면 HAZOP이 비효율적 (5-7개 적절)
 - 불필요한 변수는 제외
+"""
+
+# User Prompt (노드별 내용, 마지막에 배치)
+input_ = f"""
+Node {target_node}에 대해 적용 가능한 공정 변수를 선택하세요.
+
+## 노드 정보
+- 노드명: {target_node_data.get('node_name')}
+- 목적: {target_node_data.get('design_intent')}
+- 장비: {', '.join(target_node_data.get('equipment_tags', []))}
+- 계기: {', '.join(target_node_data.get('instrument_tags', []))}
 
-P&ID와 노드 정보를 보고 적용 가능한 변수를 JSON으로 출력하세요.
+P&ID와 노드 정보를 보고 적용 가능한 변수를 위 JSON 형식으로 출력하세요.
+(node_id는 {target_node}, node_name은 "{target_node_data.get('node_name')}")
 """
 
 # API 호출
 print(f"[INFO] Agent 3 실행 중: Node {target_node} 공정변수 식별...")
 print(f"[INFO] 대상 노드: {target_node_data.get('node_name')}")
 
-payload = create_vision_payload(system_prompt, input_, base64_image)
-content = call_openai_api(payload)
+payload = create_vision_payload(system_prompt, input_, base64_image, shared_text=shared_text, schema='agent3')
+content, _ = call_openai_json(payload, 'agent3')
 
 # 응답 출력
 print("\n" + "="*60)
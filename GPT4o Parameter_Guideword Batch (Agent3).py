@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Agent 3 (일괄): 모든 노드의 공정 변수를 한 번의 vision 요청으로 식별
+노드마다 도면 이미지를 다시 보내는 대신 Agent2의 전체 노드 목록을 한 요청(또는 AGENT3_BATCH_SIZE 단위의
+몇 개 요청)에 담아 변수를 선택하고, 결과를 노드별 Agent3_node{n}.json으로 나눠 저장합니다.
+결과에 없는 노드는 통합 실행에서 노드별 Agent3로 다시 실행합니다.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# 공통 유틸리티 및 설정
+from config import config
+from hazop_utils import (
+    encode_image,
+    read_txt,
+    call_openai_json,
+    create_vision_payload,
+    write_txt,
+    get_output_path
+)
+from prompt_budget import estimate_prompt_tokens, split_items
+from parameter_preselector import accepted_preselection, load_equipment_types
+
+# Agent2 결과 읽기 (전체 노드)
+agent2_result = read_txt(get_output_path('Agent2.txt'))
+try:
+    if "```json" in agent2_result:
+        json_str = agent2_result.split("```json")[1].split("```")[0].strip()
+    else:
+        json_str = agent2_result
+    nodes = json.loads(json_str).get('nodes', [])
+    if not nodes:
+        print("[ERROR] Agent2 결과에 노드가 없습니다.")
+        exit(1)
+except Exception as e:
+    print(f"[ERROR] Agent2 결과 파싱 실패: {e}")
+    exit(1)
+
+# 규칙 기반 사전 선택 (신뢰도가 충분한 노드는 LLM 요청에서 제외)
+node_names = {node.get('node_id'): node.get('node_name') for node in nodes}
+saved = []
+preselected_contents = []
+equipment_types = load_equipment_types()
+llm_nodes = []
+for node in nodes:
+    preselected = accepted_preselection(node, equipment_types)
+    if not preselected:
+        llm_nodes.append(node)
+        continue
+    json_path = get_output_path(f"Agent3_node{preselected['node_id']}.json")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(preselected, f, ensure_ascii=False, indent=2)
+    saved.append(preselected['node_id'])
+    preselected_contents.append(json.dumps(preselected, ensure_ascii=False, indent=2))
+    print(f"[VALIDATION] Node {preselected['node_id']}: {', '.join(preselected['selected_parameters'])} "
+          f"(규칙 기반, 신뢰도 {preselected['confidence']:.2f})")
+if saved:
+    print(f"[INFO] 규칙 기반 선택 {len(saved)}개 노드, LLM 선택 {len(llm_nodes)}개 노드")
+
+# 이미지 준비
+image_path = config.DEFAULT_IMAGE
+base64_image = encode_image(image_path)
+
+# System Prompt
+system_prompt = """당신은 HAZOP 공정변수 식별 전문가입니다.
+여러 노드의 공정 변수를 한 번에 선택합니다. 각 노드에서 의미있는 deviation을 발생시킬 수 있는 공정 변수를 노드별로 선택합니다.
+
+## 변수 선택 원칙
+1. **실제 변화 가능성**: 해당 노드에서 실제로 변할 수 있는 변수
+2. **영향도**: 변화 시 공정이나 안전에 영향을 주는 변수
+3. **측정/제어 가능**: 계측이나 제어가 가능한 변수 우선
+4. **HAZOP 효율성**: 너무 많으면 비효율적 (노드당 5-7개가 적절)
+
+## 특정 변수 (Specific Parameters)
+- **Flow**: 유체 흐름이 있는 경우
+- **Pressure**: 압력이 중요한 경우
+- **Temperature**: 온도 변화가 중요한 경우
+- **Level**: 액체 레벨이 있는 경우
+- **Composition**: 혼합물 조성이 중요한 경우
+- **Phase**: 상변화가 일어나는 경우
+- **Viscosity**: 점도가 중요한 경우
+
+## 일반 변수 (General Parameters)
+- **Reaction**: 화학반응이 있는 경우만
+- **Mixing**: 혼합이 중요한 경우만
+- **Corrosion/Erosion**: 부식성 물질이 있는 경우
+- **Maintenance**: 모든 노드 적용 가능 (우선순위 낮음)
+"""
+
+# 공통 지시 (시스템 프롬프트·이미지와 함께 프롬프트 캐시되는 앞부분)
+shared_text = f"""
+## 공정 개요
+{config.HAZOP_OBJECT}
+
+## 분석 방법
+1. 각 노드의 장비와 계기를 보고 어떤 공정이 일어나는지 파악
+2. 각 변수가 그 노드에서 의미있는지 판단
+3. 계측기(PI, TI, FI 등)가 있으면 해당 변수는 중요함
+
+## JSON 출력 형식 (요청한 모든 노드를 nodes 배열에 포함)
+
+{{
+  "nodes": [
+    {{
+      "node_id": 1,
+      "node_name": "노드명",
+      "applicable_parameters": [
+        {{
+          "parameter": "Flow",
+          "applicable": true,
+          "reason": "FI-1101 유량계가 있어 유량 제어가 중요함"
+        }}
+      ],
+      "selected_parameters": ["Flow", "Pressure", "Temperature"],
+      "total_count": 3
+    }}
+  ]
+}}
+
+## 주의
+- 계측기가 있으면 해당 변수는 거의 확실히 적용됨
+- 너무 많이 선택하면 HAZOP이 비효율적 (노드당 5-7개 적절)
+- 불필요한 변수는 제외
+- applicable_parameters에는 선택한 변수와 제외한 주요 변수의 이유를 간단히 기재
+"""
+
+
+def render_nodes(node_list):
+    """노드 정보 목록 (요청별 내용)"""
+    lines = []
+    for node in node_list:
+        lines.append(f"### Node {node.get('node_id')}: {node.get('node_name')}")
+        lines.append(f"- 목적: {node.get('design_intent')}")
+        lines.append(f"- 장비: {', '.join(node.get('equipment_tags', []))}")
+        lines.append(f"- 계기: {', '.join(node.get('instrument_tags', []))}")
+    return '\n'.join(lines)
+
+
+def build_user_text(node_list):
+    """노드 묶음에 대한 변수 선택 프롬프트"""
+    node_ids = ', '.join(str(node.get('node_id')) for node in node_list)
+    return f"""
+다음 {len(node_list)}개 노드 각각에 대해 적용 가능한 공정 변수를 선택하세요.
+
+## 노드 정보
+{render_nodes(node_list)}
+
+P&ID와 노드 정보를 보고 모든 노드(node_id: {node_ids})의 결과를 위 JSON 형식으로 출력하세요.
+"""
+
+
+def parse_batch_json(content):
+    """LLM 응답에서 노드별 결과 목록 추출 (실패 시 json.JSONDecodeError)"""
+    if "```json" in content:
+        json_str = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        json_str = content.split("```")[1].split("```")[0].strip()
+    else:
+        json_str = content
+    return json.loads(json_str).get('nodes', [])
+
+
+def select_parameters(node_list):
+    """노드 묶음 하나에 대한 API 호출"""
+    payload = create_vision_payload(system_prompt, build_user_text(node_list), base64_image, shared_text=shared_text,
+                                    schema='agent3_batch')
+    content, _ = call_openai_json(payload, 'agent3_batch')
+    return content
+
+
+# 노드 묶음 분할 (AGENT3_BATCH_SIZE, 토큰 예산)
+batch_size = config.AGENT3_BATCH_SIZE if config.AGENT3_BATCH_SIZE > 0 else max(len(llm_nodes), 1)
+batches = [llm_nodes[i:i + batch_size] for i in range(0, len(llm_nodes), batch_size)]
+available = config.PROMPT_INPUT_TOKEN_BUDGET - estimate_prompt_tokens(
+    system_prompt, shared_text + build_user_text([]), base64_image)
+batches = [chunk for batch in batches for chunk in split_items(batch, render_nodes, available)]
+
+# API 호출 (묶음이 여러 개면 동시에 요청)
+if not batches:
+    print("[SKIP] 모든 노드가 규칙 기반으로 선택되어 API 호출 생략")
+    contents = []
+elif len(batches) == 1:
+    print(f"[INFO] Agent 3 일괄 실행 중: {len(llm_nodes)}개 노드, 1개 요청...")
+    contents = [select_parameters(batches[0])]
+else:
+    print(f"[INFO] Agent 3 일괄 실행 중: {len(llm_nodes)}개 노드, {len(batches)}개 요청...")
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        contents = list(executor.map(select_parameters, batches))
+
+# 응답 출력
+for i, batch_content in enumerate(contents):
+    print("\n" + "="*60)
+    print(f"Agent 3 일괄 분석 결과 ({i+1}/{len(contents)})")
+    print("="*60)
+    print(batch_content)
+
+# JSON 검증 및 노드별 저장
+for i, batch_content in enumerate(contents):
+    try:
+        results = parse_batch_json(batch_content)
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] 요청 {i+1} JSON 파싱 실패: {e}")
+        continue
+
+    for result in results:
+        try:
+            node_id = int(result.get('node_id'))
+        except (TypeError, ValueError):
+            print(f"[WARNING] node_id가 없는 결과 건너뜀: {result.get('node_name')}")
+            continue
+        if node_id not in node_names or node_id in saved:
+            continue
+
+        selected = result.get('selected_parameters') or [
+            p.get('parameter') for p in result.get('applicable_parameters', []) if p.get('applicable')
+        ]
+        node_json = {
+            'node_id': node_id,
+            'node_name': result.get('node_name') or node_names[node_id],
+            'applicable_parameters': result.get('applicable_parameters', []),
+            'selected_parameters': selected,
+            'total_count': len(selected),
+        }
+        if not selected:
+            print(f"[WARNING] Node {node_id}: 선택된 변수가 없습니다 (노드별 Agent3로 재실행 필요)")
+            continue
+
+        json_path = get_output_path(f"Agent3_node{node_id}.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(node_json, f, ensure_ascii=False, indent=2)
+        saved.append(node_id)
+        print(f"[VALIDATION] Node {node_id}: {', '.join(selected)}")
+
+missing = [node_id for node_id in node_names if node_id not in saved]
+print(f"\n[VALIDATION] 저장된 노드: {len(saved)}/{len(node_names)}")
+if missing:
+    print(f"[WARNING] 결과가 없는 노드: {', '.join(str(n) for n in missing)}")
+
+# 텍스트 저장
+file_path = get_output_path("Agent3.txt")
+write_txt(file_path, '\n\n'.join(preselected_contents + contents))
+print(f"[SUCCESS] 텍스트 저장 완료: {file_path}")
+
+if not saved:
+    print("[ERROR] 저장된 노드 결과가 없습니다.")
+    exit(1)
+
+print(f"\n[INFO] Agent 3 일괄 실행 완료")
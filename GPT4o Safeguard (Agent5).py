@@ -8,11 +8,17 @@ from config import config
 from hazop_utils import (
     encode_image,
     read_txt,
-    call_openai_api,
+    call_openai_json,
     create_vision_payload,
+    create_text_payload,
     write_txt,
     get_output_path
 )
+from prompt_budget import estimate_prompt_tokens, count_text_tokens, split_items
+from prompt_encoding import encode_records
+from deviation_reuse import ANALYSIS_FIELDS, get_reuse_index, node_context
+from parameter_preselector import load_equipment_types
+from functools import partial
 import json
 import os
 
@@ -86,26 +92,15 @@ system_prompt = """당신은 HAZOP 안전 분석 전문가입니다.
 - **Low**: 경미한 운전 이상
 """
 
-# User Prompt
-user_text = f"""
-다음 deviation에 대해 원인, 결과, 안전장치, 개선사항을 분석하세요.
-
-## 노드 정보
-- Node {target_node}: {target_node_data.get('node_name')}
-- 목적: {target_node_data.get('design_intent')}
-- 장비: {', '.join(target_node_data.get('equipment_tags', []))}
-- 계기: {', '.join(target_node_data.get('instrument_tags', []))}
-
-## Deviation 목록
-{json.dumps(deviations, ensure_ascii=False, indent=2)}
-
+# 공통 지시 (모든 노드에서 동일, 시스템 프롬프트·이미지와 함께 프롬프트 캐시되는 앞부분)
+shared_text = """
 ## JSON 출력 형식
 
-{{
-  "node_id": {target_node},
-  "node_name": "{target_node_data.get('node_name')}",
+{
+  "node_id": 1,
+  "node_name": "노드명",
   "hazop_analysis": [
-    {{
+    {
       "deviation_id": 1,
       "parameter": "Flow",
       "guideword": "None",
@@ -128,9 +123,9 @@ user_text = f"""
         "유량 저저 인터록 추가",
         "압축기 자동 재시작 로직 검토"
       ]
-    }}
+    }
   ]
-}}
+}
 
 ## 주의사항
 1. P&ID를 보고 실제 존재하는 안전장치만 기재
@@ -138,31 +133,181 @@ user_text = f"""
 3. causes와 consequences는 각각 2-3개씩 구체적으로 작성
 4. safeguards는 P&ID의 계기 태그와 함께 기재
 5. recommendations는 실용적이고 구현 가능한 개선사항
-
-모든 deviation에 대해 분석 결과를 JSON으로 출력하세요.
 """
 
-# API 호출
-print(f"[INFO] Agent 5 실행 중: Node {target_node} 안전 분석...")
-payload = create_vision_payload(system_prompt, user_text, base64_image, image_format="png")
-content = call_openai_api(payload)
 
-# 응답 출력
-print("\n" + "="*60)
-print(f"Agent 5 분석 결과 (Node {target_node})")
-print("="*60)
-print(content)
+# User Prompt (노드별 내용, 마지막에 배치)
+def build_user_text(deviation_text):
+    """deviation 목록을 포함한 안전 분석 프롬프트"""
+    return f"""
+다음 deviation에 대해 원인, 결과, 안전장치, 개선사항을 분석하세요.
 
-# JSON 검증
-try:
+## 노드 정보
+- Node {target_node}: {target_node_data.get('node_name')}
+- 목적: {target_node_data.get('design_intent')}
+- 장비: {', '.join(target_node_data.get('equipment_tags', []))}
+- 계기: {', '.join(target_node_data.get('instrument_tags', []))}
+
+## Deviation 목록
+{deviation_text}
+
+모든 deviation에 대해 분석 결과를 위 JSON 형식으로 출력하세요.
+(node_id는 {target_node}, node_name은 "{target_node_data.get('node_name')}")
+"""
+
+
+def parse_analysis_json(content):
+    """LLM 응답에서 안전 분석 JSON 추출 (실패 시 json.JSONDecodeError)"""
     if "```json" in content:
         json_str = content.split("```json")[1].split("```")[0].strip()
     elif "```" in content:
         json_str = content.split("```")[1].split("```")[0].strip()
     else:
         json_str = content
+    return json.loads(json_str)
+
+
+# 이전 노드 분석 재사용 (DEVIATION_REUSE=adapt): 유사한 분석이 있는 deviation은 수정만 요청
+adapt_system_prompt = """당신은 HAZOP 안전 분석 전문가입니다.
+이전 노드의 분석 결과를 이 노드에 맞게 수정합니다.
+비슷한 장비 구성의 다른 노드에서 같은 deviation을 분석한 결과가 주어집니다.
+이 노드의 장비/계기 태그와 설계 의도에 맞지 않는 부분만 수정하세요.
+"""
+
+
+def build_adapt_text(targets):
+    """재사용 대상 deviation과 이전 분석 결과를 포함한 수정 요청 프롬프트"""
+    return f"""
+## 노드 정보
+- Node {target_node}: {target_node_data.get('node_name')}
+- 목적: {target_node_data.get('design_intent')}
+- 장비: {', '.join(target_node_data.get('equipment_tags', []))}
+- 계기: {', '.join(target_node_data.get('instrument_tags', []))}
+
+## 이전 분석 결과 (다른 노드)
+{encode_records(targets, config.PROMPT_ENCODING)}
+
+## JSON 출력 형식 (수정이 필요한 필드만 포함, 수정할 필드가 없으면 deviation_id만)
+{{
+  "adapted": [
+    {{"deviation_id": 1, "safeguards": ["PI-1201 (압력 고 알람)"]}}
+  ]
+}}
+
+## 주의
+- 다른 노드의 장비/계기 태그는 이 노드의 태그로 바꾸고, 이 노드에 없는 안전장치는 제외
+- 모든 deviation_id를 adapted에 포함
+"""
+
 
-    parsed_json = json.loads(json_str)
+def analysis_sort_key(analysis):
+    """deviation_id 순 정렬 키 (숫자가 아니면 뒤로)"""
+    try:
+        return (0, int(analysis.get('deviation_id')))
+    except (TypeError, ValueError):
+        return (1, 0)
+
+
+reuse_index = get_reuse_index()
+equipment_context = node_context(target_node_data, load_equipment_types()) if reuse_index else ''
+reused = {}  # {deviation_id: (인덱스 항목, 유사도)}
+if reuse_index and config.DEVIATION_REUSE == 'adapt':
+    for dev in deviations:
+        entry, score = reuse_index.lookup(equipment_context, dev, exclude_node=target_node)
+        if entry and score >= config.DEVIATION_REUSE_MIN_SIMILARITY:
+            reused[dev.get('deviation_id')] = (entry, score)
+
+reused_analysis = []
+if reused:
+    print(f"[INFO] 이전 분석 재사용: {len(reused)}/{len(deviations)}개 deviation 수정 요청 "
+          f"(유사도 {config.DEVIATION_REUSE_MIN_SIMILARITY:.2f} 이상)")
+    targets = []
+    for dev in deviations:
+        if dev.get('deviation_id') in reused:
+            entry, _ = reused[dev.get('deviation_id')]
+            targets.append({'deviation_id': dev.get('deviation_id'), 'deviation': dev.get('deviation'),
+                            **entry['analysis']})
+    try:
+        payload = create_text_payload(adapt_system_prompt, build_adapt_text(targets), schema='agent5_adapt')
+        adapt_content, _ = call_openai_json(payload, 'agent5_adapt')
+        adapt_json = parse_analysis_json(adapt_content)
+        adapted = {item.get('deviation_id'): item for item in adapt_json.get('adapted', [])}
+    except json.JSONDecodeError as e:
+        print(f"[WARNING] 재사용 수정 응답 파싱 실패: {e} → 전체 분석으로 진행")
+        adapted = {}
+
+    for dev in deviations:
+        deviation_id = dev.get('deviation_id')
+        if deviation_id not in reused or deviation_id not in adapted:
+            continue
+        entry, score = reused[deviation_id]
+        analysis = dict(entry['analysis'])
+        analysis.update({field: adapted[deviation_id][field] for field in ANALYSIS_FIELDS
+                         if adapted[deviation_id].get(field)})
+        reused_analysis.append({
+            'deviation_id': deviation_id,
+            'parameter': dev.get('parameter'),
+            'guideword': dev.get('guideword'),
+            'deviation': dev.get('deviation'),
+            **analysis,
+            'reused_from': {'node_id': entry.get('node_id'), 'similarity': score},
+        })
+    if len(reused_analysis) < len(reused):
+        print(f"[WARNING] 수정 결과가 없는 {len(reused) - len(reused_analysis)}개 deviation은 전체 분석")
+
+reused_ids = {analysis['deviation_id'] for analysis in reused_analysis}
+fresh_deviations = [dev for dev in deviations if dev.get('deviation_id') not in reused_ids]
+
+# deviation 목록 표현 (PROMPT_ENCODING), 토큰 예산 초과 시 들여쓰기 JSON은 공백 없는 JSON으로 압축
+# 그래도 넘으면 나눠서 요청
+available = config.PROMPT_INPUT_TOKEN_BUDGET - estimate_prompt_tokens(system_prompt, shared_text + build_user_text(''), base64_image)
+encoding = config.PROMPT_ENCODING
+if encoding == 'indent' and count_text_tokens(encode_records(fresh_deviations, 'indent')) > available:
+    encoding = 'minified'
+    print(f"[INFO] 토큰 예산 초과: deviation 목록을 공백 없는 JSON으로 압축")
+render = partial(encode_records, style=encoding)
+deviation_chunks = split_items(fresh_deviations, render, available)
+if len(deviation_chunks) > 1:
+    print(f"[INFO] 토큰 예산 초과: deviation {len(fresh_deviations)}개를 {len(deviation_chunks)}개 요청으로 분할")
+
+# API 호출
+print(f"[INFO] Agent 5 실행 중: Node {target_node} 안전 분석...")
+if not deviation_chunks:
+    print("[SKIP] 모든 deviation이 이전 분석 재사용으로 처리되어 전체 분석 요청 생략")
+contents = []
+for chunk in deviation_chunks:
+    payload = create_vision_payload(system_prompt, build_user_text(render(chunk)), base64_image,
+                                    image_format="png", shared_text=shared_text, schema='agent5')
+    content, _ = call_openai_json(payload, 'agent5')
+    contents.append(content)
+
+# 응답 출력
+for i, chunk_content in enumerate(contents):
+    print("\n" + "="*60)
+    if len(contents) == 1:
+        print(f"Agent 5 분석 결과 (Node {target_node})")
+    else:
+        print(f"Agent 5 분석 결과 (Node {target_node}, 요청 {i+1}/{len(contents)})")
+    print("="*60)
+    print(chunk_content)
+
+# JSON 검증 (분할 요청/재사용 결과가 있으면 병합)
+content = contents[0] if len(contents) == 1 and not reused_analysis else '\n\n'.join(contents)
+try:
+    parsed_json = None
+    for chunk_content in contents:
+        chunk_json = parse_analysis_json(chunk_content)
+        if parsed_json is None:
+            parsed_json = chunk_json
+        else:
+            parsed_json.setdefault("hazop_analysis", []).extend(chunk_json.get("hazop_analysis", []))
+    if parsed_json is None:
+        parsed_json = {'node_id': target_node, 'node_name': target_node_data.get('node_name'), 'hazop_analysis': []}
+    if reused_analysis:
+        parsed_json.setdefault("hazop_analysis", []).extend(reused_analysis)
+        parsed_json["hazop_analysis"].sort(key=analysis_sort_key)
+    if len(contents) > 1 or reused_analysis:
+        content = json.dumps(parsed_json, ensure_ascii=False, indent=2)
 
     hazop_analysis = parsed_json.get("hazop_analysis", [])
     print(f"\n[VALIDATION] JSON 파싱 성공")
@@ -186,6 +331,11 @@ try:
         json.dump(parsed_json, f, ensure_ascii=False, indent=2)
     print(f"[SUCCESS] JSON 저장 완료: {json_path}")
 
+    # 재사용 인덱스에 추가 (다음 노드/실행에서 조회)
+    if reuse_index:
+        added = reuse_index.add(target_node_data, equipment_context, deviations, hazop_analysis)
+        print(f"[INFO] 재사용 인덱스에 {added}개 분석 추가: {reuse_index.path}")
+
 except json.JSONDecodeError as e:
     print(f"[ERROR] JSON 파싱 실패: {e}")
 
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+HAZOP 파이프라인 오프라인 벤치마크
+mock LLM 서버(mock_llm_server.py)를 띄우고 main_integrated.py / main_integrated_all_nodes.py를
+1, 10, 100 노드 규모로 끝까지 실행하여 처리량, 단계/API 지연(p50/p95), 최대 메모리를 측정합니다.
+각 실행은 임시 디렉토리와 별도 실행 이력 DB를 사용하므로 실제 출력에 영향이 없습니다.
+
+이 모듈은 config.py를 import하지 않습니다 (실제 API 키 없이 실행 가능).
+
+사용 예:
+    python benchmark_pipeline.py                                  # 1/10/100 노드, 두 파이프라인
+    python benchmark_pipeline.py --nodes 1 10 --latency-median 0.2 --latency-sigma 0.5
+    python benchmark_pipeline.py --output bench.json
+    python benchmark_pipeline.py --baseline bench.json --tolerance 0.2   # 회귀 검사
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import base64
+import sqlite3
+import tempfile
+import subprocess
+from datetime import datetime
+
+from mock_llm_server import MockLLM, start_mock_server
+
+
+PIPELINES = {
+    'single': ['main_integrated.py'],
+    'all_nodes': ['main_integrated_all_nodes.py', '--agents', '1', '2', '3', '4', '5', '6'],
+}
+
+DEFAULT_SCALES = [1, 10, 100]
+
+# 1x1 PNG (Agent가 인코딩할 도면 이미지 대용)
+PLACEHOLDER_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+# 사용자 환경에서 벤치마크로 넘기지 않을 변수
+ISOLATED_ENV_KEYS = ('TARGET_NODE', 'HAZOP_RUN_ID', 'HAZOP_AGENT')
+
+
+def percentile(values, q):
+    """백분위수 (선형 보간, 값이 없으면 None)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _round(value, digits=3):
+    return round(value, digits) if value is not None else None
+
+
+def run_with_peak_memory(command, cwd, env, log_path):
+    """
+    명령 실행 후 (종료 코드, 최대 RSS MB) 반환
+
+    os.wait4의 ru_maxrss는 자식 프로세스와 그 하위 Agent 프로세스 중 최댓값입니다.
+    wait4가 없는 OS(Windows)에서는 메모리를 None으로 반환합니다.
+    """
+    with open(log_path, 'wb') as log_file:
+        process = subprocess.Popen(command, cwd=cwd, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # Linux는 KB, macOS는 byte 단위
+            divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+            return process.returncode, round(usage.ru_maxrss / divisor, 1)
+        return process.wait(), None
+
+
+def collect_registry_metrics(registry_path):
+    """벤치마크 실행의 레지스트리에서 단계/API 지연 집계"""
+    if not os.path.exists(registry_path):
+        return {}
+
+    conn = sqlite3.connect(registry_path)
+    try:
+        steps = conn.execute("SELECT agent, status, elapsed FROM steps").fetchall()
+        calls = conn.execute(
+            "SELECT status, latency, prompt_tokens, completion_tokens, cached_tokens FROM api_calls"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    step_elapsed = [row[2] for row in steps if row[2] is not None]
+    per_agent = {}
+    for agent, status, elapsed in steps:
+        per_agent.setdefault(agent, []).append(elapsed)
+
+    call_latency = [row[1] for row in calls if row[1] is not None and row[0] != 'HEDGE']
+    return {
+        'steps': len(steps),
+        'failed_steps': sum(1 for row in steps if row[1] != 'SUCCESS'),
+        'step_p50': _round(percentile(step_elapsed, 50)),
+        'step_p95': _round(percentile(step_elapsed, 95)),
+        'per_agent_p50': {str(agent): _round(percentile(values, 50)) for agent, values in sorted(per_agent.items())},
+        'api_calls': len(calls),
+        'failed_api_calls': sum(1 for row in calls if row[0] == 'FAILED'),
+        'hedged_api_calls': sum(1 for row in calls if row[0] == 'HEDGE'),
+        'api_p50': _round(percentile(call_latency, 50)),
+        'api_p95': _round(percentile(call_latency, 95)),
+        'prompt_tokens': sum(row[2] or 0 for row in calls),
+        'completion_tokens': sum(row[3] or 0 for row in calls),
+        'cached_tokens': sum(row[4] or 0 for row in calls),
+    }
+
+
+def run_case(pipeline, nodes, mock_options, keep=False, image=None):
+    """
+    파이프라인 1회 벤치마크
+
+    Args:
+        pipeline: 'single' 또는 'all_nodes'
+        nodes: mock Agent2가 돌려줄 노드 수
+        mock_options: MockLLM 인자 딕셔너리 (지연, 오류 비율 등)
+        keep: True면 임시 디렉토리를 지우지 않음
+        image: 도면 이미지 경로 (None이면 1x1 PNG, 실제 크기의 이미지로 전송량/캐시 영향 측정)
+
+    Returns:
+        측정 결과 딕셔너리
+    """
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    case_dir = tempfile.mkdtemp(prefix=f'hazop_bench_{pipeline}_{nodes}_')
+    output_dir = os.path.join(case_dir, 'out')
+    os.makedirs(output_dir)
+    image_path = os.path.join(case_dir, 'pid.png')
+    if image:
+        shutil.copyfile(image, image_path)
+    else:
+        with open(image_path, 'wb') as f:
+            f.write(PLACEHOLDER_PNG)
+
+    mock = MockLLM(node_count=nodes, **mock_options)
+    server, port = start_mock_server(mock)
+
+    env = {k: v for k, v in os.environ.items() if k not in ISOLATED_ENV_KEYS}
+    env.update({
+        'OPENAI_API_KEY': 'sk-benchmark',
+        'OPENAI_BASE_URL': f'http://127.0.0.1:{port}/v1',
+        'BASE_DIRECTORY': output_dir,
+        'IMAGE_DIRECTORY': case_dir,
+        'DEFAULT_IMAGE': image_path,
+        'DEVIATION_OUTPUT_DIR': os.path.join(output_dir, '이탈시나리오'),
+        'CSV_SCENARIOS_PATH': os.path.join(case_dir, 'no_scenarios.csv'),
+        'RUN_REGISTRY_ENABLED': 'true',
+        'RUN_REGISTRY_PATH': os.path.join(case_dir, 'registry.sqlite3'),
+        'RENDER_CHARTS': 'false',
+        'PROFILE_AGENTS': 'false',
+        'NO_PROXY': '127.0.0.1,localhost',
+        'PYTHONIOENCODING': 'utf-8',
+    })
+
+    print(f"[INFO] {pipeline} / 노드 {nodes}개 실행 중... (mock: 127.0.0.1:{port})")
+    start = time.perf_counter()
+    try:
+        returncode, peak_rss_mb = run_with_peak_memory(
+            [sys.executable] + PIPELINES[pipeline], repo_dir, env, os.path.join(case_dir, 'pipeline.log')
+        )
+    finally:
+        wall = time.perf_counter() - start
+        server.shutdown()
+        server.server_close()
+
+    metrics = collect_registry_metrics(env['RUN_REGISTRY_PATH'])
+    steps = metrics.get('steps', 0)
+    nodes_processed = nodes if pipeline == 'all_nodes' else 1
+
+    result = {
+        'pipeline': pipeline,
+        'nodes': nodes,
+        'returncode': returncode,
+        'wall_seconds': _round(wall),
+        'steps_per_min': _round(steps / (wall / 60.0), 2) if wall > 0 else None,
+        'nodes_per_min': _round(nodes_processed / (wall / 60.0), 2) if wall > 0 else None,
+        'peak_rss_mb': peak_rss_mb,
+        'mock_requests': mock.stats['requests'],
+        'mock_errors': mock.stats['errors'],
+        'mock_rate_limited': mock.stats['rate_limited'],
+    }
+    result.update(metrics)
+
+    if keep:
+        result['case_dir'] = case_dir
+    else:
+        shutil.rmtree(case_dir, ignore_errors=True)
+
+    status = 'OK' if returncode == 0 else f'FAILED ({returncode})'
+    print(f"  → {status}, {result['wall_seconds']:.2f}초, 단계 {steps}개")
+    return result
+
+
+def print_report(results):
+    """결과 표 출력"""
+    header = (f"{'pipeline':<10} {'nodes':>5} {'result':>7} {'failed':>6} {'wall(s)':>9} {'steps/min':>10} "
+              f"{'step p50':>9} {'step p95':>9} {'api p50':>8} {'api p95':>8} {'peak MB':>8}")
+    print("\n" + "=" * len(header))
+    print(header)
+    print("-" * len(header))
+
+    def cell(value, width, fmt='.2f'):
+        return f"{value:>{width}{fmt}}" if value is not None else f"{'-':>{width}}"
+
+    for r in results:
+        print(f"{r['pipeline']:<10} {r['nodes']:>5} {'OK' if r['returncode'] == 0 else 'FAIL':>7} "
+              f"{r.get('failed_steps', 0):>6} {cell(r['wall_seconds'], 9)} {cell(r['steps_per_min'], 10)} "
+              f"{cell(r.get('step_p50'), 9)} {cell(r.get('step_p95'), 9)} "
+              f"{cell(r.get('api_p50'), 8, '.3f')} {cell(r.get('api_p95'), 8, '.3f')} "
+              f"{cell(r['peak_rss_mb'], 8, '.1f')}")
+    print("=" * len(header))
+
+
+def check_regressions(results, baseline_path, tolerance):
+    """기준 결과 대비 wall 시간이 tolerance 이상 늘어난 경우 목록"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['pipeline'], r['nodes']): r for r in json.load(f)['results']}
+
+    regressions = []
+    for r in results:
+        base = baseline.get((r['pipeline'], r['nodes']))
+        if not base or not base.get('wall_seconds'):
+            continue
+        ratio = r['wall_seconds'] / base['wall_seconds']
+        if ratio > 1 + tolerance or (base['returncode'] == 0 and r['returncode'] != 0):
+            regressions.append((r['pipeline'], r['nodes'], base['wall_seconds'], r['wall_seconds'], ratio))
+    return regressions
+
+
+def main():
+    """메인 실행 함수"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HAZOP 파이프라인 오프라인 벤치마크 (mock LLM)')
+    parser.add_argument('--nodes', type=int, nargs='+', default=DEFAULT_SCALES, help='노드 수 (기본값: 1 10 100)')
+    parser.add_argument('--pipelines', nargs='+', choices=list(PIPELINES), default=list(PIPELINES))
+    parser.add_argument('--latency-median', type=float, default=0.05, help='mock 응답 지연 중앙값 (초)')
+    parser.add_argument('--latency-sigma', type=float, default=0.3, help='mock 로그정규 지연 분산')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='mock 500 오류 비율')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='mock 429 비율')
+    parser.add_argument('--invalid-json-rate', type=float, default=0.0, help='mock 잘린 JSON 응답 비율')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--recorded', help='실제 실행 결과 디렉토리 (mock 응답으로 재사용)')
+    parser.add_argument('--image', help='도면 이미지 (기본값: 1x1 PNG)')
+    parser.add_argument('--output', help='결과 JSON 저장 경로')
+    parser.add_argument('--baseline', help='비교할 이전 결과 JSON (회귀 검사)')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='허용 지연 증가율 (기본값: 0.2 = 20%%)')
+    parser.add_argument('--keep', action='store_true', help='임시 실행 디렉토리 보존')
+    args = parser.parse_args()
+
+    mock_options = {
+        'latency_median': args.latency_median,
+        'latency_sigma': args.latency_sigma,
+        'error_rate': args.error_rate,
+        'rate_limit_rate': args.rate_limit_rate,
+        'invalid_json_rate': args.invalid_json_rate,
+        'seed': args.seed,
+        'recorded_dir': os.path.abspath(args.recorded) if args.recorded else None,
+    }
+
+    results = []
+    for nodes in args.nodes:
+        for pipeline in args.pipelines:
+            results.append(run_case(pipeline, nodes, mock_options, args.keep, args.image))
+
+    print_report(results)
+
+    if args.output:
+        report = {
+            'created_at': datetime.now().isoformat(),
+            'mock_options': mock_options,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[SUCCESS] 벤치마크 결과 저장: {args.output}")
+
+    if args.baseline:
+        regressions = check_regressions(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n[FAILED] 성능 회귀 {len(regressions)}건 (허용 {args.tolerance:.0%})")
+            for pipeline, nodes, before, after, ratio in regressions:
+                print(f"  - {pipeline} / 노드 {nodes}: {before:.2f}초 → {after:.2f}초 (x{ratio:.2f})")
+            return 1
+        print(f"\n[SUCCESS] 성능 회귀 없음 (허용 {args.tolerance:.0%})")
+
+    return 0 if all(r['returncode'] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,31 +5,69 @@ HAZOP 결과 비교 스크립트
 """
 
 import os
+import glob
 import json
-import hashlib
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from config import config
+from hazop_utils import compute_file_hash
+from hazop_similarity import (
+    token_diff_similarity,
+    approximate_similarity,
+    extract_json,
+    compare_json_structures,
+    EXACT_DIFF_MAX_CHARS
+)
 
 
 class ResultComparator:
     """결과 비교 클래스"""
 
+    # HAZOP 테이블 행 정렬 키 (Agent6 출력 컬럼)
+    TABLE_KEY_COLUMNS = ['노드', '파라미터', '가이드워드']
+
+    # 비교 대상 파일 패턴 (노드별 Agent*_node*.json 자동 포함)
+    COMPARE_PATTERNS = ['공정요소.txt', '공정요소.json', 'Agent*.txt', 'Agent*.json', 'HAZOP_table.xlsx']
+
+    # 해시 계산 병렬 스레드 수
+    HASH_WORKERS = 8
+
     def __init__(self):
         self.comparison_results = []
 
-    def get_file_hash(self, file_path):
-        """파일의 MD5 해시값 계산"""
+    def get_file_hash(self, file_path, algorithm='md5'):
+        """파일의 해시값 계산 (스트리밍)"""
         if not os.path.exists(file_path):
             return None
 
         try:
-            with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+            return compute_file_hash(file_path, algorithm)
         except Exception as e:
             print(f"해시 계산 오류 ({file_path}): {e}")
             return None
 
+    def discover_files(self, directory):
+        """디렉토리에서 비교 대상 파일명 탐색"""
+        filenames = set()
+        for pattern in self.COMPARE_PATTERNS:
+            for path in glob.glob(os.path.join(directory, pattern)):
+                if os.path.isfile(path):
+                    filenames.add(os.path.basename(path))
+        return filenames
+
+    def hash_directory(self, directory, filenames):
+        """여러 파일의 해시를 병렬로 계산 → {파일명: 해시}"""
+        paths = [os.path.join(directory, name) for name in filenames]
+        with ThreadPoolExecutor(max_workers=self.HASH_WORKERS) as executor:
+            hashes = executor.map(self.get_file_hash, paths)
+        return dict(zip(filenames, hashes))
+
+    @staticmethod
+    def file_type_of(filename):
+        """파일 확장자로 비교 방식 결정"""
+        return 'excel' if filename.endswith('.xlsx') else 'text'
+
     def compare_text_files(self, file1, file2):
         """텍스트 파일 비교"""
         if not os.path.exists(file1) or not os.path.exists(file2):
@@ -48,35 +86,53 @@ class ResultComparator:
 
             identical = content1 == content2
 
-            return {
+            result = {
                 'identical': identical,
                 'size1': len(content1),
                 'size2': len(content2),
                 'size_diff': abs(len(content1) - len(content2)),
-                'similarity': self.calculate_similarity(content1, content2)
+                'similarity': self.calculate_similarity(content1, content2),
+                'similarity_method': self.similarity_method(content1, content2)
             }
+
+            # 두 파일 모두 JSON이면 구조 인식 비교 추가
+            if not identical:
+                json1 = extract_json(content1)
+                json2 = extract_json(content2)
+                if json1 is not None and json2 is not None:
+                    result['json_comparison'] = compare_json_structures(json1, json2)
+
+            return result
         except Exception as e:
             return {
                 'identical': False,
                 'reason': f'읽기 오류: {str(e)}'
             }
 
-    def calculate_similarity(self, text1, text2):
-        """텍스트 유사도 계산 (간단한 문자 단위 비교)"""
-        if not text1 or not text2:
-            return 0.0
+    def similarity_method(self, text1, text2):
+        """유사도 계산 방식 선택 (대용량은 MinHash 근사)"""
+        if max(len(text1), len(text2)) > EXACT_DIFF_MAX_CHARS:
+            return 'minhash'
+        return 'token_diff'
 
-        len1, len2 = len(text1), len(text2)
-        max_len = max(len1, len2)
-        min_len = min(len1, len2)
+    def calculate_similarity(self, text1, text2, method=None):
+        """
+        텍스트 유사도 계산 (0-100)
 
-        # 공통 문자 개수 계산 (간단한 방식)
-        matches = sum(1 for i in range(min_len) if text1[i] == text2[i])
+        Args:
+            method: 'token_diff' (토큰 단위 diff) 또는 'minhash' (근사),
+                    None이면 텍스트 크기에 따라 자동 선택
+        """
+        if not text1 or not text2:
+            return 0.0
 
-        return (matches / max_len) * 100 if max_len > 0 else 0.0
+        method = method or self.similarity_method(text1, text2)
+        if method == 'minhash':
+            return approximate_similarity(text1, text2)
+        return token_diff_similarity(text1, text2)
 
-    def compare_excel_files(self, file1, file2):
-        """Excel 파일 비교"""
+    def compare_excel_files(self, file1, file2, key_columns=None):
+        """Excel 파일 비교 (키 기반 행 정렬 포함)"""
         if not os.path.exists(file1) or not os.path.exists(file2):
             return {
                 'identical': False,
@@ -98,6 +154,9 @@ class ResultComparator:
             # 데이터 비교
             data_match = df1.equals(df2) if shape_match and columns_match else False
 
+            # 키 기반 행 단위 비교
+            table_diff = self.compare_dataframes(df1, df2, key_columns)
+
             return {
                 'identical': data_match,
                 'shape1': df1.shape,
@@ -107,7 +166,8 @@ class ResultComparator:
                 'row_count1': len(df1),
                 'row_count2': len(df2),
                 'col_count1': len(df1.columns),
-                'col_count2': len(df2.columns)
+                'col_count2': len(df2.columns),
+                'table_diff': table_diff
             }
         except Exception as e:
             return {
@@ -115,6 +175,85 @@ class ResultComparator:
                 'reason': f'읽기 오류: {str(e)}'
             }
 
+    def compare_dataframes(self, df1, df2, key_columns=None, sample_size=20):
+        """
+        두 HAZOP 테이블을 (노드, 파라미터, 가이드워드) 키로 정렬하여 비교
+
+        한 번의 outer merge로 추가/삭제/변경 행과 컬럼별 변경률을 계산합니다.
+        같은 키가 여러 행이면 등장 순서(occurrence)로 1:1 매칭합니다.
+
+        Args:
+            key_columns: 정렬 키 컬럼 (None이면 TABLE_KEY_COLUMNS)
+            sample_size: 보고서에 포함할 샘플 키 개수
+
+        Returns:
+            added_rows, removed_rows, changed_rows, column_change_rates 등
+        """
+        key_columns = key_columns or self.TABLE_KEY_COLUMNS
+        keys = [c for c in key_columns if c in df1.columns and c in df2.columns]
+
+        left = df1.copy()
+        right = df2.copy()
+
+        # 키 컬럼이 없으면 행 위치 기준으로 정렬
+        if not keys:
+            left['_row'] = range(len(left))
+            right['_row'] = range(len(right))
+            keys = ['_row']
+
+        left['_occurrence'] = left.groupby(keys, dropna=False).cumcount()
+        right['_occurrence'] = right.groupby(keys, dropna=False).cumcount()
+        merge_keys = keys + ['_occurrence']
+
+        value_columns = [c for c in df1.columns if c in df2.columns and c not in merge_keys]
+
+        merged = left.merge(
+            right,
+            on=merge_keys,
+            how='outer',
+            suffixes=('_1', '_2'),
+            indicator=True
+        )
+
+        added = merged['_merge'] == 'right_only'
+        removed = merged['_merge'] == 'left_only'
+        both = merged['_merge'] == 'both'
+        matched_count = int(both.sum())
+
+        # 컬럼별 변경 여부 (NaN == NaN은 동일로 취급)
+        change_flags = pd.DataFrame(index=merged.index)
+        for col in value_columns:
+            values1 = merged[f'{col}_1'].astype(object)
+            values2 = merged[f'{col}_2'].astype(object)
+            differs = (values1 != values2) & ~(values1.isna() & values2.isna())
+            change_flags[col] = differs & both
+
+        changed = change_flags.any(axis=1) if value_columns else pd.Series(False, index=merged.index)
+
+        column_change_rates = {
+            col: float(change_flags[col].sum()) / matched_count if matched_count else 0.0
+            for col in value_columns
+        }
+
+        def sample_keys(mask):
+            rows = merged.loc[mask, merge_keys].head(sample_size)
+            return rows.astype(str).to_dict('records')
+
+        return {
+            'identical': not added.any() and not removed.any() and not changed.any(),
+            'key_columns': keys,
+            'matched_rows': matched_count,
+            'added_rows': int(added.sum()),
+            'removed_rows': int(removed.sum()),
+            'changed_rows': int(changed.sum()),
+            'columns_only_in_1': [c for c in df1.columns if c not in df2.columns],
+            'columns_only_in_2': [c for c in df2.columns if c not in df1.columns],
+            'column_change_rates': column_change_rates,
+            'sample_added': sample_keys(added),
+            'sample_removed': sample_keys(removed),
+            'sample_changed': sample_keys(changed),
+        }
+
     def compare_directories(self, dir1, dir2):
         """두 디렉토리의 출력 파일 비교"""
         print(f"\n{'='*60}")
@@ -124,25 +263,45 @@ class ResultComparator:
         print(f"디렉토리 2 (통합 실행): {dir2}")
         print()
 
-        # 비교할 파일 목록
-        files_to_compare = [
-            ('공정요소.txt', 'text'),
-            ('Agent2.txt', 'text'),
-            ('Agent3.txt', 'text'),
-            ('Agent4.txt', 'text'),
-            ('Agent5.txt', 'text'),
-            ('HAZOP_table.xlsx', 'excel')
-        ]
+        # 비교할 파일 목록 (양쪽 디렉토리에서 자동 탐색)
+        files1 = self.discover_files(dir1)
+        files2 = self.discover_files(dir2)
+        filenames = sorted(files1 | files2)
+
+        # 해시 우선 비교: 해시가 같은 파일은 내용 비교 생략
+        hashes1 = self.hash_directory(dir1, sorted(files1))
+        hashes2 = self.hash_directory(dir2, sorted(files2))
 
         results = []
+        identical_by_hash = 0
 
-        for filename, file_type in files_to_compare:
+        for filename in filenames:
+            file_type = self.file_type_of(filename)
             file1 = os.path.join(dir1, filename)
             file2 = os.path.join(dir2, filename)
+            hash1 = hashes1.get(filename)
+            hash2 = hashes2.get(filename)
+
+            if hash1 is not None and hash1 == hash2:
+                identical_by_hash += 1
+                results.append({
+                    'filename': filename,
+                    'file_type': file_type,
+                    'identical': True,
+                    'hash': hash1
+                })
+                continue
 
             print(f"\n[{filename}] 비교 중...")
 
-            if file_type == 'text':
+            if filename not in files1 or filename not in files2:
+                comparison = {
+                    'identical': False,
+                    'reason': '파일 누락',
+                    'file1_exists': filename in files1,
+                    'file2_exists': filename in files2
+                }
+            elif file_type == 'text':
                 comparison = self.compare_text_files(file1, file2)
             elif file_type == 'excel':
                 comparison = self.compare_excel_files(file1, file2)
@@ -151,6 +310,8 @@ class ResultComparator:
 
             comparison['filename'] = filename
             comparison['file_type'] = file_type
+            comparison['hash1'] = hash1
+            comparison['hash2'] = hash2
             results.append(comparison)
 
             # 결과 출력
@@ -161,8 +322,21 @@ class ResultComparator:
                 if 'reason' in comparison:
                     print(f"     이유: {comparison['reason']}")
                 elif 'similarity' in comparison:
-                    print(f"     유사도: {comparison['similarity']:.2f}%")
+                    print(f"     유사도: {comparison['similarity']:.2f}% ({comparison['similarity_method']})")
                     print(f"     크기 차이: {comparison.get('size_diff', 0)} bytes")
+                    if 'json_comparison' in comparison:
+                        json_cmp = comparison['json_comparison']
+                        print(f"     JSON 경로 변경: +{json_cmp['added_paths']} "
+                              f"-{json_cmp['removed_paths']} ~{json_cmp['changed_paths']}")
+                elif 'table_diff' in comparison:
+                    table_diff = comparison['table_diff']
+                    print(f"     행 변경: +{table_diff['added_rows']} "
+                          f"-{table_diff['removed_rows']} ~{table_diff['changed_rows']}")
+                    for col, rate in table_diff['column_change_rates'].items():
+                        if rate > 0:
+                            print(f"       - {col}: {rate*100:.1f}% 변경")
+
+        print(f"\n[INFO] 해시 일치로 비교 생략: {identical_by_hash}/{len(filenames)}개 파일")
 
         self.comparison_results = results
         return results
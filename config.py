@@ -15,6 +15,7 @@ class Config:
 
     # OpenAI API 설정
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')  # 벤치마크 시 mock 서버 주소로 변경
 
     # 파일 경로 설정
     BASE_DIRECTORY = os.getenv('BASE_DIRECTORY', '')
@@ -37,12 +38,75 @@ class Config:
     MAX_TOKENS = 16000  # 응답 토큰 증가 (GPT-5는 추론 토큰 + 출력 토큰 포함)
     API_TIMEOUT = 300  # API 타임아웃 5분 (GPT-5는 더 오래 걸림)
 
+    # Agent 단계 제한 시간 (step_deadline.py, 남은 시간은 HAZOP_STEP_DEADLINE으로 Agent의 API 호출까지 전달)
+    STEP_TIMEOUT_DEFAULT = float(os.getenv('STEP_TIMEOUT_DEFAULT', '600'))  # STEP_TIMEOUTS에 없는 Agent의 제한 시간 (초, 0이면 제한 없음)
+    STEP_TIMEOUTS = os.getenv('STEP_TIMEOUTS', '4=900,5=900,6=300')  # Agent별 제한 시간 (Agent번호=초, 쉼표 구분)
+    STEP_DEADLINE_MARGIN = float(os.getenv('STEP_DEADLINE_MARGIN', '5'))  # API 호출에 남겨둘 최소 시간, 이보다 적으면 호출하지 않고 실패 (초)
+    STEP_KILL_GRACE = float(os.getenv('STEP_KILL_GRACE', '10'))  # 마감 후 종료 요청에서 강제 종료까지 대기 시간 (초)
+
     # 이탈 시나리오 분석 설정 (Agent 4 개선)
     CSV_SCENARIOS_PATH = os.getenv('CSV_SCENARIOS_PATH',
         'C:/Users/B/Desktop/HAZOP 자동화/참고문헌/수정 엑셀/Heat_Transfer_Equipment.csv')  # Failure scenarios 데이터베이스
     DEVIATION_OUTPUT_DIR = os.getenv('DEVIATION_OUTPUT_DIR',
         os.path.join(BASE_DIRECTORY, '이탈시나리오'))  # 이탈 시나리오 출력 디렉토리
     DEVIATION_IMAGE_PATH = os.getenv('DEVIATION_IMAGE_PATH', DEFAULT_IMAGE)  # Agent 이미지
+    PIPELINE_MAX_WORKERS = int(os.getenv('PIPELINE_MAX_WORKERS', '1'))  # 통합 실행에서 동시에 실행할 단계 수 (pipeline_dag.py, 2 이상이면 노드 겹쳐 실행)
+    AGENT3_BATCH = os.getenv('AGENT3_BATCH', 'false').lower() in ('1', 'true', 'yes')  # 모든 노드의 변수를 한 번의 vision 요청으로 선택
+    AGENT3_BATCH_SIZE = int(os.getenv('AGENT3_BATCH_SIZE', '0'))  # 일괄 요청당 노드 수 (0이면 전체 노드를 한 요청에)
+    PARAMETER_PRESELECT = os.getenv('PARAMETER_PRESELECT', 'false').lower() in ('1', 'true', 'yes')  # 계기/장비 규칙으로 변수 선택 (신뢰도가 높으면 Agent3 LLM 호출 생략)
+    PARAMETER_PRESELECT_MIN_CONFIDENCE = float(os.getenv('PARAMETER_PRESELECT_MIN_CONFIDENCE', '0.8'))  # 규칙 기반 선택을 사용할 최소 신뢰도
+    PARAMETER_PRESELECT_LLM_NODES = os.getenv('PARAMETER_PRESELECT_LLM_NODES', '')  # 항상 LLM으로 선택할 노드 번호 (쉼표 구분)
+    AGENT4_PARAM_GROUP_SIZE = int(os.getenv('AGENT4_PARAM_GROUP_SIZE', '0'))  # 변수 그룹 크기 (0이면 노드 전체를 한 번에 요청)
+    AGENT4_MAX_WORKERS = int(os.getenv('AGENT4_MAX_WORKERS', '4'))  # 그룹별 동시 요청 수
+    GUIDEWORD_MATRIX_ENABLED = os.getenv('GUIDEWORD_MATRIX_ENABLED', 'true').lower() in ('1', 'true', 'yes')  # 적용 불가 변수×가이드워드 조합 사전 제외
+    GUIDEWORD_MATRIX_PATH = os.getenv('GUIDEWORD_MATRIX_PATH',
+        os.path.join(BASE_DIRECTORY, 'guideword_matrix.json'))  # 적용 가능 행렬 (없으면 기본값으로 생성)
+
+    # 확률 그래프 후처리 설정 (render_probability_charts.py)
+    RENDER_CHARTS = os.getenv('RENDER_CHARTS', 'true').lower() in ('1', 'true', 'yes')  # 통합 실행 후 그래프 생성 여부
+    CHART_DPI = int(os.getenv('CHART_DPI', '300'))
+    CHART_FORMAT = os.getenv('CHART_FORMAT', 'png')  # png 또는 svg
+    CHART_WORKERS = int(os.getenv('CHART_WORKERS', '1'))  # 병렬 렌더링 프로세스 수
+
+    # 실행 이력 레지스트리 설정 (run_registry.py)
+    RUN_REGISTRY_ENABLED = os.getenv('RUN_REGISTRY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RUN_REGISTRY_PATH = os.getenv('RUN_REGISTRY_PATH',
+        os.path.join(BASE_DIRECTORY, 'logs', 'run_registry.sqlite3'))  # 실행/단계/API 호출 기록 DB
+
+    # 실행 이벤트 로그 설정 (event_log.py)
+    EVENT_LOG_MAX_BYTES = int(os.getenv('EVENT_LOG_MAX_BYTES', str(10 * 1024 * 1024)))  # 이 크기를 넘으면 파일 순환
+    EVENT_LOG_BACKUP_COUNT = int(os.getenv('EVENT_LOG_BACKUP_COUNT', '5'))  # 보관할 순환 파일 수
+    STEP_OUTPUT_TAIL_CHARS = int(os.getenv('STEP_OUTPUT_TAIL_CHARS', '2000'))  # 이벤트에 남길 stderr 끝부분 길이
+    MONITOR_PORT = int(os.getenv('MONITOR_PORT', '8765'))  # progress_monitor.py HTTP /status 포트 (0이면 비활성화)
+
+    # Agent 단계 프로파일링 (profile_agent.py, 통합 실행의 --profile과 동일)
+    PROFILE_AGENTS = os.getenv('PROFILE_AGENTS', 'false').lower() in ('1', 'true', 'yes')
+
+    # 프롬프트 토큰 예산 (prompt_budget.py)
+    PROMPT_INPUT_TOKEN_BUDGET = int(os.getenv('PROMPT_INPUT_TOKEN_BUDGET', '30000'))  # 요청당 입력 토큰 목표, 넘으면 섹션 압축/분할
+    PROMPT_ENCODING = os.getenv('PROMPT_ENCODING', 'table').lower()  # deviation 목록 표현: indent, minified, table (prompt_encoding.py)
+
+    # 노드 간 deviation 분석 재사용 (deviation_reuse.py)
+    DEVIATION_REUSE = os.getenv('DEVIATION_REUSE', 'off').lower()  # off, record(인덱스 기록만), adapt(유사 분석 수정 요청)
+    DEVIATION_REUSE_MIN_SIMILARITY = float(os.getenv('DEVIATION_REUSE_MIN_SIMILARITY', '0.75'))  # 재사용할 최소 TF-IDF 코사인 유사도
+    DEVIATION_REUSE_PATH = os.getenv('DEVIATION_REUSE_PATH',
+        os.path.join(BASE_DIRECTORY, 'logs', 'deviation_reuse.jsonl'))  # 분석 결과 인덱스 (JSONL)
+
+    # 응답 JSON 스키마 (hazop_schemas.py)
+    STRUCTURED_OUTPUT = os.getenv('STRUCTURED_OUTPUT', 'false').lower() in ('1', 'true', 'yes')  # response_format json_schema로 출력 제한
+    JSON_RETRY_ATTEMPTS = int(os.getenv('JSON_RETRY_ATTEMPTS', '1'))  # 스키마 검증 실패 시 오류를 알려주고 다시 요청하는 횟수
+
+    # 느린 API 호출 중복 요청 (hedged request, hazop_utils.call_openai_api)
+    HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS', 'false').lower() in ('1', 'true', 'yes')  # 응답이 p95보다 늦으면 같은 요청을 한 번 더 보냄
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95'))  # 중복 요청 기준 지연 백분위 (같은 Agent의 성공 호출)
+    HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '5'))  # 백분위 계산에 필요한 최소 호출 수 (부족하면 최근 실행 기록 사용)
+    HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', '5'))  # 중복 요청 전 최소 대기 시간 (초)
+    HEDGE_BUDGET_RATIO = float(os.getenv('HEDGE_BUDGET_RATIO', '0.1'))  # 중복 요청 입력 토큰 상한 (실행 전체 입력 토큰 대비 비율)
+
+    # LLM 호출 기록/재생 (llm_cassette.py)
+    LLM_CASSETTE_MODE = os.getenv('LLM_CASSETTE_MODE', 'off').lower()  # off, record, replay
+    LLM_CASSETTE_PATH = os.getenv('LLM_CASSETTE_PATH',
+        os.path.join(BASE_DIRECTORY, 'logs', 'llm_cassette.jsonl.gz'))  # 요청/응답 기록 파일 (gzip JSONL)
 
     @classmethod
     def validate(cls):
@@ -55,6 +119,10 @@ class Config:
         if not cls.OPENAI_API_KEY.startswith('sk-'):
             raise ValueError("OPENAI_API_KEY 형식이 올바르지 않습니다. 'sk-'로 시작해야 합니다.")
 
+        # 프롬프트 데이터 표현 검증
+        if cls.PROMPT_ENCODING not in ('indent', 'minified', 'table'):
+            raise ValueError(f"PROMPT_ENCODING은 indent, minified, table 중 하나여야 합니다: {cls.PROMPT_ENCODING}")
+
         # 경로 검증
         if not os.path.exists(cls.DEFAULT_IMAGE):
             raise FileNotFoundError(f"기본 이미지 파일을 찾을 수 없습니다: {cls.DEFAULT_IMAGE}")
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+노드 간 deviation 분석 재사용 인덱스
+이미 분석한 (장비 구성, parameter, guideword, deviation) 항목의 Agent5 분석 결과(원인/결과/안전장치/개선사항)를
+TF-IDF 벡터로 색인하고, 비슷한 장비의 노드에서 같은 deviation이 나오면 처음부터 생성하는 대신
+이전 분석을 이 노드에 맞게 수정만 하도록 요청합니다 (출력 토큰/지연 감소).
+
+- DEVIATION_REUSE=record: Agent5 결과를 인덱스에 추가만 함
+- DEVIATION_REUSE=adapt: 인덱스 조회 → 유사도 DEVIATION_REUSE_MIN_SIMILARITY 이상이면 수정 요청, 나머지는 기존 분석
+- parameter, guideword는 정확히 같아야 하며, 유사도는 장비 종류/설계 의도/deviation 설명 텍스트의 코사인 유사도
+- 장비 태그의 숫자는 무시 (BL-1101과 BL-1201은 같은 토큰)
+- 인덱스는 JSONL 파일에 append (레코드마다 한 줄, 한 번의 write)
+
+사용 예:
+    python deviation_reuse.py info
+    python deviation_reuse.py lookup --node 2   # 현재 Agent4_node2.json 중 재사용 가능한 deviation
+"""
+
+import os
+import re
+import sys
+import json
+import math
+from datetime import datetime
+
+from config import config
+from hazop_similarity import tokenize
+
+
+REUSE_MODES = ('off', 'record', 'adapt')
+
+# 재사용 시 복사하는 Agent5 분석 필드
+ANALYSIS_FIELDS = ('causes', 'consequences', 'severity', 'safeguards', 'recommendations')
+
+_DIGITS = re.compile(r'\d+')
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+
+def text_terms(text):
+    """TF-IDF 단어 목록 (소문자, 숫자는 '#'으로 정규화, 한글 등 비ASCII 단어는 2글자 단위 추가)"""
+    terms = []
+    for token in tokenize(text.lower() if text else ''):
+        if not any(ch.isalnum() for ch in token):
+            continue
+        token = _DIGITS.sub('#', token)
+        if token == '#':
+            continue
+        terms.append(token)
+        if len(token) > 2 and _NON_ASCII.search(token):
+            terms += [token[i:i + 2] for i in range(len(token) - 1)]
+    return terms
+
+
+def node_context(node, equipment_types=None):
+    """노드의 장비 구성 텍스트 (장비 종류 + 설계 의도)"""
+    equipment_types = equipment_types or {}
+    equipment = [f"{tag} {equipment_types.get(tag, '')}".strip() for tag in node.get('equipment_tags', [])]
+    return f"{' '.join(equipment)} {node.get('design_intent', '')}"
+
+
+def _document(context, deviation):
+    """색인/조회용 문서 텍스트"""
+    return f"{context} {deviation.get('deviation', '')} {deviation.get('description', '')}"
+
+
+def _bucket(deviation):
+    """정확히 일치해야 하는 (parameter, guideword)"""
+    return (str(deviation.get('parameter', '')).strip().lower(),
+            str(deviation.get('guideword', '')).strip().lower())
+
+
+class DeviationReuseIndex:
+    """Agent5 분석 결과 TF-IDF 인덱스"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self.entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # 중단된 기록의 잘린 줄
+        self._build()
+
+    def _build(self):
+        """문서 빈도 및 항목별 벡터 계산"""
+        self._terms = [text_terms(entry['document']) for entry in self.entries]
+        document_frequency = {}
+        for terms in self._terms:
+            for term in set(terms):
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        count = len(self.entries)
+        self._idf = {term: math.log((count + 1) / (df + 1)) + 1 for term, df in document_frequency.items()}
+        self._default_idf = math.log(count + 1) + 1
+        self._vectors = [self._vector(terms) for terms in self._terms]
+        self._buckets = {}
+        for i, entry in enumerate(self.entries):
+            self._buckets.setdefault(tuple(entry['bucket']), []).append(i)
+
+    def _vector(self, terms):
+        """정규화된 TF-IDF 벡터 {term: weight}"""
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        vector = {term: (1 + math.log(n)) * self._idf.get(term, self._default_idf) for term, n in counts.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {term: w / norm for term, w in vector.items()} if norm else {}
+
+    def lookup(self, context, deviation, exclude_node=None):
+        """
+        가장 유사한 이전 분석
+
+        Args:
+            context: node_context() 결과
+            deviation: Agent4 deviation 딕셔너리
+            exclude_node: 제외할 node_id (같은 노드의 이전 실행 결과는 재사용하지 않음)
+
+        Returns:
+            (인덱스 항목, 유사도 0-1) 또는 (None, 0.0)
+        """
+        query = self._vector(text_terms(_document(context, deviation)))
+        best, best_score = None, 0.0
+        for i in self._buckets.get(_bucket(deviation), []):
+            entry = self.entries[i]
+            if exclude_node is not None and entry.get('node_id') == exclude_node:
+                continue
+            vector = self._vectors[i]
+            score = sum(w * vector.get(term, 0.0) for term, w in query.items())
+            if score > best_score:
+                best, best_score = entry, score
+        return best, round(best_score, 3)
+
+    def add(self, node, context, deviations, analyses):
+        """
+        노드의 deviation 분석 결과를 인덱스에 추가
+
+        Args:
+            deviations: Agent4 deviation 목록 (description 포함)
+            analyses: Agent5 hazop_analysis 목록 (deviation_id로 연결)
+        """
+        by_id = {dev.get('deviation_id'): dev for dev in deviations}
+        lines = []
+        for analysis in analyses:
+            deviation = by_id.get(analysis.get('deviation_id'))
+            if deviation is None or not all(analysis.get(field) for field in ANALYSIS_FIELDS):
+                continue
+            entry = {
+                'recorded_at': datetime.now().isoformat(),
+                'node_id': node.get('node_id'),
+                'node_name': node.get('node_name'),
+                'bucket': list(_bucket(deviation)),
+                'document': _document(context, deviation),
+                'parameter': deviation.get('parameter'),
+                'guideword': deviation.get('guideword'),
+                'deviation': deviation.get('deviation'),
+                'analysis': {field: analysis.get(field) for field in ANALYSIS_FIELDS},
+            }
+            self.entries.append(entry)
+            lines.append(json.dumps(entry, ensure_ascii=False) + '\n')
+        if not lines:
+            return 0
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        # O_APPEND 단일 write → 동시에 기록하는 다른 Agent 프로세스와 섞이지 않음
+        # O_BINARY: Windows 텍스트 모드의 줄바꿈 변환 방지
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            os.write(fd, ''.join(lines).encode('utf-8'))
+        finally:
+            os.close(fd)
+        self._build()
+        return len(lines)
+
+
+def get_reuse_index():
+    """설정에 따라 인덱스 반환 (off면 None)"""
+    mode = config.DEVIATION_REUSE
+    if mode not in REUSE_MODES:
+        print(f"[ERROR] DEVIATION_REUSE는 {', '.join(REUSE_MODES)} 중 하나여야 합니다: {mode}")
+        exit(1)
+    if mode == 'off':
+        return None
+    return DeviationReuseIndex(config.DEVIATION_REUSE_PATH)
+
+
+def main():
+    """메인 실행 함수"""
+    import argparse
+    from hazop_utils import get_output_path
+    from parameter_preselector import load_equipment_types
+
+    parser = argparse.ArgumentParser(description='deviation 분석 재사용 인덱스 조회')
+    parser.add_argument('command', choices=['info', 'lookup'],
+                        help='info: 인덱스 요약, lookup: 노드 deviation별 가장 유사한 이전 분석')
+    parser.add_argument('--node', type=int, default=1, help='lookup 대상 노드 번호')
+    parser.add_argument('--path', default=config.DEVIATION_REUSE_PATH, help='인덱스 파일 경로')
+    args = parser.parse_args()
+
+    index = DeviationReuseIndex(args.path)
+    if not index.entries:
+        print(f"[ERROR] 인덱스가 비어 있습니다: {args.path}")
+        return 1
+
+    if args.command == 'info':
+        counts = {}
+        for entry in index.entries:
+            key = f"{entry['parameter']} / {entry['guideword']}"
+            counts[key] = counts.get(key, 0) + 1
+        print(f"\n{args.path}")
+        print(f"  항목 {len(index.entries)}개, 노드 {len({e.get('node_id') for e in index.entries})}개")
+        for key, count in sorted(counts.items()):
+            print(f"  {key:<28} {count:>4}")
+        return 0
+
+    with open(get_output_path('Agent2.txt'), 'r', encoding='utf-8') as f:
+        content = f.read()
+    json_str = content.split("```json")[1].split("```")[0] if "```json" in content else content
+    node = next((n for n in json.loads(json_str).get('nodes', []) if n.get('node_id') == args.node), None)
+    if node is None:
+        print(f"[ERROR] Node {args.node}을 찾을 수 없습니다.")
+        return 1
+    with open(get_output_path(f'Agent4_node{args.node}.json'), 'r', encoding='utf-8') as f:
+        deviations = json.load(f).get('deviations', [])
+
+    context = node_context(node, load_equipment_types())
+    threshold = config.DEVIATION_REUSE_MIN_SIMILARITY
+    reusable = 0
+    print(f"\nNode {args.node}: 기준 유사도 {threshold:.2f}")
+    for deviation in deviations:
+        entry, score = index.lookup(context, deviation, exclude_node=args.node)
+        reusable += score >= threshold
+        source = f"Node {entry['node_id']}" if entry else '-'
+        print(f"  {deviation.get('deviation_id', ''):>3} {str(deviation.get('deviation', ''))[:40]:<40} "
+              f"{score:.2f}  {source}")
+    print(f"\n재사용 가능: {reusable}/{len(deviations)}개")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,9 +7,60 @@ HAZOP 분석 품질 평가 스크립트
 import os
 import json
 import re
+import glob
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from config import config
+from hazop_similarity import extract_json
+from run_registry import get_registry
+from guideword_matrix import load_matrix, combinations, is_applicable
+
+
+# 평가에 사용하는 결과 파일 (한 번만 읽어 캐시)
+EVALUATION_ARTIFACTS = [
+    '공정요소.txt',
+    'Agent2.txt',
+    'Agent3.txt',
+    'Agent4.txt',
+    'Agent5.txt',
+    'HAZOP_table.xlsx',
+]
+
+GUIDEWORDS = ['None', 'More', 'Less', 'As well as', 'Other than', 'Part of', 'Reverse']
+
+# ========== 사전 컴파일된 정규식 ==========
+EQUIPMENT_PATTERN = re.compile(r'구성요소\s+\d+\.\s+\*\*([^*]+)\*\*')
+DESCRIPTION_START_PATTERN = re.compile(r'설명:\s*')
+NODE_HEADING_PATTERN = re.compile(r'###\s*Node\s+(\d+):\s*([^\n]+)')
+NODE_BOUNDARY_PATTERN = re.compile(r'###\s*Node')
+COMPONENT_PATTERN = re.compile(r'^\d+\.\s+\*\*', re.MULTILINE)
+PARAM_SECTION_PATTERN = re.compile(r'####\s*(Flow|Pressure|Temperature|Composition|Level|Phase|Viscosity)')
+GUIDEWORD_ITEM_PATTERN = re.compile(
+    r'\d+\.\s*(' + '|'.join(re.escape(gw) for gw in GUIDEWORDS) + r')\s*\n\s*-',
+    re.IGNORECASE
+)
+EXAMPLE_PATTERN = re.compile(r'-\s+[가-힣A-Za-z].{10,}')
+DEVIATION_SPLIT_PATTERN = re.compile(r'\d+\.\s*(No |More |Less |Reverse )')
+EQUIPMENT_TAG_PATTERN = re.compile(r'[A-Z]{1,3}-\d{4}')
+NODE_JSON_PATTERN = re.compile(r'Agent(\d)_node(\d+)\.json$')
+
+_GUIDEWORD_LOOKUP = {gw.lower(): gw for gw in GUIDEWORDS}
+
+
+def completeness_counts(covered, matrix):
+    """
+    완전성 점수용 (커버한 적용 가능 조합 수, 적용 가능 조합 수)
+
+    Args:
+        covered: [(공정 변수, [커버한 가이드워드, ...]), ...] (노드별로 같은 변수가 반복될 수 있음)
+        matrix: 가이드워드 적용 가능 행렬 - Agent4가 의도적으로 제외한 조합은 분모에서 제외
+    """
+    covered = list(covered)
+    possible = sum(len(gws) for _, gws in combinations([param for param, _ in covered], matrix))
+    hits = sum(len({gw for gw in gws if is_applicable(param, gw, matrix)}) for param, gws in covered)
+    return hits, possible
 
 
 class HAZOPQualityEvaluator:
@@ -18,9 +69,11 @@ class HAZOPQualityEvaluator:
     def __init__(self, result_dir):
         self.result_dir = result_dir
         self.evaluation_results = {}
+        self.documents = {}
+        self.guideword_matrix = load_matrix() if config.GUIDEWORD_MATRIX_ENABLED else {'*': list(GUIDEWORDS)}
 
-    def read_file(self, filename):
-        """파일 읽기"""
+    def _load_file(self, filename):
+        """파일 1개 읽기 (캐시 미사용)"""
         filepath = os.path.join(self.result_dir, filename)
         if not os.path.exists(filepath):
             return None
@@ -35,6 +88,73 @@ class HAZOPQualityEvaluator:
             print(f"파일 읽기 오류 ({filename}): {e}")
             return None
 
+    def load_documents(self, filenames=None):
+        """평가 대상 파일을 한 번에 읽어 문서 캐시에 저장"""
+        if filenames is None:
+            filenames = EVALUATION_ARTIFACTS + ['Agent2.json'] + self.node_json_files(4)
+        filenames = [f for f in filenames if f not in self.documents]
+        if not filenames:
+            return self.documents
+
+        with ThreadPoolExecutor(max_workers=len(filenames)) as executor:
+            for filename, document in zip(filenames, executor.map(self._load_file, filenames)):
+                self.documents[filename] = document
+
+        return self.documents
+
+    def read_file(self, filename):
+        """파일 읽기 (문서 캐시 사용)"""
+        if filename not in self.documents:
+            self.documents[filename] = self._load_file(filename)
+        return self.documents[filename]
+
+    def read_json(self, filename):
+        """JSON 결과 파일 읽기 (파싱 결과 캐시, 실패 시 None)"""
+        key = f"{filename}#json"
+        if key not in self.documents:
+            content = self.read_file(filename)
+            parsed = None
+            if content:
+                try:
+                    parsed = json.loads(content)
+                except json.JSONDecodeError as e:
+                    print(f"JSON 파싱 오류 ({filename}): {e}")
+            self.documents[key] = parsed
+        return self.documents[key]
+
+    def node_json_files(self, agent_num):
+        """Agent{n}_node{k}.json 파일 목록 (노드 번호 순)"""
+        files = []
+        for path in glob.glob(os.path.join(self.result_dir, f'Agent{agent_num}_node*.json')):
+            match = NODE_JSON_PATTERN.search(os.path.basename(path))
+            if match:
+                files.append((int(match.group(2)), os.path.basename(path)))
+        return [filename for _, filename in sorted(files)]
+
+    def read_node_jsons(self, agent_num):
+        """모든 노드의 Agent JSON 결과 로드 (파싱 실패 파일 제외)"""
+        results = []
+        for filename in self.node_json_files(agent_num):
+            data = self.read_json(filename)
+            if isinstance(data, dict):
+                results.append(data)
+        return results
+
+    @staticmethod
+    def _extract_descriptions(content):
+        """'설명:' 뒤의 문단 추출 (빈 줄 또는 다음 '구성요소'까지)"""
+        descriptions = []
+        for match in DESCRIPTION_START_PATTERN.finditer(content):
+            start = match.end()
+            end = len(content)
+            for terminator in ('\n\n', '구성요소'):
+                pos = content.find(terminator, start)
+                if pos != -1 and pos < end:
+                    end = pos
+            if end > start:
+                descriptions.append(content[start:end])
+        return descriptions
+
     # ========== Agent 1: 공정요소 분석 평가 ==========
     def evaluate_agent1_process_elements(self):
         """Agent 1: 공정 구성요소 식별 품질 평가"""
@@ -43,11 +163,8 @@ class HAZOPQualityEvaluator:
             return {'error': '파일 없음'}
 
         # 정량적 지표
-        equipment_pattern = r'구성요소\s+\d+\.\s+\*\*([^*]+)\*\*'
-        equipments = re.findall(equipment_pattern, content)
-
-        description_pattern = r'설명:\s*(.+?)(?=\n\n|구성요소|\Z)'
-        descriptions = re.findall(description_pattern, content, re.DOTALL)
+        equipments = EQUIPMENT_PATTERN.findall(content)
+        descriptions = self._extract_descriptions(content)
 
         # 기기 종류별 분류
         equipment_types = {
@@ -93,38 +210,84 @@ class HAZOPQualityEvaluator:
 
     # ========== Agent 2: 노드 분리 평가 ==========
     def evaluate_agent2_node_separation(self):
-        """Agent 2: 노드 분리 품질 평가"""
+        """Agent 2: 노드 분리 품질 평가 (Agent2.json 우선, 없으면 텍스트 정규식)"""
+        agent2_data = self.read_json('Agent2.json')
+        if not isinstance(agent2_data, dict):
+            agent2_data = extract_json(self.read_file('Agent2.txt'))
+
+        if isinstance(agent2_data, dict) and agent2_data.get('nodes'):
+            return self._evaluate_agent2_from_json(agent2_data['nodes'])
+
         content = self.read_file('Agent2.txt')
         if not content:
             return {'error': '파일 없음'}
+        return self._evaluate_agent2_from_text(content)
+
+    def _evaluate_agent2_from_json(self, node_list):
+        """Agent 2: 구조화된 노드 목록 기반 평가"""
+        nodes_df = pd.DataFrame({
+            'node_number': [str(n.get('node_id', '')) for n in node_list],
+            'node_name': [str(n.get('node_name', '')).strip() for n in node_list],
+            'component_count': [
+                len(n.get('equipment_tags') or []) + len(n.get('instrument_tags') or [])
+                for n in node_list
+            ],
+        })
+
+        counts = nodes_df['component_count'].to_numpy()
+        min_components = int(counts.min())
+        max_components = int(counts.max())
+
+        evaluation = {
+            'source': 'json',
+            'node_count': len(nodes_df),
+            'node_details': nodes_df.to_dict('records'),
+            'avg_components_per_node': float(counts.mean()),
+            'min_components': min_components,
+            'max_components': max_components,
+
+            # 품질 점수 (텍스트 평가와 동일 기준)
+            'node_coverage_score': min(100, len(nodes_df) * 25),
+            'balance_score': 100 if max_components / max(min_components, 1) <= 3 else 60,
+            'detail_score': min(100, float(counts.mean()) * 20),
+        }
+
+        evaluation['total_score'] = (
+            evaluation['node_coverage_score'] * 0.4 +
+            evaluation['balance_score'] * 0.3 +
+            evaluation['detail_score'] * 0.3
+        )
+
+        return evaluation
+
+    def _evaluate_agent2_from_text(self, content):
+        """Agent 2: 마크다운 텍스트 정규식 기반 평가 (폴백)"""
 
         # 노드 추출
-        node_pattern = r'###\s*Node\s+(\d+):\s*([^\n]+)'
-        nodes = re.findall(node_pattern, content)
+        headings = list(NODE_HEADING_PATTERN.finditer(content))
+        nodes = [(m.group(1), m.group(2)) for m in headings]
+        boundaries = [m.start() for m in NODE_BOUNDARY_PATTERN.finditer(content)] + [len(content)]
 
-        # 각 노드의 구성요소 개수
+        # 각 노드의 구성요소 개수 (다음 '### Node' 경계까지가 해당 노드 섹션)
         node_details = []
-        for node_num, node_name in nodes:
-            # 해당 노드 섹션 추출
-            node_section_pattern = rf'###\s*Node\s+{node_num}:.*?(?=###\s*Node|\Z)'
-            node_section = re.search(node_section_pattern, content, re.DOTALL)
-
-            if node_section:
-                section_text = node_section.group(0)
-                # 구성요소 개수 세기 (번호 매겨진 항목)
-                component_pattern = r'^\d+\.\s+\*\*'
-                components = len(re.findall(component_pattern, section_text, re.MULTILINE))
-
-                node_details.append({
-                    'node_number': node_num,
-                    'node_name': node_name.strip(),
-                    'component_count': components
-                })
+        for heading in headings:
+            section_end = next(b for b in boundaries if b > heading.start())
+            section_text = content[heading.start():section_end]
+
+            # 구성요소 개수 세기 (번호 매겨진 항목)
+            components = len(COMPONENT_PATTERN.findall(section_text))
+
+            node_details.append({
+                'node_number': heading.group(1),
+                'node_name': heading.group(2).strip(),
+                'component_count': components
+            })
 
         # 품질 지표
         avg_components = sum(n['component_count'] for n in node_details) / len(node_details) if node_details else 0
 
         evaluation = {
+            'source': 'text',
             'node_count': len(nodes),
             'node_details': node_details,
             'avg_components_per_node': avg_components,
@@ -193,16 +356,85 @@ class HAZOPQualityEvaluator:
 
     # ========== Agent 4: 이탈 시나리오 평가 ==========
     def evaluate_agent4_deviations(self):
-        """Agent 4: 이탈 시나리오 품질 평가"""
+        """Agent 4: 이탈 시나리오 품질 평가 (Agent4_node*.json 우선, 없으면 텍스트 정규식)"""
+        node_results = self.read_node_jsons(4)
+        if any(result.get('deviations') for result in node_results):
+            return self._evaluate_agent4_from_json(node_results)
+
         content = self.read_file('Agent4.txt')
         if not content:
             return {'error': '파일 없음'}
+        return self._evaluate_agent4_from_text(content)
+
+    def _evaluate_agent4_from_json(self, node_results):
+        """Agent 4: 모든 노드의 구조화된 deviation을 하나의 DataFrame으로 평가"""
+        records = [
+            {
+                'node_id': result.get('node_id'),
+                'parameter': str(dev.get('parameter', '')).strip(),
+                'guideword': str(dev.get('guideword', '')).strip(),
+                'description': str(dev.get('description', '')),
+            }
+            for result in node_results
+            for dev in result.get('deviations', [])
+        ]
+        df = pd.DataFrame.from_records(records)
+
+        # 가이드워드 표기 통일 (대소문자 무시), 표준 가이드워드만 커버리지에 반영
+        df['guideword'] = df['guideword'].str.lower().map(_GUIDEWORD_LOOKUP)
+        valid = df.dropna(subset=['guideword'])
+
+        # (노드, 변수)별 커버된 가이드워드 수
+        coverage = valid.groupby(['node_id', 'parameter'])['guideword'].nunique()
+        params_per_node = coverage.groupby(level='node_id').size()
+
+        # 변수별 가이드워드 (모든 노드 합집합)
+        guidewords_by_param = valid.groupby('parameter')['guideword'].agg(
+            lambda gws: [gw for gw in GUIDEWORDS if gw in set(gws)]
+        )
+        deviations_by_param = {
+            param: {'guidewords_covered': len(gws), 'guidewords': gws}
+            for param, gws in guidewords_by_param.items()
+        }
+
+        covered_by_node_param = valid.groupby(['node_id', 'parameter'])['guideword'].agg(set)
+        hits, possible = completeness_counts(
+            ((param, gws) for (_, param), gws in covered_by_node_param.items()), self.guideword_matrix
+        )
+
+        deviations_by_node = df.groupby('node_id').size()
+        detailed = df['description'].str.len().to_numpy() >= 20
+
+        evaluation = {
+            'source': 'json',
+            'node_count': len(node_results),
+            'parameter_count': len(deviations_by_param),
+            'total_deviations': len(df),
+            'deviations_by_parameter': deviations_by_param,
+            'deviations_by_node': {str(k): int(v) for k, v in deviations_by_node.items()},
+            'avg_guidewords_per_param': float(coverage.mean()) if len(coverage) else 0,
+            'detailed_description_ratio': float(detailed.mean()) if len(detailed) else 0,
+
+            # 품질 점수 (노드별 점수의 평균)
+            'coverage_score': float(np.minimum(100, params_per_node.to_numpy() / 4 * 100).mean()) if len(params_per_node) else 0,
+            'applicable_combinations': possible,
+            'completeness_score': float(hits / possible * 100) if possible else 0,
+            'detail_score': float(detailed.mean() * 100) if len(detailed) else 0,
+        }
 
-        # 가이드워드별 이탈 개수
-        guidewords = ['None', 'More', 'Less', 'As well as', 'Other than', 'Part of', 'Reverse']
+        evaluation['total_score'] = (
+            evaluation['coverage_score'] * 0.3 +
+            evaluation['completeness_score'] * 0.4 +
+            evaluation['detail_score'] * 0.3
+        )
+
+        return evaluation
+
+    def _evaluate_agent4_from_text(self, content):
+        """Agent 4: 마크다운 텍스트 정규식 기반 평가 (폴백)"""
 
         # 각 공정변수별 이탈 개수 세기
-        param_sections = re.split(r'####\s*(Flow|Pressure|Temperature|Composition|Level|Phase|Viscosity)', content)
+        param_sections = PARAM_SECTION_PATTERN.split(content)
 
         deviations_by_param = {}
         total_deviations = 0
@@ -212,25 +444,29 @@ class HAZOPQualityEvaluator:
                 param = param_sections[i]
                 section = param_sections[i+1]
 
-                # 각 가이드워드 개수 세기
-                deviations = []
-                for gw in guidewords:
-                    # "1. None" 또는 "None:" 형태 찾기
-                    pattern = rf'\d+\.\s*{gw}\s*\n\s*-'
-                    matches = len(re.findall(pattern, section, re.IGNORECASE))
-                    if matches > 0:
-                        deviations.append(gw)
-                        total_deviations += matches
+                # 각 가이드워드 개수 세기 ("1. None" 다음 줄 "-" 형태, 단일 패턴으로 한 번에 스캔)
+                gw_counts = {}
+                for gw in GUIDEWORD_ITEM_PATTERN.findall(section):
+                    gw = _GUIDEWORD_LOOKUP[gw.lower()]
+                    gw_counts[gw] = gw_counts.get(gw, 0) + 1
+
+                deviations = [gw for gw in GUIDEWORDS if gw in gw_counts]
+                total_deviations += sum(gw_counts.values())
 
                 deviations_by_param[param] = {
                     'guidewords_covered': len(deviations),
                     'guidewords': deviations
                 }
 
+        hits, possible = completeness_counts(
+            ((param, d['guidewords']) for param, d in deviations_by_param.items()), self.guideword_matrix
+        )
+
         # 이탈 설명의 구체성 평가 (예시 개수)
-        example_count = len(re.findall(r'-\s+[가-힣A-Za-z].{10,}', content))
+        example_count = len(EXAMPLE_PATTERN.findall(content))
 
         evaluation = {
+            'source': 'text',
             'parameter_count': len(deviations_by_param),
             'total_deviations': total_deviations,
             'deviations_by_parameter': deviations_by_param,
@@ -239,7 +475,8 @@ class HAZOPQualityEvaluator:
 
             # 품질 점수
             'coverage_score': (len(deviations_by_param) / 4) * 100 if deviations_by_param else 0,  # 최소 4개 변수
-            'completeness_score': (sum(d['guidewords_covered'] for d in deviations_by_param.values()) / (len(deviations_by_param) * 7)) * 100 if deviations_by_param else 0,
+            'applicable_combinations': possible,
+            'completeness_score': (hits / possible) * 100 if possible else 0,  # 적용 가능 조합 대비
             'detail_score': min(100, example_count / len(deviations_by_param) * 10) if deviations_by_param else 0,
         }
 
@@ -263,16 +500,17 @@ class HAZOPQualityEvaluator:
         consequence_keywords = ['결과:', 'consequence:', '위험', '폭발', '누출', '중단', '손상']
         safeguard_keywords = ['안전장치:', 'safeguard:', '경보', 'alarm', '차단', 'interlock', 'relief', 'PSV', '모니터링', '센서']
 
-        cause_count = sum(content.lower().count(kw.lower()) for kw in cause_keywords)
-        consequence_count = sum(content.lower().count(kw.lower()) for kw in consequence_keywords)
-        safeguard_count = sum(content.lower().count(kw.lower()) for kw in safeguard_keywords)
+        content_lower = content.lower()
+        cause_count = sum(content_lower.count(kw.lower()) for kw in cause_keywords)
+        consequence_count = sum(content_lower.count(kw.lower()) for kw in consequence_keywords)
+        safeguard_count = sum(content_lower.count(kw.lower()) for kw in safeguard_keywords)
 
         # 이탈별 분석 개수
-        deviation_sections = re.split(r'\d+\.\s*(No |More |Less |Reverse )', content)
+        deviation_sections = DEVIATION_SPLIT_PATTERN.split(content)
         analyzed_deviations = (len(deviation_sections) - 1) // 2 if len(deviation_sections) > 1 else 0
 
         # 구체적인 기기명 언급 (예: PT-1102, TC-1101)
-        equipment_mentions = len(re.findall(r'[A-Z]{1,3}-\d{4}', content))
+        equipment_mentions = len(EQUIPMENT_TAG_PATTERN.findall(content))
 
         # 개선사항 제안 여부
         improvement_keywords = ['개선', 'improvement', '추가', '설치', '이중화', '정기점검']
@@ -362,15 +600,22 @@ class HAZOPQualityEvaluator:
         print(f"  HAZOP 분석 품질 평가: {self.result_dir}")
         print(f"{'='*60}\n")
 
-        evaluations = {
-            'Agent1_공정요소': self.evaluate_agent1_process_elements(),
-            'Agent2_노드분리': self.evaluate_agent2_node_separation(),
-            'Agent3_공정변수': self.evaluate_agent3_process_parameters(),
-            'Agent4_이탈시나리오': self.evaluate_agent4_deviations(),
-            'Agent5_안전장치': self.evaluate_agent5_safeguards(),
-            'Agent6_최종테이블': self.evaluate_agent6_final_table(),
+        # 모든 결과 파일을 한 번에 읽은 뒤 Agent별 평가를 동시에 실행
+        self.load_documents()
+
+        evaluators = {
+            'Agent1_공정요소': self.evaluate_agent1_process_elements,
+            'Agent2_노드분리': self.evaluate_agent2_node_separation,
+            'Agent3_공정변수': self.evaluate_agent3_process_parameters,
+            'Agent4_이탈시나리오': self.evaluate_agent4_deviations,
+            'Agent5_안전장치': self.evaluate_agent5_safeguards,
+            'Agent6_최종테이블': self.evaluate_agent6_final_table,
         }
 
+        with ThreadPoolExecutor(max_workers=len(evaluators)) as executor:
+            futures = {name: executor.submit(func) for name, func in evaluators.items()}
+            evaluations = {name: future.result() for name, future in futures.items()}
+
         # 전체 점수 계산 (각 Agent 가중 평균)
         total_score = sum(e.get('total_score', 0) for e in evaluations.values()) / len(evaluations)
 
@@ -439,6 +684,21 @@ class HAZOPQualityEvaluator:
         except Exception as e:
             print(f"보고서 저장 실패: {e}")
 
+        self.record_to_registry(output_path)
+
+    def record_to_registry(self, report_path=None):
+        """평가 점수를 실행 이력 레지스트리에 기록 (해당 디렉토리의 최근 실행과 연결)"""
+        registry = get_registry()
+        if registry is None:
+            return
+        try:
+            run_id = os.environ.get('HAZOP_RUN_ID') or registry.latest_run_id(self.result_dir)
+            registry.record_evaluation(self.result_dir, self.evaluation_results, run_id, report_path)
+        except Exception as e:
+            print(f"[WARNING] 평가 점수 레지스트리 기록 실패: {e}")
+        finally:
+            registry.close()
+
 
 def compare_two_results(dir1, dir2):
     """두 결과의 품질 비교"""
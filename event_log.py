@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+HAZOP 실행 이벤트 스트림 (JSONL)
+이벤트가 발생할 때마다 한 줄씩 기록하고 즉시 flush하여, 실행 도중 프로세스가 죽어도
+그때까지의 타이밍이 남습니다. 파일 크기가 커지면 순환(.1, .2, ...)하며 메모리에는 보관하지 않습니다.
+
+사용 예:
+    python event_log.py <events.jsonl>            # 기록된 이벤트 출력
+    python event_log.py <events.jsonl> --follow   # 실행 중인 로그 실시간 추적
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+
+from config import config
+
+
+class EventLogger:
+    """스레드 안전 JSONL 이벤트 기록기 (이벤트마다 flush, 크기 기반 순환)"""
+
+    def __init__(self, path, run_id=None, max_bytes=None, backup_count=None):
+        self.path = path
+        self.run_id = run_id
+        self.max_bytes = max_bytes if max_bytes is not None else config.EVENT_LOG_MAX_BYTES
+        self.backup_count = backup_count if backup_count is not None else config.EVENT_LOG_BACKUP_COUNT
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        self._seq = 0
+        # 이벤트 간 간격은 시스템 시계 변경에 영향받지 않는 monotonic 시간으로 기록
+        self._mono_start = time.monotonic()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def emit(self, event_type, **fields):
+        """
+        이벤트 1건 기록
+
+        Args:
+            event_type: 'run_start', 'step_start', 'step_end', 'run_end' 등
+            fields: agent, node, status, message, elapsed_time 등 추가 필드
+
+        Returns:
+            기록된 이벤트 딕셔너리
+        """
+        with self._lock:
+            self._seq += 1
+            event = {
+                'seq': self._seq,
+                'timestamp': datetime.now().isoformat(),
+                'mono': round(time.monotonic() - self._mono_start, 6),
+                'run_id': self.run_id,
+                'event': event_type,
+            }
+            event.update(fields)
+
+            self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+        return event
+
+    def _rotate(self):
+        """현재 파일을 .1로 옮기고 새 파일 시작 (.N은 backup_count까지 보관)"""
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        """파일 닫기"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def tail_text(text, limit=None):
+    """긴 출력의 마지막 부분만 반환 (오류 원인은 보통 끝에 있음)"""
+    limit = limit or config.STEP_OUTPUT_TAIL_CHARS
+    if not text or len(text) <= limit:
+        return text or ''
+    return '...' + text[-limit:]
+
+
+def write_step_output(directory, step_name, stdout, stderr):
+    """단계별 stdout/stderr 전체를 파일로 저장, 경로 반환"""
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    output_path = os.path.join(directory, f"{step_name}.log")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("===== STDOUT =====\n")
+        f.write(stdout or '')
+        f.write("\n===== STDERR =====\n")
+        f.write(stderr or '')
+    return output_path
+
+
+def rotated_files(path):
+    """순환된 파일 포함 전체 로그 파일 (오래된 순)"""
+    backups = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        backups.append(f"{path}.{index}")
+        index += 1
+    files = list(reversed(backups))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def _parse_line(line):
+    """JSONL 한 줄 파싱 (기록 중 잘린 줄은 None)"""
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+def read_events(path):
+    """기록된 이벤트를 순서대로 반환 (제너레이터, 순환 파일 포함)"""
+    for file_path in rotated_files(path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                event = _parse_line(line)
+                if event is not None:
+                    yield event
+
+
+def follow(path, poll_interval=0.5, from_start=True, stop=None):
+    """
+    실행 중인 이벤트 로그 실시간 추적 (tail -F)
+
+    파일이 순환되어 교체되면 새 파일을 다시 엽니다.
+
+    Args:
+        path: 이벤트 로그 경로
+        poll_interval: 새 이벤트 확인 간격 (초)
+        from_start: True면 기존 이벤트부터, False면 새 이벤트만
+        stop: 호출 시 True를 반환하면 추적 종료 (None이면 run_end 이벤트에서 종료)
+    """
+    while not os.path.exists(path):
+        if stop and stop():
+            return
+        time.sleep(poll_interval)
+
+    f = open(path, 'r', encoding='utf-8')
+    inode = os.fstat(f.fileno()).st_ino
+    if not from_start:
+        f.seek(0, os.SEEK_END)
+
+    buffer = ''
+    try:
+        while True:
+            chunk = f.readline()
+            if chunk:
+                buffer += chunk
+                if not buffer.endswith('\n'):
+                    continue  # 아직 기록 중인 줄
+                event = _parse_line(buffer)
+                buffer = ''
+                if event is None:
+                    continue
+                yield event
+                if stop is None and event.get('event') == 'run_end':
+                    return
+                continue
+
+            if stop and stop():
+                return
+
+            # 순환 감지: 경로의 파일이 바뀌었으면 새 파일을 처음부터 읽기
+            try:
+                if os.stat(path).st_ino != inode:
+                    f.close()
+                    f = open(path, 'r', encoding='utf-8')
+                    inode = os.fstat(f.fileno()).st_ino
+                    buffer = ''
+                    continue
+            except FileNotFoundError:
+                pass
+            time.sleep(poll_interval)
+    finally:
+        f.close()
+
+
+def format_event(event):
+    """콘솔 출력용 한 줄 요약"""
+    parts = [f"[{event.get('timestamp', '')}]", f"+{event.get('mono', 0):.1f}s", event.get('event', '')]
+    if event.get('agent_name'):
+        parts.append(event['agent_name'])
+    if event.get('status'):
+        parts.append(event['status'])
+    if event.get('elapsed_time') is not None:
+        parts.append(f"({event['elapsed_time']:.2f}초)")
+    if event.get('message'):
+        parts.append(f"- {event['message']}")
+    return ' '.join(parts)
+
+
+def main():
+    """메인 실행 함수"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HAZOP 실행 이벤트 로그 조회')
+    parser.add_argument('path', help='이벤트 로그 경로 (logs/events_*.jsonl)')
+    parser.add_argument('--follow', action='store_true', help='실행 중인 로그 실시간 추적')
+    args = parser.parse_args()
+
+    try:
+        events = follow(args.path) if args.follow else read_events(args.path)
+        for event in events:
+            print(format_event(event))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,7 +9,7 @@ import json
 from config import config
 from hazop_utils import (
     encode_image,
-    call_openai_api,
+    call_openai_json,
     create_vision_payload,
     write_txt,
     get_output_path
@@ -118,8 +118,8 @@ P&ID 이미지를 분석하여 JSON으로 출력하세요.
 print("[INFO] Agent 1 실행 중: P&ID 구성요소 식별...")
 print(f"[INFO] 분석 대상: {config.HAZOP_OBJECT}")
 
-payload = create_vision_payload(system_prompt, input_, base64_image, max_tokens=8000)
-content = call_openai_api(payload, timeout=180)
+payload = create_vision_payload(system_prompt, input_, base64_image, max_tokens=8000, schema='agent1')
+content, _ = call_openai_json(payload, 'agent1', timeout=180)
 
 # 응답 출력
 print("\n" + "="*60)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+공정 변수 × 가이드워드 적용 가능 행렬
+Agent4가 모든 변수 × 7개 가이드워드를 검토한 뒤 스스로 걸러내는 대신,
+물리적으로 의미 없는 조합(예: Reverse Temperature, Part of Level)을 프롬프트 전에 제외합니다.
+
+- 행렬은 GUIDEWORD_MATRIX_PATH(JSON)에 저장되며, 파일이 없으면 기본 행렬로 생성 → 편집하여 재사용
+- 형식: {"공정 변수": ["적용 가능한 가이드워드", ...], "*": [...]}  ("*"는 행렬에 없는 변수)
+- 변수 이름은 대소문자 구분 없이 비교
+
+사용 예:
+    python guideword_matrix.py                       # 현재 행렬과 변수별 조합 수
+    python guideword_matrix.py Flow Temperature Level  # 주어진 변수의 적용 조합
+"""
+
+import os
+import sys
+import json
+
+from config import config
+
+
+GUIDEWORDS = ['None', 'More', 'Less', 'As well as', 'Other than', 'Part of', 'Reverse']
+
+# 기본 행렬 (HAZOP 표준 조합 기준)
+DEFAULT_MATRIX = {
+    'Flow': GUIDEWORDS,
+    'Pressure': ['None', 'More', 'Less'],
+    'Temperature': ['More', 'Less'],
+    'Level': ['None', 'More', 'Less'],
+    'Composition': ['More', 'Less', 'As well as', 'Other than', 'Part of'],
+    'Phase': ['As well as', 'Other than', 'Part of'],
+    'Viscosity': ['More', 'Less'],
+    'Reaction': GUIDEWORDS,
+    'Mixing': ['None', 'More', 'Less', 'Part of'],
+    'Corrosion/Erosion': ['More', 'Less'],
+    'Maintenance': ['None', 'More', 'Less', 'Other than', 'Part of'],
+    '*': GUIDEWORDS,
+}
+
+
+def load_matrix(path=None):
+    """
+    적용 가능 행렬 로드 (파일이 없으면 기본 행렬을 저장 후 반환)
+
+    Returns:
+        {공정 변수(소문자): [가이드워드, ...]} 딕셔너리
+    """
+    path = path or config.GUIDEWORD_MATRIX_PATH
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            matrix = json.load(f)
+    else:
+        matrix = DEFAULT_MATRIX
+        save_matrix(matrix, path)
+        print(f"[INFO] 가이드워드 행렬 생성: {path}")
+
+    normalized = {}
+    for parameter, guidewords in matrix.items():
+        unknown = [g for g in guidewords if g not in GUIDEWORDS]
+        if unknown:
+            print(f"[WARNING] 가이드워드 행렬의 알 수 없는 가이드워드 무시 ({parameter}): {', '.join(unknown)}")
+        normalized[parameter.strip().lower()] = [g for g in GUIDEWORDS if g in guidewords]
+    normalized.setdefault('*', list(GUIDEWORDS))
+    return normalized
+
+
+def save_matrix(matrix, path=None):
+    """행렬을 JSON으로 저장"""
+    path = path or config.GUIDEWORD_MATRIX_PATH
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(matrix, f, ensure_ascii=False, indent=2)
+
+
+def applicable_guidewords(parameter, matrix):
+    """공정 변수에 적용 가능한 가이드워드 목록"""
+    return matrix.get(str(parameter).strip().lower(), matrix['*'])
+
+
+def combinations(parameters, matrix):
+    """공정 변수별 적용 가능한 가이드워드 [(변수, [가이드워드, ...]), ...] (적용 가능한 것이 없는 변수 제외)"""
+    result = []
+    for parameter in parameters:
+        guidewords = applicable_guidewords(parameter, matrix)
+        if guidewords:
+            result.append((parameter, guidewords))
+    return result
+
+
+def is_applicable(parameter, guideword, matrix):
+    """(변수, 가이드워드) 조합 적용 가능 여부 (가이드워드 대소문자 무시)"""
+    lowered = str(guideword).strip().lower()
+    return any(g.lower() == lowered for g in applicable_guidewords(parameter, matrix))
+
+
+def main():
+    """메인 실행 함수: 행렬 또는 주어진 변수의 적용 조합 출력"""
+    matrix = load_matrix()
+    parameters = sys.argv[1:] or [p for p in DEFAULT_MATRIX if p != '*']
+    total = 0
+    print(f"\n{config.GUIDEWORD_MATRIX_PATH}")
+    for parameter, guidewords in combinations(parameters, matrix):
+        total += len(guidewords)
+        print(f"  {parameter:<18} {len(guidewords)}/{len(GUIDEWORDS)}  {', '.join(guidewords)}")
+    print(f"\n검토 조합: {total}/{len(parameters) * len(GUIDEWORDS)}개")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Agent 응답 JSON 스키마 (structured output + 클라이언트 검증)
+Agent1~5가 프롬프트에서 요구하는 JSON 형식을 JSON Schema로 정의합니다.
+
+- STRUCTURED_OUTPUT=true이면 payload에 response_format(json_schema, strict)을 넣어 모델 출력 자체를 스키마로 제한
+- 설정과 관계없이 응답은 validate()로 검증하고, 실패하면 오류 위치를 알려주고 다시 요청 (hazop_utils.call_openai_json)
+- strict 모드 규칙: 모든 속성 required, additionalProperties false, 선택 필드는 null 허용 타입
+  (클라이언트 검증에서는 null 허용 필드가 없어도 유효 - 프롬프트가 바뀐 필드만 요구하는 agent5_adapt 등)
+
+사용 예:
+    python hazop_schemas.py agent4 ./output/Agent4_node1.json   # 파일을 스키마로 검증
+"""
+
+import sys
+import json
+
+from guideword_matrix import GUIDEWORDS
+
+
+MAX_REPORTED_ERRORS = 10  # 재요청 프롬프트에 포함할 최대 오류 수
+
+
+def _object(properties):
+    """strict 모드 객체 스키마 (모든 속성 필수, 추가 속성 불가)"""
+    return {
+        'type': 'object',
+        'properties': properties,
+        'required': list(properties),
+        'additionalProperties': False,
+    }
+
+
+def _array(items):
+    return {'type': 'array', 'items': items}
+
+
+STRING = {'type': 'string'}
+INTEGER = {'type': 'integer'}
+STRING_LIST = _array(STRING)
+GUIDEWORD = {'type': 'string', 'enum': GUIDEWORDS}
+PROBABILITY_SCORE = {'type': 'integer', 'minimum': 1, 'maximum': 10}
+SEVERITY = {'type': 'string', 'enum': ['High', 'Medium', 'Low']}
+
+AGENT3_NODE = _object({
+    'node_id': INTEGER,
+    'node_name': STRING,
+    'applicable_parameters': _array(_object({
+        'parameter': STRING,
+        'applicable': {'type': 'boolean'},
+        'reason': STRING,
+    })),
+    'selected_parameters': STRING_LIST,
+    'total_count': INTEGER,
+})
+
+# 스키마 이름 → JSON Schema (이름은 response_format의 json_schema.name으로도 사용)
+SCHEMAS = {
+    'agent1': _object({
+        'equipment_list': _array(_object({'tag': STRING, 'type': STRING, 'location': STRING})),
+        'instrument_list': _array(_object({'tag': STRING, 'type': STRING, 'measured_equipment': STRING})),
+        'total_count': _object({'equipment': INTEGER, 'instruments': INTEGER}),
+    }),
+    'agent2': _object({
+        'nodes': _array(_object({
+            'node_id': INTEGER,
+            'node_name': STRING,
+            'design_intent': STRING,
+            'equipment_tags': STRING_LIST,
+            'instrument_tags': STRING_LIST,
+            'boundary': _object({'inlet': STRING, 'outlet': STRING}),
+        })),
+        'total_nodes': INTEGER,
+    }),
+    'agent3': AGENT3_NODE,
+    'agent3_batch': _object({'nodes': _array(AGENT3_NODE)}),
+    'agent4': _object({
+        'node_id': INTEGER,
+        'node_name': STRING,
+        'deviations': _array(_object({
+            'parameter': STRING,
+            'guideword': GUIDEWORD,
+            'deviation': STRING,
+            'description': STRING,
+            'probability_score': PROBABILITY_SCORE,
+        })),
+    }),
+    'agent4_scores': _object({
+        'scores': _array(_object({'deviation_id': INTEGER, 'probability_score': PROBABILITY_SCORE})),
+    }),
+    'agent5': _object({
+        'node_id': INTEGER,
+        'node_name': STRING,
+        'hazop_analysis': _array(_object({
+            'deviation_id': INTEGER,
+            'parameter': STRING,
+            'guideword': GUIDEWORD,
+            'deviation': STRING,
+            'causes': STRING_LIST,
+            'consequences': STRING_LIST,
+            'severity': SEVERITY,
+            'safeguards': STRING_LIST,
+            'recommendations': STRING_LIST,
+        })),
+    }),
+    'agent5_adapt': _object({
+        'adapted': _array(_object({
+            'deviation_id': INTEGER,
+            'causes': {'type': ['array', 'null'], 'items': STRING},
+            'consequences': {'type': ['array', 'null'], 'items': STRING},
+            'severity': {'type': ['string', 'null'], 'enum': ['High', 'Medium', 'Low', None]},
+            'safeguards': {'type': ['array', 'null'], 'items': STRING},
+            'recommendations': {'type': ['array', 'null'], 'items': STRING},
+        })),
+    }),
+}
+
+_TYPE_CHECKS = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+    'null': lambda v: v is None,
+}
+
+
+def response_format(name):
+    """payload의 response_format (json_schema, strict)"""
+    return {
+        'type': 'json_schema',
+        'json_schema': {'name': name, 'strict': True, 'schema': SCHEMAS[name]},
+    }
+
+
+def _nullable(schema):
+    """null을 허용하는 필드인지 (strict 모드의 선택 필드)"""
+    types = schema.get('type')
+    return 'null' in types if isinstance(types, list) else types == 'null'
+
+
+def validate(data, schema, path='$'):
+    """
+    JSON Schema 부분 집합(type, properties, required, items, enum, minimum, maximum) 검증
+    null 허용 필드는 required여도 누락을 허용 (strict 모드 선택 필드)
+
+    Returns:
+        오류 메시지 리스트 (비어 있으면 유효)
+    """
+    errors = []
+    types = schema.get('type')
+    if types:
+        types = types if isinstance(types, list) else [types]
+        if not any(_TYPE_CHECKS[t](data) for t in types):
+            return [f"{path}: {'/'.join(types)} 타입이어야 함 (현재 {type(data).__name__})"]
+    # enum 문자열은 대소문자 무시 (As Well As = As well as)
+    if 'enum' in schema and str(data).lower() not in [str(v).lower() for v in schema['enum']]:
+        errors.append(f"{path}: {', '.join(str(v) for v in schema['enum'] if v is not None)} 중 하나여야 함 (현재 {data!r})")
+    if isinstance(data, (int, float)) and not isinstance(data, bool):
+        if 'minimum' in schema and data < schema['minimum']:
+            errors.append(f"{path}: {schema['minimum']} 이상이어야 함 (현재 {data})")
+        if 'maximum' in schema and data > schema['maximum']:
+            errors.append(f"{path}: {schema['maximum']} 이하여야 함 (현재 {data})")
+
+    if isinstance(data, dict):
+        properties = schema.get('properties', {})
+        for key in schema.get('required', []):
+            if key not in data and not _nullable(properties.get(key, {})):
+                errors.append(f"{path}.{key}: 필수 필드 누락")
+        for key, value in data.items():
+            # 정의되지 않은 추가 필드는 허용 (strict 모드에서는 서버가 차단)
+            if key in properties:
+                errors += validate(value, properties[key], f"{path}.{key}")
+    elif isinstance(data, list) and 'items' in schema:
+        for i, item in enumerate(data):
+            errors += validate(item, schema['items'], f"{path}[{i}]")
+    return errors
+
+
+def extract_json_text(content):
+    """LLM 응답에서 JSON 문자열 추출 (```json 블록 지원)"""
+    if "```json" in content:
+        return content.split("```json")[1].split("```")[0].strip()
+    if "```" in content:
+        return content.split("```")[1].split("```")[0].strip()
+    return content.strip()
+
+
+def parse_and_validate(content, name):
+    """
+    응답 파싱 + 스키마 검증
+
+    Returns:
+        (파싱된 데이터 또는 None, 오류 메시지 리스트)
+    """
+    try:
+        data = json.loads(extract_json_text(content or ''))
+    except json.JSONDecodeError as e:
+        return None, [f"JSON 파싱 실패: {e}"]
+    return data, validate(data, SCHEMAS[name])
+
+
+def retry_prompt(errors):
+    """검증 실패 시 재요청 메시지 (오류 위치만 알려주고 전체 JSON 재출력 요청)"""
+    listed = '\n'.join(f"- {error}" for error in errors[:MAX_REPORTED_ERRORS])
+    more = f"\n- 외 {len(errors) - MAX_REPORTED_ERRORS}개" if len(errors) > MAX_REPORTED_ERRORS else ''
+    return f"""이전 응답이 요청한 JSON 형식과 맞지 않습니다.
+
+## 오류
+{listed}{more}
+
+오류를 고친 전체 JSON만 다시 출력하세요. 나머지 내용은 이전 응답과 같게 유지하세요."""
+
+
+def main():
+    """메인 실행 함수: JSON 파일을 스키마로 검증"""
+    if len(sys.argv) < 3 or sys.argv[1] not in SCHEMAS:
+        print(f"사용법: python hazop_schemas.py <{'|'.join(SCHEMAS)}> <JSON 파일> [파일 ...]")
+        return 1
+    failed = 0
+    for path in sys.argv[2:]:
+        with open(path, 'r', encoding='utf-8') as f:
+            _, errors = parse_and_validate(f.read(), sys.argv[1])
+        if errors:
+            failed += 1
+            print(f"[ERROR] {path}: 오류 {len(errors)}개")
+            for error in errors[:MAX_REPORTED_ERRORS]:
+                print(f"  - {error}")
+        else:
+            print(f"[SUCCESS] {path}: 유효")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+HAZOP 결과 유사도 계산 엔진
+토큰 단위 diff, shingle 기반 MinHash 근사 유사도, JSON 구조 비교를 제공합니다.
+"""
+
+import re
+import json
+import heapq
+import bisect
+import hashlib
+from collections import Counter
+from difflib import SequenceMatcher
+
+
+# 단어/숫자/태그(BL-1101 등)와 개별 기호를 토큰으로 분리
+TOKEN_PATTERN = re.compile(r'\w+(?:[-.]\w+)*|[^\w\s]', re.UNICODE)
+
+# 토큰 diff를 직접 수행할 최대 블록 크기 (토큰 수 곱, 넘으면 블록을 MinHash로 추정)
+TOKEN_BLOCK_LIMIT = 4_000_000
+
+# 줄 정렬을 difflib로 직접 수행할 최대 구간 크기 (줄 수 곱, 넘으면 고유 줄 기준점으로 분할)
+LINE_BLOCK_LIMIT = 1_000_000
+
+# 이 크기(문자 수)를 넘으면 MinHash 근사 유사도를 기본값으로 사용
+EXACT_DIFF_MAX_CHARS = 2_000_000
+
+# MinHash 기본 설정
+SHINGLE_SIZE = 5
+BLOCK_SHINGLE_SIZE = 2  # 대형 diff 블록 추정용 (토큰 단위 일치율에 가장 가까움)
+MINHASH_SIZE = 256
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+# 리스트 항목을 정렬/매칭할 때 사용하는 식별 키 (우선순위 순)
+JSON_IDENTITY_KEYS = [
+    ('node_id',),
+    ('deviation_id',),
+    ('tag',),
+    ('parameter', 'guideword'),
+    ('parameter',),
+]
+
+
+# ========== 토큰화 ==========
+
+def tokenize(text):
+    """텍스트를 토큰 리스트로 분리"""
+    return TOKEN_PATTERN.findall(text) if text else []
+
+
+# ========== 토큰 단위 diff ==========
+
+def _count_matched_tokens(tokens1, tokens2):
+    """
+    두 토큰 리스트의 일치 토큰 수
+
+    블록이 TOKEN_BLOCK_LIMIT 이하면 difflib 매칭 블록 합 (autojunk 비활성화로 정확도 유지),
+    넘으면 shingle MinHash로 추정한 Jaccard 유사도를 일치 토큰 수로 환산합니다.
+    """
+    if not tokens1 or not tokens2:
+        return 0
+
+    if len(tokens1) * len(tokens2) <= TOKEN_BLOCK_LIMIT:
+        matcher = SequenceMatcher(None, tokens1, tokens2, autojunk=False)
+        return sum(block.size for block in matcher.get_matching_blocks())
+
+    # Jaccard(J) → Dice(2J/(1+J)) → 일치 토큰 수
+    jaccard = minhash_similarity(
+        _bottom_k(_token_shingles(tokens1, BLOCK_SHINGLE_SIZE)),
+        _bottom_k(_token_shingles(tokens2, BLOCK_SHINGLE_SIZE))
+    ) / 100
+    dice = 2 * jaccard / (1 + jaccard)
+    return int(round(dice * (len(tokens1) + len(tokens2)) / 2))
+
+
+def _unique_anchors(lines1, i1, i2, lines2, j1, j2):
+    """
+    양쪽 구간에 한 번씩만 나오는 줄 중 순서가 일치하는 최장 부분열 [(i, j), ...]
+    (patience diff 기준점)
+    """
+    counts1 = Counter(lines1[i1:i2])
+    counts2 = Counter(lines2[j1:j2])
+    position2 = {lines2[j]: j for j in range(j1, j2) if counts2[lines2[j]] == 1}
+    pairs = [(i, position2[lines1[i]]) for i in range(i1, i2)
+             if counts1[lines1[i]] == 1 and lines1[i] in position2]
+
+    # j 기준 최장 증가 부분열 (patience sorting)
+    tails, tail_index, previous = [], [], [None] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[pos] = j
+            tail_index[pos] = k
+        previous[k] = tail_index[pos - 1] if pos else None
+
+    anchors = []
+    k = tail_index[-1] if tail_index else None
+    while k is not None:
+        anchors.append(pairs[k])
+        k = previous[k]
+    anchors.reverse()
+    return anchors
+
+
+def _align_lines(lines1, i1, i2, lines2, j1, j2, opcodes):
+    """
+    줄 구간 정렬 결과를 opcodes에 추가 (difflib get_opcodes 형식)
+
+    구간이 LINE_BLOCK_LIMIT 이하면 difflib, 넘으면 고유 줄 기준점으로 나누어 재귀 정렬합니다.
+    변경이 흩어진 대용량 텍스트에서 difflib의 제곱 시간을 피하기 위함입니다.
+    """
+    # 공통 앞/뒤 줄
+    start1, start2 = i1, j1
+    while i1 < i2 and j1 < j2 and lines1[i1] == lines2[j1]:
+        i1 += 1
+        j1 += 1
+    if i1 > start1:
+        opcodes.append(('equal', start1, i1, start2, j1))
+    end1, end2 = i2, j2
+    while i2 > i1 and j2 > j1 and lines1[i2 - 1] == lines2[j2 - 1]:
+        i2 -= 1
+        j2 -= 1
+
+    if i1 == i2 or j1 == j2:
+        if i1 < i2:
+            opcodes.append(('delete', i1, i2, j1, j1))
+        elif j1 < j2:
+            opcodes.append(('insert', i1, i1, j1, j2))
+    elif (i2 - i1) * (j2 - j1) <= LINE_BLOCK_LIMIT:
+        matcher = SequenceMatcher(None, lines1[i1:i2], lines2[j1:j2], autojunk=False)
+        for tag, a1, a2, b1, b2 in matcher.get_opcodes():
+            opcodes.append((tag, i1 + a1, i1 + a2, j1 + b1, j1 + b2))
+    else:
+        anchors = _unique_anchors(lines1, i1, i2, lines2, j1, j2)
+        if not anchors:
+            opcodes.append(('replace', i1, i2, j1, j2))
+        else:
+            prev1, prev2 = i1, j1
+            for a, b in anchors:
+                if a > prev1 or b > prev2:
+                    _align_lines(lines1, prev1, a, lines2, prev2, b, opcodes)
+                opcodes.append(('equal', a, a + 1, b, b + 1))
+                prev1, prev2 = a + 1, b + 1
+            if prev1 < i2 or prev2 < j2:
+                _align_lines(lines1, prev1, i2, lines2, prev2, j2, opcodes)
+
+    if i2 < end1:
+        opcodes.append(('equal', i2, end1, j2, end2))
+
+
+def token_diff_similarity(text1, text2):
+    """
+    토큰 단위 diff 기반 유사도 (0-100)
+
+    먼저 줄 단위로 정렬하여 동일한 줄은 토큰 수만 합산하고,
+    변경된 줄 블록에 대해서만 토큰 diff를 수행합니다.
+    한 글자 삽입으로 전체가 어긋나는 위치 비교 방식의 문제를 해결합니다.
+    """
+    if text1 == text2:
+        return 100.0 if text1 else 0.0
+    if not text1 or not text2:
+        return 0.0
+
+    lines1 = text1.splitlines()
+    lines2 = text2.splitlines()
+    # 반복되는 줄(JSON 괄호, 공통 문구 등)은 한 번만 토큰화
+    line_cache = {}
+    line_tokens1 = [line_cache.get(line) or line_cache.setdefault(line, tokenize(line)) for line in lines1]
+    line_tokens2 = [line_cache.get(line) or line_cache.setdefault(line, tokenize(line)) for line in lines2]
+
+    total = sum(len(t) for t in line_tokens1) + sum(len(t) for t in line_tokens2)
+    if total == 0:
+        return 0.0
+
+    matched = 0
+    opcodes = []
+    _align_lines(lines1, 0, len(lines1), lines2, 0, len(lines2), opcodes)
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            matched += sum(len(t) for t in line_tokens1[i1:i2])
+        elif tag == 'replace':
+            block1 = [tok for t in line_tokens1[i1:i2] for tok in t]
+            block2 = [tok for t in line_tokens2[j1:j2] for tok in t]
+            matched += _count_matched_tokens(block1, block2)
+
+    return (2.0 * matched / total) * 100
+
+
+# ========== MinHash (bottom-k) ==========
+
+def _token_hash(token, cache):
+    """토큰을 안정적인 64비트 정수로 변환 (프로세스 간 동일)"""
+    value = cache.get(token)
+    if value is None:
+        digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+        value = int.from_bytes(digest, 'little')
+        cache[token] = value
+    return value
+
+
+def _token_shingles(tokens, shingle_size=SHINGLE_SIZE):
+    """토큰 리스트의 shingle 해시 집합 계산"""
+    cache = {}
+    token_ids = [_token_hash(tok, cache) for tok in tokens]
+    if not token_ids:
+        return set()
+    if len(token_ids) < shingle_size:
+        return {hash(tuple(token_ids)) & _MASK64}
+
+    # 정수 튜플의 hash는 PYTHONHASHSEED와 무관하게 결정적
+    return {
+        hash(tuple(token_ids[i:i + shingle_size])) & _MASK64
+        for i in range(len(token_ids) - shingle_size + 1)
+    }
+
+
+def _bottom_k(hashes, num_hashes=MINHASH_SIZE):
+    """해시 집합에서 가장 작은 해시 k개 (정렬됨)"""
+    return sorted(heapq.nsmallest(num_hashes, hashes))
+
+
+def shingle_hashes(text, shingle_size=SHINGLE_SIZE):
+    """토큰 shingle의 해시 집합 계산"""
+    return _token_shingles(tokenize(text), shingle_size)
+
+
+def minhash_signature(text, shingle_size=SHINGLE_SIZE, num_hashes=MINHASH_SIZE):
+    """bottom-k MinHash 시그니처 (가장 작은 해시 k개, 정렬됨)"""
+    return _bottom_k(shingle_hashes(text, shingle_size), num_hashes)
+
+
+def minhash_similarity(signature1, signature2, num_hashes=MINHASH_SIZE):
+    """두 MinHash 시그니처로 Jaccard 유사도 추정 (0-100)"""
+    if not signature1 or not signature2:
+        return 0.0
+
+    set1, set2 = set(signature1), set(signature2)
+    union_sketch = heapq.nsmallest(num_hashes, set1 | set2)
+    shared = sum(1 for h in union_sketch if h in set1 and h in set2)
+    return (shared / len(union_sketch)) * 100
+
+
+def approximate_similarity(text1, text2, shingle_size=SHINGLE_SIZE, num_hashes=MINHASH_SIZE):
+    """MinHash 기반 근사 유사도 (0-100)"""
+    if text1 == text2:
+        return 100.0 if text1 else 0.0
+    return minhash_similarity(
+        minhash_signature(text1, shingle_size, num_hashes),
+        minhash_signature(text2, shingle_size, num_hashes),
+        num_hashes
+    )
+
+
+# ========== JSON 구조 비교 ==========
+
+def extract_json(text):
+    """텍스트에서 JSON 객체 추출 (```json 블록 지원), 실패 시 None"""
+    if not text:
+        return None
+
+    if "```json" in text:
+        json_str = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        json_str = text.split("```")[1].split("```")[0].strip()
+    else:
+        json_str = text.strip()
+
+    if not json_str or json_str[0] not in '{[':
+        return None
+
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        return None
+
+
+def _identity_keys(items):
+    """리스트 항목 정렬에 사용할 식별 키 선택 (없으면 None)"""
+    if not items or not all(isinstance(item, dict) for item in items):
+        return None
+
+    for keys in JSON_IDENTITY_KEYS:
+        if not all(all(k in item for k in keys) for item in items):
+            continue
+        values = [tuple(str(item[k]) for k in keys) for item in items]
+        if len(set(values)) == len(values):
+            return keys
+    return None
+
+
+def flatten_json(obj, prefix=''):
+    """
+    JSON을 {경로: 스칼라 값} 딕셔너리로 평탄화
+
+    dict 리스트는 node_id, deviation_id, (parameter, guideword) 등
+    식별 키가 있으면 인덱스 대신 키로 경로를 만들어 항목 삽입/순서 변경에 강건합니다.
+    """
+    flat = {}
+
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            path = f"{prefix}.{key}" if prefix else str(key)
+            flat.update(flatten_json(value, path))
+        if not obj:
+            flat[prefix] = {}
+    elif isinstance(obj, list):
+        keys = _identity_keys(obj)
+        for index, item in enumerate(obj):
+            if keys:
+                label = ','.join(f"{k}={item[k]}" for k in keys)
+            else:
+                label = str(index)
+            flat.update(flatten_json(item, f"{prefix}[{label}]"))
+        if not obj:
+            flat[prefix] = []
+    else:
+        flat[prefix] = obj
+
+    return flat
+
+
+def _schema_path(path):
+    """경로에서 리스트 식별자를 제거한 스키마 경로"""
+    return re.sub(r'\[[^\]]*\]', '[*]', path)
+
+
+def compare_json_structures(obj1, obj2, sample_size=20):
+    """
+    두 JSON 객체의 구조 인식 비교
+
+    Returns:
+        추가/삭제/변경된 경로 수, 스키마 차이, 값 유사도(0-100)
+    """
+    flat1 = flatten_json(obj1)
+    flat2 = flatten_json(obj2)
+
+    keys1, keys2 = set(flat1), set(flat2)
+    added = sorted(keys2 - keys1)
+    removed = sorted(keys1 - keys2)
+    changed = sorted(k for k in keys1 & keys2 if flat1[k] != flat2[k])
+    unchanged = len(keys1 & keys2) - len(changed)
+    union = len(keys1 | keys2)
+
+    schema1 = {_schema_path(k) for k in keys1}
+    schema2 = {_schema_path(k) for k in keys2}
+
+    return {
+        'identical': not added and not removed and not changed,
+        'path_count1': len(keys1),
+        'path_count2': len(keys2),
+        'added_paths': len(added),
+        'removed_paths': len(removed),
+        'changed_paths': len(changed),
+        'schema_match': schema1 == schema2,
+        'schema_added': sorted(schema2 - schema1)[:sample_size],
+        'schema_removed': sorted(schema1 - schema2)[:sample_size],
+        'value_similarity': (unchanged / union) * 100 if union else 100.0,
+        'sample_added': added[:sample_size],
+        'sample_removed': removed[:sample_size],
+        'sample_changed': changed[:sample_size],
+    }
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+HAZOP 테이블 행 변환 (Agent6 공통)
+Agent5_node{n}.json을 HAZOP 테이블 열 데이터로 바꾸고, 노드별 조각(Agent6_node{n}.json)으로 저장합니다.
+통합 실행에서는 Agent5가 끝난 노드부터 조각을 미리 만들어 두고, Agent6는 최신 조각을 모아 Excel만 작성합니다.
+
+- 조각이 없거나 Agent5 결과보다 오래되었으면 Agent5 JSON을 직접 변환
+"""
+
+import os
+import re
+import json
+
+from hazop_utils import get_output_path
+
+
+TABLE_COLUMNS = ['노드', '노드명', '파라미터', '가이드워드', '이탈', '원인', '결과', '심각도', '안전장치', '개선사항']
+
+_NODE_NUMBER = re.compile(r'Agent5_node(\d+)\.json$')
+
+
+def empty_table():
+    """열 이름 → 빈 리스트"""
+    return {column: [] for column in TABLE_COLUMNS}
+
+
+def parse_agent5_json(json_data):
+    """
+    Agent5 JSON 출력을 파싱하여 HAZOP 테이블 데이터 추출
+    """
+    data = empty_table()
+
+    node_id = json_data.get('node_id', 0)
+    node_name = json_data.get('node_name', '')
+    hazop_analysis = json_data.get('hazop_analysis', [])
+
+    for analysis in hazop_analysis:
+        data['노드'].append(f"Node {node_id}")
+        data['노드명'].append(node_name)
+        data['파라미터'].append(analysis.get('parameter', ''))
+        data['가이드워드'].append(analysis.get('guideword', ''))
+        data['이탈'].append(analysis.get('deviation', ''))
+
+        # 리스트를 줄바꿈으로 연결
+        causes = analysis.get('causes', [])
+        data['원인'].append('\n'.join(f"- {c}" for c in causes))
+
+        consequences = analysis.get('consequences', [])
+        data['결과'].append('\n'.join(f"- {c}" for c in consequences))
+
+        data['심각도'].append(analysis.get('severity', ''))
+
+        safeguards = analysis.get('safeguards', [])
+        data['안전장치'].append('\n'.join(f"- {s}" for s in safeguards))
+
+        recommendations = analysis.get('recommendations', [])
+        data['개선사항'].append('\n'.join(f"- {r}" for r in recommendations))
+
+    return data
+
+
+def fragment_path(node_num):
+    """노드의 HAZOP 테이블 조각 경로"""
+    return get_output_path(f'Agent6_node{node_num}.json')
+
+
+def build_fragment(node_num):
+    """
+    Agent5_node{n}.json → Agent6_node{n}.json (테이블 열 데이터)
+
+    Returns:
+        조각의 행 수
+    """
+    with open(get_output_path(f'Agent5_node{node_num}.json'), 'r', encoding='utf-8') as f:
+        data = parse_agent5_json(json.load(f))
+    with open(fragment_path(node_num), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return len(data['노드'])
+
+
+def load_node_rows(agent5_path):
+    """
+    Agent5 JSON 1개의 테이블 열 데이터 (최신 조각이 있으면 조각 사용)
+
+    Returns:
+        (열 데이터, 조각 사용 여부)
+    """
+    match = _NODE_NUMBER.search(os.path.basename(agent5_path))
+    if match:
+        path = fragment_path(int(match.group(1)))
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(agent5_path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if all(column in data for column in TABLE_COLUMNS):
+                    return data, True
+            except (IOError, json.JSONDecodeError):
+                pass  # 손상된 조각은 무시하고 Agent5 JSON 변환
+    with open(agent5_path, 'r', encoding='utf-8') as f:
+        return parse_agent5_json(json.load(f)), False
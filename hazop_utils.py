@@ -5,10 +5,23 @@ HAZOP 자동화 공통 유틸리티
 """
 
 import base64
+import hashlib
 import requests
 import os
 import json
+import math
+import queue
+import threading
+import time
+from datetime import datetime
 from config import config
+from prompt_budget import estimate_payload_tokens
+from hazop_schemas import response_format, parse_and_validate, retry_prompt
+from step_deadline import DEADLINE_ENV, remaining_seconds, install_termination_handler
+
+# 마감 시간이 있는 단계(통합 실행의 Agent)는 종료 요청 시 출력을 남기고 종료
+if os.environ.get(DEADLINE_ENV):
+    install_termination_handler()
 
 
 # ========== 파일 처리 함수 ==========
@@ -88,60 +101,310 @@ def save_conversation_history(file_path, conversation_history):
         exit(1)
 
 
+def compute_file_hash(file_path, algorithm='sha256', chunk_size=1024 * 1024):
+    """파일 해시 계산 (청크 단위 스트리밍, 대용량 파일도 메모리 일정)"""
+    digest = hashlib.new(algorithm)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 # ========== OpenAI API 호출 함수 ==========
 
+# ========== API 호출 텔레메트리 ==========
+
+_telemetry_registry = None
+_telemetry_loaded = False
+
+
+def _get_telemetry_registry():
+    """API 호출 기록용 실행 레지스트리 (프로세스당 1회 연결, 비활성화 시 None)"""
+    global _telemetry_registry, _telemetry_loaded
+    if not _telemetry_loaded:
+        _telemetry_loaded = True
+        from run_registry import get_registry
+        _telemetry_registry = get_registry()
+    return _telemetry_registry
+
+
+def _env_int(name):
+    """정수 환경변수 읽기 (없거나 형식이 다르면 None)"""
+    value = os.environ.get(name, '')
+    return int(value) if value.isdigit() else None
+
+
+def record_api_telemetry(payload, started_at, latency, status, usage=None, error=None, estimated_tokens=None):
+    """
+    API 호출 결과를 실행 레지스트리에 기록
+
+    오케스트레이터가 전달한 HAZOP_RUN_ID, HAZOP_AGENT, TARGET_NODE 환경변수로
+    어느 실행/Agent/노드의 호출인지 구분합니다. 기록 실패는 분석을 중단시키지 않습니다.
+    """
+    registry = _get_telemetry_registry()
+    if registry is None:
+        return
+    try:
+        registry.record_api_call(
+            os.environ.get('HAZOP_RUN_ID'), _env_int('HAZOP_AGENT'), _env_int('TARGET_NODE'),
+            payload.get('model'), latency, status, usage=usage, error=error, started_at=started_at,
+            estimated_tokens=estimated_tokens
+        )
+    except Exception as e:
+        print(f"[WARNING] API 호출 기록 실패: {e}")
+
+
+_cassette = None
+_cassette_loaded = False
+
+
+def _get_cassette():
+    """LLM 호출 기록/재생 cassette (프로세스당 1회 로드, off면 None)"""
+    global _cassette, _cassette_loaded
+    if not _cassette_loaded:
+        _cassette_loaded = True
+        from llm_cassette import get_cassette
+        _cassette = get_cassette()
+    return _cassette
+
+
+# ========== 느린 호출 중복 요청 (hedged request) ==========
+
+def _percentile(values, percentile):
+    """최근접 순위 백분위 (values는 비어 있지 않아야 함)"""
+    ordered = sorted(values)
+    rank = min(max(1, math.ceil(percentile / 100 * len(ordered))), len(ordered))
+    return ordered[rank - 1]
+
+
+def _hedge_delay():
+    """
+    중복 요청을 보내기 전 대기 시간 (초, 중복 요청을 하지 않으면 None)
+
+    이번 실행에서 같은 Agent의 성공 호출 지연 HEDGE_PERCENTILE 백분위를 사용하고,
+    호출 수가 HEDGE_MIN_SAMPLES보다 적으면 최근 실행 기록으로 계산합니다.
+    """
+    run_id = os.environ.get('HAZOP_RUN_ID')
+    if not config.HEDGE_REQUESTS or not run_id:
+        return None
+    registry = _get_telemetry_registry()
+    if registry is None:
+        return None
+    agent = _env_int('HAZOP_AGENT')
+    try:
+        latencies = registry.api_latencies(agent, run_id)
+        if len(latencies) < config.HEDGE_MIN_SAMPLES:
+            latencies = registry.api_latencies(agent)
+    except Exception as e:
+        print(f"[WARNING] 지연 기록 조회 실패 (중복 요청 생략): {e}")
+        return None
+    if len(latencies) < config.HEDGE_MIN_SAMPLES:
+        return None
+    return max(config.HEDGE_MIN_DELAY, _percentile(latencies, config.HEDGE_PERCENTILE))
+
+
+def _hedge_budget_available(estimated):
+    """중복 요청 입력 토큰이 실행 전체의 HEDGE_BUDGET_RATIO 이내인지 확인"""
+    try:
+        hedge_tokens, total_tokens = _get_telemetry_registry().hedge_spend(os.environ.get('HAZOP_RUN_ID'))
+    except Exception as e:
+        print(f"[WARNING] 중복 요청 예산 조회 실패: {e}")
+        return False
+    return hedge_tokens + estimated <= config.HEDGE_BUDGET_RATIO * (total_tokens + estimated)
+
+
+def _post_chat(payload, timeout, session=None):
+    """chat/completions 요청 1회 (HTTP 오류는 RequestException, 응답 구조 이상은 ValueError)"""
+    response = (session or requests).post(
+        f"{config.OPENAI_BASE_URL.rstrip('/')}/chat/completions",
+        headers=config.API_HEADERS,
+        json=payload,
+        timeout=timeout
+    )
+    response.raise_for_status()
+
+    response_json = response.json()
+    if 'choices' not in response_json or not response_json['choices']:
+        print(f"[ERROR] API 응답 구조 이상: {response_json}")
+        raise ValueError("API 응답에 예상된 데이터가 없습니다.")
+    return response_json
+
+
+def _post_hedged(payload, timeout, hedge_after, estimated):
+    """
+    중복 요청을 허용하는 chat/completions 요청
+
+    hedge_after초 안에 응답이 없고 예산이 남아 있으면 같은 요청을 한 번 더 보내고, 먼저 성공한 응답을 사용합니다.
+    requests는 진행 중인 요청을 중단할 수 없으므로 늦은 쪽은 세션을 닫고 결과를 버립니다 (데몬 스레드).
+    """
+    results = queue.Queue()
+    sessions = []
+
+    def attempt(index):
+        session = requests.Session()
+        sessions.append(session)
+        try:
+            results.put((index, _post_chat(payload, timeout, session), None))
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            results.put((index, None, e))
+
+    threading.Thread(target=attempt, args=(0,), daemon=True).start()
+    try:
+        index, response_json, error = results.get(timeout=hedge_after)
+    except queue.Empty:
+        if not _hedge_budget_available(estimated):
+            print(f"[INFO] 응답 지연 {hedge_after:.1f}초 초과, 중복 요청 예산 소진 → 기존 요청 대기")
+            index, response_json, error = results.get()
+        else:
+            print(f"[INFO] 응답 지연 {hedge_after:.1f}초(p{config.HEDGE_PERCENTILE:g}) 초과 → 같은 요청을 한 번 더 보냅니다")
+            record_api_telemetry(payload, datetime.now(), 0.0, 'HEDGE', estimated_tokens=estimated)
+            threading.Thread(target=attempt, args=(1,), daemon=True).start()
+            index, response_json, error = results.get()
+            if error is not None:
+                print(f"[WARNING] {'중복' if index else '기존'} 요청 실패, 나머지 요청 대기: {error}")
+                index, response_json, error = results.get()
+            if error is None:
+                print(f"[INFO] {'중복' if index else '기존'} 요청의 응답 사용")
+    finally:
+        for session in list(sessions):
+            session.close()
+    if error is not None:
+        raise error
+    return response_json
+
+
 def call_openai_api(payload, timeout=None):
     """
     OpenAI API 호출 (에러 처리 포함)
+    HEDGE_REQUESTS=true이면 응답이 이번 실행의 p95 지연보다 늦을 때 같은 요청을 한 번 더 보냅니다 (_post_hedged).
 
     Args:
         payload: API 요청 페이로드
-        timeout: 타임아웃 (초), None이면 config.API_TIMEOUT 사용
+        timeout: 타임아웃 (초), None이면 config.API_TIMEOUT 사용 (단계 마감까지 남은 시간을 넘지 않음)
 
     Returns:
         API 응답 content 문자열
     """
     timeout = timeout or config.API_TIMEOUT
-    headers = config.API_HEADERS
+    started_at = datetime.now()
+    start = time.perf_counter()
+
+    # 호출 전 토큰 예산 확인 (context 한도를 넘는 요청은 보내지 않음)
+    budget = estimate_payload_tokens(payload)
+    estimated = budget['input_tokens']
+    print(f"[INFO] 토큰 예산: 입력 ~{estimated:,} (이미지 {budget['image_tokens']:,}) + "
+          f"출력 최대 {budget['max_output_tokens']:,} / 한도 {budget['context_limit']:,} ({budget['tokenizer']})")
+    if not budget['fits']:
+        record_api_telemetry(payload, started_at, 0.0, 'REJECTED', error='context limit exceeded',
+                             estimated_tokens=estimated)
+        print(f"[ERROR] 요청이 모델 context 한도를 넘습니다. 입력을 줄이거나 PROMPT_INPUT_TOKEN_BUDGET을 낮추세요.")
+        exit(1)
+    if estimated > config.PROMPT_INPUT_TOKEN_BUDGET:
+        print(f"[WARNING] 입력 토큰 추정치가 예산을 넘습니다: {estimated:,} > {config.PROMPT_INPUT_TOKEN_BUDGET:,}")
+
+    cassette = _get_cassette()
+    if cassette is not None and cassette.mode == 'replay':
+        response_json = cassette.replay(payload)
+        if response_json is None:
+            print("[ERROR] cassette에 기록되지 않은 요청입니다 (프롬프트, 이미지 또는 설정이 기록 시점과 다름)")
+            exit(1)
+        record_api_telemetry(payload, started_at, time.perf_counter() - start, 'REPLAY',
+                             usage=response_json.get('usage'), estimated_tokens=estimated)
+        return response_json['choices'][0]['message']['content']
+
+    # 단계 마감 시간 전파: 남은 시간 안에 끝나도록 timeout 축소, 부족하면 보내지 않고 실패
+    remaining = remaining_seconds()
+    if remaining is not None:
+        if remaining < config.STEP_DEADLINE_MARGIN:
+            record_api_telemetry(payload, started_at, 0.0, 'REJECTED', error='step deadline exceeded',
+                                 estimated_tokens=estimated)
+            print(f"[ERROR] 단계 마감까지 {max(remaining, 0):.1f}초 남아 API 호출을 보내지 않습니다 (STEP_TIMEOUTS)")
+            exit(1)
+        if remaining - config.STEP_DEADLINE_MARGIN < timeout:
+            timeout = remaining - config.STEP_DEADLINE_MARGIN
+            print(f"[INFO] 단계 마감에 맞춰 API 타임아웃 {timeout:.0f}초로 단축")
 
     try:
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=timeout
-        )
-        response.raise_for_status()
-
-        response_json = response.json()
-        if 'choices' not in response_json or not response_json['choices']:
-            print(f"[ERROR] API 응답 구조 이상: {response_json}")
-            raise ValueError("API 응답에 예상된 데이터가 없습니다.")
+        hedge_after = _hedge_delay()
+        if hedge_after is None:
+            response_json = _post_chat(payload, timeout)
+        else:
+            response_json = _post_hedged(payload, timeout, hedge_after, estimated)
 
         content = response_json['choices'][0]['message']['content']
         if not content:
             print(f"[WARNING] API returned empty content. Full response: {response_json}")
+        latency = time.perf_counter() - start
+        usage = response_json.get('usage') or {}
+        if usage.get('prompt_tokens'):
+            cached = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+            print(f"[INFO] 입력 토큰 {usage['prompt_tokens']:,} (캐시 {cached:,}, "
+                  f"{cached / usage['prompt_tokens']:.0%}), 응답 {latency:.1f}초")
+        if cassette is not None:
+            cassette.record(payload, response_json, latency, _env_int('HAZOP_AGENT'), _env_int('TARGET_NODE'))
+        record_api_telemetry(payload, started_at, latency, 'SUCCESS', usage=response_json.get('usage'),
+                             estimated_tokens=estimated)
         return content
 
     except requests.exceptions.RequestException as e:
+        record_api_telemetry(payload, started_at, time.perf_counter() - start, 'FAILED', error=str(e),
+                             estimated_tokens=estimated)
         print(f"API 요청 오류: {e}")
         exit(1)
     except (KeyError, ValueError) as e:
+        record_api_telemetry(payload, started_at, time.perf_counter() - start, 'FAILED', error=str(e),
+                             estimated_tokens=estimated)
         print(f"응답 파싱 오류: {e}")
         exit(1)
 
 
-def create_vision_payload(system_prompt, user_text, image_base64, model=None, max_tokens=None, image_format="png"):
+def call_openai_json(payload, schema, timeout=None):
+    """
+    JSON 응답 API 호출 + 스키마 검증
+    검증에 실패하면 이전 응답과 오류 위치를 대화에 이어 붙여 다시 요청합니다 (JSON_RETRY_ATTEMPTS회).
+    앞부분(시스템 프롬프트, 이미지)은 그대로이므로 재요청도 프롬프트 캐시에 적중합니다.
+
+    Args:
+        payload: API 요청 페이로드
+        schema: 응답 스키마 이름 (hazop_schemas.SCHEMAS)
+        timeout: 타임아웃 (초)
+
+    Returns:
+        (응답 content 문자열, 검증된 데이터) - 끝까지 실패하면 (마지막 응답, None)
+    """
+    messages = list(payload['messages'])
+    for attempt in range(config.JSON_RETRY_ATTEMPTS + 1):
+        content = call_openai_api(dict(payload, messages=messages), timeout)
+        data, errors = parse_and_validate(content, schema)
+        if not errors:
+            return content, data
+        print(f"[WARNING] 응답 JSON 검증 실패 ({schema}, 오류 {len(errors)}개): {errors[0]}")
+        if attempt < config.JSON_RETRY_ATTEMPTS:
+            print(f"[INFO] 오류 위치를 알려주고 다시 요청 ({attempt + 1}/{config.JSON_RETRY_ATTEMPTS})")
+            messages = messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": retry_prompt(errors)},
+            ]
+    return content, None
+
+
+def create_vision_payload(system_prompt, user_text, image_base64, model=None, max_tokens=None, image_format="png",
+                          shared_text=None, schema=None):
     """
     Vision API용 페이로드 생성
 
+    프롬프트 캐시를 위해 호출마다 같은 부분(시스템 프롬프트, shared_text, 이미지)을 앞에,
+    호출마다 달라지는 user_text를 마지막에 배치합니다.
+
     Args:
         system_prompt: 시스템 프롬프트
-        user_text: 사용자 텍스트
+        user_text: 사용자 텍스트 (노드별 내용)
         image_base64: base64 인코딩된 이미지
         model: 모델명 (None이면 config.MODEL_NAME 사용)
         max_tokens: 최대 토큰 (None이면 config.MAX_TOKENS 사용)
         image_format: 이미지 형식 (png, jpeg 등)
+        shared_text: 모든 노드에 공통인 지시문 (이미지 앞에 배치)
+        schema: 응답 스키마 이름 (hazop_schemas.SCHEMAS, STRUCTURED_OUTPUT이면 response_format 추가)
 
     Returns:
         API 페이로드 딕셔너리
@@ -149,6 +412,24 @@ def create_vision_payload(system_prompt, user_text, image_base64, model=None, ma
     model = model or config.MODEL_NAME
     max_tokens = max_tokens or config.MAX_TOKENS
 
+    content = []
+    if shared_text:
+        content.append({
+            "type": "text",
+            "text": shared_text
+        })
+    content.append({
+        "type": "image_url",
+        "image_url": {
+            "url": f"data:image/{image_format};base64,{image_base64}",
+            "detail": "high"
+        }
+    })
+    content.append({
+        "type": "text",
+        "text": user_text
+    })
+
     payload = {
         "model": model,
         "messages": [
@@ -158,42 +439,36 @@ def create_vision_payload(system_prompt, user_text, image_base64, model=None, ma
             },
             {
                 "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": user_text
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/{image_format};base64,{image_base64}",
-                            "detail": "high"
-                        }
-                    }
-                ]
+                "content": content
             }
         ],
         "max_completion_tokens": max_tokens
     }
+    if schema and config.STRUCTURED_OUTPUT:
+        payload["response_format"] = response_format(schema)
 
     return payload
 
 
-def create_text_payload(system_prompt, user_text, model=None, max_tokens=None):
+def create_text_payload(system_prompt, user_text, model=None, max_tokens=None, shared_text=None, schema=None):
     """
     텍스트 전용 API 페이로드 생성
 
     Args:
         system_prompt: 시스템 프롬프트
-        user_text: 사용자 텍스트
+        user_text: 사용자 텍스트 (호출별 내용, 마지막에 배치)
         model: 모델명 (None이면 config.MODEL_NAME 사용)
         max_tokens: 최대 토큰 (None이면 config.MAX_TOKENS 사용)
+        shared_text: 호출 간 공통 지시문 (user_text 앞에 배치, 프롬프트 캐시 대상)
+        schema: 응답 스키마 이름 (hazop_schemas.SCHEMAS, STRUCTURED_OUTPUT이면 response_format 추가)
 
     Returns:
         API 페이로드 딕셔너리
     """
     model = model or config.MODEL_NAME
     max_tokens = max_tokens or config.MAX_TOKENS
+    if shared_text:
+        user_text = shared_text + user_text
 
     payload = {
         "model": model,
@@ -209,6 +484,8 @@ def create_text_payload(system_prompt, user_text, model=None, max_tokens=None):
         ],
         "max_completion_tokens": max_tokens
     }
+    if schema and config.STRUCTURED_OUTPUT:
+        payload["response_format"] = response_format(schema)
 
     return payload
 
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 호출 기록/재생 (cassette)
+record 모드: call_openai_api의 요청/응답을 payload 해시와 함께 gzip JSONL 파일에 추가 기록
+replay 모드: 네트워크 없이 기록된 응답을 돌려줌 → 전체 실행을 수 초 만에 그대로 재현
+             (Agent6, 평가 스크립트 디버깅, 프로파일링, 회귀 테스트용)
+
+- 키: payload(JSON, 키 정렬)의 sha256 → 이미지/프롬프트/모델/옵션이 하나라도 다르면 다른 키
+- 같은 payload를 여러 번 호출하면 기록된 순서대로 재생, 마지막 응답은 반복 사용
+- 기록은 레코드마다 gzip 멤버 하나로 append (여러 Agent 프로세스가 같은 파일에 기록 가능)
+- 요청은 이미지 base64 대신 이미지 해시만 저장
+
+사용 예:
+    LLM_CASSETTE_MODE=record python main_integrated_all_nodes.py
+    LLM_CASSETTE_MODE=replay python main_integrated_all_nodes.py
+    python llm_cassette.py info ./output/logs/llm_cassette.jsonl.gz
+"""
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from config import config
+
+
+CASSETTE_MODES = ('off', 'record', 'replay')
+
+
+def payload_key(payload):
+    """요청 payload의 sha256 키 (키 정렬 JSON 기준)"""
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _strip_images(payload):
+    """기록용 요청 사본 (image_url의 base64는 해시로 대체)"""
+    messages = []
+    for message in payload.get('messages', []):
+        content = message.get('content')
+        if isinstance(content, list):
+            parts = []
+            for part in content:
+                if part.get('type') == 'image_url':
+                    url = part.get('image_url', {}).get('url', '')
+                    digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+                    part = {'type': 'image_url', 'image_url': {'url': f'<image sha256:{digest}>'}}
+                parts.append(part)
+            message = dict(message, content=parts)
+        messages.append(message)
+    return dict(payload, messages=messages)
+
+
+def read_records(path):
+    """cassette 레코드 읽기 (중단된 기록의 잘린 마지막 부분은 무시)"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    except (EOFError, OSError, json.JSONDecodeError) as e:
+        print(f"[WARNING] cassette 끝부분을 읽지 못했습니다 ({len(records)}개 레코드까지 사용): {e}")
+    return records
+
+
+class LLMCassette:
+    """요청/응답 기록 및 재생"""
+
+    def __init__(self, path, mode):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"LLM_CASSETTE_MODE는 {', '.join(CASSETTE_MODES)} 중 하나여야 합니다: {mode}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._responses = {}
+        self._positions = {}
+
+        if mode == 'replay':
+            for record in read_records(path):
+                self._responses.setdefault(record['key'], []).append(record['response'])
+            print(f"[INFO] LLM cassette 재생: {path} ({sum(len(v) for v in self._responses.values())}개 응답)")
+
+    def replay(self, payload):
+        """기록된 응답 JSON 반환 (없으면 None)"""
+        key = payload_key(payload)
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        return responses[min(position, len(responses) - 1)]
+
+    def record(self, payload, response_json, latency, agent=None, node=None):
+        """요청/응답 1건 추가 기록 (레코드마다 독립 gzip 멤버)"""
+        record = {
+            'key': payload_key(payload),
+            'recorded_at': datetime.now().isoformat(),
+            'agent': agent,
+            'node': node,
+            'latency': round(latency, 3),
+            'request': _strip_images(payload),
+            'response': response_json,
+        }
+        data = gzip.compress((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            # O_APPEND 단일 write → 동시에 기록하는 다른 Agent 프로세스와 섞이지 않음
+            # O_BINARY: Windows 텍스트 모드에서 gzip 바이트의 \n이 \r\n으로 바뀌지 않도록
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+
+def get_cassette():
+    """설정에 따라 cassette 반환 (off면 None)"""
+    mode = config.LLM_CASSETTE_MODE
+    if mode == 'off':
+        return None
+    try:
+        return LLMCassette(config.LLM_CASSETTE_PATH, mode)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        exit(1)
+
+
+def main():
+    """메인 실행 함수"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='LLM cassette 조회')
+    parser.add_argument('command', choices=['info'], help='info: Agent/노드별 기록 수 요약')
+    parser.add_argument('path', nargs='?', default=config.LLM_CASSETTE_PATH, help='cassette 파일 경로')
+    args = parser.parse_args()
+
+    records = read_records(args.path)
+    if not records:
+        print(f"[ERROR] 기록이 없습니다: {args.path}")
+        return 1
+
+    counts = {}
+    for record in records:
+        label = f"Agent{record['agent']}" if record.get('agent') else 'unknown'
+        if record.get('node'):
+            label += f" / node {record['node']}"
+        counts[label] = counts.get(label, 0) + 1
+
+    print(f"\n{args.path}")
+    print(f"  레코드 {len(records)}개, 고유 요청 {len({r['key'] for r in records})}개, "
+          f"파일 크기 {os.path.getsize(args.path) / 1024:.1f}KB")
+    for label, count in sorted(counts.items()):
+        print(f"  {label:<24} {count:>4}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
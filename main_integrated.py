@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """
 HAZOP 자동화 통합 실행 스크립트
-전체 Agent 1~6을 순차적으로 실행하고 결과를 기록합니다.
+전체 Agent 1~6을 단계 DAG(pipeline_dag.SINGLE_PIPELINE) 순서대로 실행하고 결과를 기록합니다.
 """
 
 import os
@@ -9,40 +9,64 @@ import sys
 import time
 import json
 from datetime import datetime
-import subprocess
 
 # 설정 파일 import
 from config import config
+from run_registry import get_registry
+from event_log import EventLogger, tail_text, write_step_output
+from step_deadline import step_timeout, deadline_env, run_step
+from pipeline_dag import SINGLE_PIPELINE, DAGScheduler, format_task
 
 
 class HAZOPPipeline:
     """HAZOP 분석 통합 파이프라인"""
 
-    def __init__(self, log_dir=None):
+    def __init__(self, log_dir=None, profile=None):
         self.log_dir = log_dir or os.path.join(config.BASE_DIRECTORY, 'logs')
-        self.execution_log = []
         self.start_time = None
+        # 실행 이벤트 스트림 (run_pipeline에서 생성, 메모리에는 상태별 건수만 보관)
+        self.events = None
+        self.event_counts = {}
+        # 단계별 cProfile/tracemalloc 프로파일링 여부
+        self.profile = config.PROFILE_AGENTS if profile is None else profile
+        # 실행 이력 레지스트리 (비활성화 시 None)
+        self.registry = get_registry()
+        self.run_id = None
+        # 출력 파일이 확인된 Agent 수
+        self.total_success = 0
 
         # 로그 디렉토리 생성
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir)
 
-    def log_event(self, agent_name, status, message, elapsed_time=None):
-        """이벤트 로깅"""
+    def log_event(self, agent_name, status, message, elapsed_time=None, **fields):
+        """이벤트 로깅 (JSONL 이벤트 스트림에 즉시 기록)"""
         event = {
             'timestamp': datetime.now().isoformat(),
-            'agent': agent_name,
+            'agent_name': agent_name,
             'status': status,
             'message': message,
             'elapsed_time': elapsed_time
         }
-        self.execution_log.append(event)
+        event.update(fields)
+        if self.events:
+            event = self.events.emit('step_end', **event)
+        self.event_counts[status] = self.event_counts.get(status, 0) + 1
 
         # 콘솔 출력
         print(f"[{event['timestamp']}] {agent_name}: {status} - {message}")
         if elapsed_time:
             print(f"  → 소요 시간: {elapsed_time:.2f}초")
 
+    def record_step(self, agent_num, status, message, elapsed, started_at):
+        """단계 실행 결과를 레지스트리에 기록 (기록 실패는 실행에 영향 없음)"""
+        if not self.registry or not self.run_id:
+            return
+        try:
+            self.registry.record_step(self.run_id, agent_num, None, status, elapsed, message, started_at)
+        except Exception as e:
+            print(f"[WARNING] 레지스트리 기록 실패: {e}")
+
     def run_agent(self, agent_num, script_name):
         """개별 Agent 실행"""
         agent_name = f"Agent{agent_num}"
@@ -51,38 +75,104 @@ class HAZOPPipeline:
         print(f"{'='*60}")
 
         start = time.time()
+        started_at = datetime.now()
+        step_fields = {'agent': agent_num, 'node': None}
+        if self.events:
+            self.events.emit('step_start', agent_name=agent_name, status='START', **step_fields)
+
+        # API 호출 텔레메트리용 실행 ID / Agent 번호 전달
+        env = os.environ.copy()
+        env['HAZOP_AGENT'] = str(agent_num)
+        if self.run_id:
+            env['HAZOP_RUN_ID'] = self.run_id
+        # 단계 마감 시각 전달 (Agent의 API 호출 timeout이 남은 시간을 넘지 않음)
+        timeout = step_timeout(agent_num)
+        deadline_env(env, timeout)
 
         try:
-            # 서브프로세스로 Agent 실행
-            result = subprocess.run(
-                [sys.executable, script_name],
+            # 서브프로세스로 Agent 실행 (마감 초과 시 종료 요청 → 강제 종료)
+            result, timed_out = run_step(
+                self.agent_command(script_name, agent_name),
+                timeout,
                 cwd=os.path.dirname(os.path.abspath(__file__)),
-                capture_output=True,
                 text=True,
                 encoding='utf-8',
                 errors='replace',  # 인코딩 오류 처리
-                timeout=120  # 2분 타임아웃
+                env=env
             )
 
             elapsed = time.time() - start
 
-            if result.returncode == 0:
-                self.log_event(agent_name, 'SUCCESS', '정상 완료', elapsed)
+            # 전체 출력은 단계별 파일로, 이벤트에는 끝부분만 기록
+            output_file = None
+            try:
+                output_file = write_step_output(self.step_output_dir(), agent_name,
+                                                result.stdout, result.stderr)
+            except IOError as e:
+                print(f"[WARNING] 단계 출력 저장 실패: {e}")
+
+            if timed_out:
+                message = f'타임아웃 발생 ({timeout:.0f}초 초과)'
+                self.log_event(agent_name, 'TIMEOUT', message, elapsed,
+                               returncode=result.returncode, output_file=output_file, **step_fields)
+                self.record_step(agent_num, 'TIMEOUT', message, elapsed, started_at)
+                return False, "타임아웃"
+            elif result.returncode == 0:
+                self.log_event(agent_name, 'SUCCESS', '정상 완료', elapsed,
+                               output_file=output_file, **step_fields)
+                self.record_step(agent_num, 'SUCCESS', '정상 완료', elapsed, started_at)
                 return True, result.stdout
             else:
                 error_msg = result.stderr or result.stdout
-                self.log_event(agent_name, 'FAILED', f'실행 실패: {error_msg}', elapsed)
+                self.log_event(agent_name, 'FAILED', f'실행 실패: {tail_text(error_msg)}', elapsed,
+                               returncode=result.returncode, output_file=output_file, **step_fields)
+                self.record_step(agent_num, 'FAILED', tail_text(error_msg), elapsed, started_at)
                 return False, error_msg
 
-        except subprocess.TimeoutExpired:
-            elapsed = time.time() - start
-            self.log_event(agent_name, 'TIMEOUT', '타임아웃 발생 (5분 초과)', elapsed)
-            return False, "타임아웃"
         except Exception as e:
             elapsed = time.time() - start
-            self.log_event(agent_name, 'ERROR', f'예외 발생: {str(e)}', elapsed)
+            self.log_event(agent_name, 'ERROR', f'예외 발생: {str(e)}', elapsed, **step_fields)
+            self.record_step(agent_num, 'ERROR', str(e), elapsed, started_at)
             return False, str(e)
 
+    def profile_dir(self):
+        """이번 실행의 단계별 프로파일 저장 디렉토리"""
+        return os.path.join(self.log_dir, 'profiles', self.start_time.strftime('%Y%m%d_%H%M%S'))
+
+    def agent_command(self, script_name, step_name):
+        """Agent 실행 명령 (프로파일링 시 profile_agent.py로 감싸서 실행)"""
+        if not self.profile:
+            return [sys.executable, script_name]
+        return [sys.executable, 'profile_agent.py', 'run',
+                '--output', self.profile_dir(), '--name', step_name, script_name]
+
+    def summarize_profiles(self):
+        """단계별 프로파일을 합쳐 로컬 처리 병목 요약 출력"""
+        from profile_agent import summarize_profiles, print_summary
+        try:
+            summary = summarize_profiles(self.profile_dir())
+            if summary:
+                print_summary(summary)
+        except Exception as e:
+            print(f"[WARNING] 프로파일 요약 실패: {e}")
+
+    def step_output_dir(self):
+        """이번 실행의 단계별 전체 출력 저장 디렉토리"""
+        return os.path.join(self.log_dir, 'steps', self.start_time.strftime('%Y%m%d_%H%M%S'))
+
+    def render_charts(self):
+        """Agent4 확률 그래프 후처리"""
+        start = time.time()
+        try:
+            # matplotlib은 후처리 단계에서만 로드
+            from render_probability_charts import render_all_charts
+            summary = render_all_charts()
+            self.log_event('Charts', 'SUCCESS',
+                           f"생성 {len(summary['rendered'])}개, 건너뜀 {len(summary['skipped'])}개",
+                           time.time() - start)
+        except Exception as e:
+            self.log_event('Charts', 'ERROR', f'예외 발생: {str(e)}', time.time() - start)
+
     def check_output_file(self, file_path):
         """출력 파일 존재 및 크기 확인"""
         if not os.path.exists(file_path):
@@ -95,41 +185,59 @@ class HAZOPPipeline:
         return True, f"파일 크기: {size} bytes"
 
     def run_pipeline(self):
-        """전체 파이프라인 실행"""
+        """전체 파이프라인 실행 (실행 이력 레지스트리에 시작/종료 기록)"""
         self.start_time = datetime.now()
+        if self.registry:
+            try:
+                self.run_id = self.registry.start_run('single', [1, 2, 3, 4, 5, 6],
+                                                      started_at=self.start_time)
+                print(f"[INFO] 실행 ID: {self.run_id}")
+            except Exception as e:
+                print(f"[WARNING] 레지스트리 기록 실패: {e}")
+
+        log_path = os.path.join(self.log_dir, f"events_{self.start_time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+        self.events = EventLogger(log_path, run_id=self.run_id)
+        self.events.emit('run_start', pipeline='single', agents=[1, 2, 3, 4, 5, 6])
+        print(f"[LOG] 이벤트 로그: {self.events.path}")
+
+        status = 'INTERRUPTED'
+        try:
+            success = self.run_steps()
+            status = 'SUCCESS' if success else 'FAILED'
+            return success
+        finally:
+            self.events.emit('run_end', status=status,
+                             elapsed_time=(datetime.now() - self.start_time).total_seconds())
+            self.events.close()
+            self.finish_run(status)
+            if self.profile:
+                self.summarize_profiles()
+
+    def finish_run(self, status):
+        """실행 종료 및 산출물 해시를 레지스트리에 기록"""
+        if not self.registry or not self.run_id:
+            return
+        try:
+            total_elapsed = (datetime.now() - self.start_time).total_seconds()
+            self.registry.finish_run(self.run_id, status, total_elapsed)
+            self.registry.record_artifacts(self.run_id)
+        except Exception as e:
+            print(f"[WARNING] 레지스트리 기록 실패: {e}")
+
+    def run_steps(self):
+        """Agent 1~6 실행 (pipeline_dag.SINGLE_PIPELINE의 의존 관계에 따라 스케줄링)"""
         print(f"\n{'#'*60}")
         print(f"  HAZOP 자동화 통합 실행 시작")
         print(f"  시작 시간: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'#'*60}\n")
 
-        # Agent 정의
-        agents = [
-            (1, "gpt4o_P&ID_input(Agent1).py", "공정요소.txt"),
-            (2, "GPT4o Node (Agent2).py", "Agent2.txt"),
-            (3, "GPT4o Parameter_Guideword (Agent3).py", "Agent3.txt"),
-            (4, "GPT4o CreateDeviation (Agent4).py", "Agent4.txt"),
-            (5, "GPT4o Safeguard (Agent5).py", "Agent5.txt"),
-            (6, "GPT4o HAZOP Table (Agent6).py", "HAZOP_table.xlsx"),
-        ]
-
-        total_success = 0
-
-        for agent_num, script_name, output_file in agents:
-            success, output = self.run_agent(agent_num, script_name)
-
-            if not success:
-                print(f"\n[ERROR] Agent{agent_num} 실행 실패. 파이프라인 중단.")
-                break
-
-            # 출력 파일 확인
-            output_path = os.path.join(config.BASE_DIRECTORY, output_file)
-            file_exists, file_info = self.check_output_file(output_path)
-
-            if file_exists:
-                print(f"[OK] 출력 파일 생성 확인: {output_file} ({file_info})")
-                total_success += 1
-            else:
-                print(f"[WARN] 출력 파일 생성 실패: {output_file} ({file_info})")
+        agent_steps = [step for step in SINGLE_PIPELINE if 'agent' in step]
+        self.total_success = 0
+        scheduler = DAGScheduler(SINGLE_PIPELINE, self.run_dag_task, self.step_enabled,
+                                 max_workers=config.PIPELINE_MAX_WORKERS)
+        if not scheduler.run():
+            print(f"\n[ERROR] {format_task(scheduler.failed_critical)} 실행 실패. 파이프라인 중단.")
+        scheduler.print_critical_path()
 
         # 실행 요약
         end_time = datetime.now()
@@ -139,13 +247,40 @@ class HAZOPPipeline:
         print(f"  실행 완료")
         print(f"  종료 시간: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"  총 소요 시간: {total_elapsed:.2f}초")
-        print(f"  성공: {total_success}/{len(agents)}")
+        print(f"  성공: {self.total_success}/{len(agent_steps)}")
         print(f"{'#'*60}\n")
 
         # 로그 저장
         self.save_log()
 
-        return total_success == len(agents)
+        return self.total_success == len(agent_steps)
+
+    def step_enabled(self, step):
+        """DAG 단계 실행 여부 (when 조건)"""
+        conditions = {'charts': config.RENDER_CHARTS}
+        return all(conditions[name] for name in step.get('when', []))
+
+    def run_dag_task(self, step, node_num=None):
+        """DAG 작업 1개 실행 (Agent 스크립트 실행 후 출력 파일 확인, 또는 그래프 후처리)"""
+        if step.get('task') == 'charts':
+            self.render_charts()
+            return True
+
+        success, output = self.run_agent(step['agent'], step['script'])
+        if not success:
+            return False
+
+        # 출력 파일 확인
+        for output_file in step.get('outputs', []):
+            output_path = os.path.join(config.BASE_DIRECTORY, output_file)
+            file_exists, file_info = self.check_output_file(output_path)
+
+            if file_exists:
+                print(f"[OK] 출력 파일 생성 확인: {output_file} ({file_info})")
+                self.total_success += 1
+            else:
+                print(f"[WARN] 출력 파일 생성 실패: {output_file} ({file_info})")
+        return True
 
     def save_log(self):
         """실행 로그를 JSON 파일로 저장"""
@@ -153,10 +288,12 @@ class HAZOPPipeline:
         log_path = os.path.join(self.log_dir, log_filename)
 
         log_data = {
+            'run_id': self.run_id,
             'start_time': self.start_time.isoformat(),
             'end_time': datetime.now().isoformat(),
             'total_elapsed': (datetime.now() - self.start_time).total_seconds(),
-            'events': self.execution_log
+            'event_log': self.events.path if self.events else None,
+            'event_counts': self.event_counts
         }
 
         try:
@@ -169,11 +306,21 @@ class HAZOPPipeline:
 
 def main():
     """메인 실행 함수"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HAZOP 자동화 시스템 (Agent 1~6 순차 실행)')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='각 Agent 단계를 cProfile + tracemalloc으로 프로파일링 (logs/profiles/)'
+    )
+    args = parser.parse_args()
+
     print("HAZOP 자동화 시스템 v1.0")
     print("=" * 60)
 
     try:
-        pipeline = HAZOPPipeline()
+        pipeline = HAZOPPipeline(profile=args.profile or None)
         success = pipeline.run_pipeline()
 
         if success:
@@ -2,6 +2,7 @@
 """
 HAZOP 자동화 통합 실행 스크립트 (모든 노드 자동 처리)
 Agent2에서 노드를 추출하고, 각 노드별로 Agent3~5를 반복 실행합니다.
+단계 순서와 의존 관계는 pipeline_dag.ALL_NODES_PIPELINE에 정의되어 있습니다.
 """
 
 import os
@@ -10,44 +11,77 @@ import time
 import json
 import re
 from datetime import datetime
-import subprocess
 
 # 설정 파일 import
 from config import config
 from hazop_utils import read_txt, write_txt, get_output_path
+from run_registry import get_registry
+from event_log import EventLogger, tail_text, write_step_output
+from step_deadline import step_timeout, deadline_env, run_step
+from pipeline_dag import ALL_NODES_PIPELINE, DAGScheduler, format_task
+from hazop_table import build_fragment
 
 
 class HAZOPPipelineAllNodes:
     """HAZOP 분석 통합 파이프라인 (모든 노드 자동 처리)"""
 
-    def __init__(self, log_dir=None, agents_to_run=None):
+    def __init__(self, log_dir=None, agents_to_run=None, monitor_port=None, profile=None, agent3_batch=None,
+                 workers=None):
         self.log_dir = log_dir or os.path.join(config.BASE_DIRECTORY, 'logs')
-        self.execution_log = []
         self.start_time = None
+        # 실행 이벤트 스트림 (run_pipeline에서 생성, 메모리에는 상태별 건수만 보관)
+        self.events = None
+        self.event_counts = {}
+        # 단계별 cProfile/tracemalloc 프로파일링 여부
+        self.profile = config.PROFILE_AGENTS if profile is None else profile
+        # 진행 상황 HTTP 엔드포인트 포트 (None이면 내장 모니터 비활성화)
+        self.monitor_port = monitor_port
+        # Agent3를 모든 노드에 대해 한 번의 요청으로 실행 (결과가 없는 노드만 노드별 실행)
+        self.agent3_batch = config.AGENT3_BATCH if agent3_batch is None else agent3_batch
+        # 동시에 실행할 DAG 단계 수 (1이면 노드 하나씩 순서대로)
+        self.workers = workers or config.PIPELINE_MAX_WORKERS
         self.nodes = []
+        self.batched_nodes = set()
+        # Agent 번호 → 이번 실행에서 성공한 노드 번호 (통합 결과 파일 작성용)
+        self.completed = {}
         # agents_to_run: 실행할 Agent 번호 리스트 (예: [1,2] 또는 [3,4,5] 또는 [6])
         self.agents_to_run = agents_to_run if agents_to_run else [3,4,5,6]
+        # 실행 이력 레지스트리 (비활성화 시 None)
+        self.registry = get_registry()
+        self.run_id = None
 
         # 로그 디렉토리 생성
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir)
 
-    def log_event(self, agent_name, status, message, elapsed_time=None):
-        """이벤트 로깅"""
+    def log_event(self, agent_name, status, message, elapsed_time=None, **fields):
+        """이벤트 로깅 (JSONL 이벤트 스트림에 즉시 기록)"""
         event = {
             'timestamp': datetime.now().isoformat(),
-            'agent': agent_name,
+            'agent_name': agent_name,
             'status': status,
             'message': message,
             'elapsed_time': elapsed_time
         }
-        self.execution_log.append(event)
+        event.update(fields)
+        if self.events:
+            event = self.events.emit('step_end', **event)
+        self.event_counts[status] = self.event_counts.get(status, 0) + 1
 
         # 콘솔 출력
         print(f"[{event['timestamp']}] {agent_name}: {status} - {message}")
         if elapsed_time:
             print(f"  → 소요 시간: {elapsed_time:.2f}초")
 
+    def record_step(self, agent_num, node_num, status, message, elapsed, started_at):
+        """단계 실행 결과를 레지스트리에 기록 (기록 실패는 실행에 영향 없음)"""
+        if not self.registry or not self.run_id:
+            return
+        try:
+            self.registry.record_step(self.run_id, agent_num, node_num, status, elapsed, message, started_at)
+        except Exception as e:
+            print(f"[WARNING] 레지스트리 기록 실패: {e}")
+
     def extract_nodes(self, agent2_output):
         """Agent2 출력에서 노드 목록 추출 (JSON 파싱)"""
         nodes = []
@@ -96,30 +130,68 @@ class HAZOPPipelineAllNodes:
 
         return nodes
 
+    def profile_dir(self):
+        """이번 실행의 단계별 프로파일 저장 디렉토리"""
+        return os.path.join(self.log_dir, 'profiles', self.start_time.strftime('%Y%m%d_%H%M%S'))
+
+    def agent_command(self, script_name, step_name):
+        """Agent 실행 명령 (프로파일링 시 profile_agent.py로 감싸서 실행)"""
+        if not self.profile:
+            return [sys.executable, script_name]
+        return [sys.executable, 'profile_agent.py', 'run',
+                '--output', self.profile_dir(), '--name', step_name, script_name]
+
+    def summarize_profiles(self):
+        """단계별 프로파일을 합쳐 로컬 처리 병목 요약 출력"""
+        from profile_agent import summarize_profiles, print_summary
+        try:
+            summary = summarize_profiles(self.profile_dir())
+            if summary:
+                print_summary(summary)
+        except Exception as e:
+            print(f"[WARNING] 프로파일 요약 실패: {e}")
+
+    def step_output_dir(self):
+        """이번 실행의 단계별 전체 출력 저장 디렉토리"""
+        return os.path.join(self.log_dir, 'steps', self.start_time.strftime('%Y%m%d_%H%M%S'))
+
     def run_agent(self, agent_num, script_name, node_num=None):
         """개별 Agent 실행"""
         if node_num:
             agent_name = f"Agent{agent_num} (Node {node_num})"
+            step_name = f"Agent{agent_num}_node{node_num}"
         else:
             agent_name = f"Agent{agent_num}"
+            step_name = f"Agent{agent_num}"
+        step_fields = {'agent': agent_num, 'node': node_num}
 
         print(f"\n{'='*60}")
         print(f"  {agent_name} 실행 중...")
         print(f"{'='*60}")
 
         start = time.time()
+        started_at = datetime.now()
+        if self.events:
+            self.events.emit('step_start', agent_name=agent_name, status='START', **step_fields)
 
         try:
             # 환경변수로 노드 번호 전달
             env = os.environ.copy()
             if node_num:
                 env['TARGET_NODE'] = str(node_num)
-
-            # 서브프로세스로 Agent 실행
-            result = subprocess.run(
-                [sys.executable, script_name],
+            # API 호출 텔레메트리용 실행 ID / Agent 번호 전달
+            env['HAZOP_AGENT'] = str(agent_num)
+            if self.run_id:
+                env['HAZOP_RUN_ID'] = self.run_id
+            # 단계 마감 시각 전달 (Agent의 API 호출 timeout이 남은 시간을 넘지 않음)
+            timeout = step_timeout(agent_num)
+            deadline_env(env, timeout)
+
+            # 서브프로세스로 Agent 실행 (마감 초과 시 종료 요청 → 강제 종료)
+            result, timed_out = run_step(
+                self.agent_command(script_name, step_name),
+                timeout,
                 cwd=os.path.dirname(os.path.abspath(__file__)),
-                capture_output=True,
                 text=False,  # 바이너리 모드로 변경
                 env=env
             )
@@ -134,149 +206,136 @@ class HAZOPPipelineAllNodes:
                 stdout = str(result.stdout)
                 stderr = str(result.stderr)
 
-            if result.returncode == 0:
-                self.log_event(agent_name, 'SUCCESS', '정상 완료', elapsed)
+            # 전체 출력은 단계별 파일로, 이벤트에는 끝부분만 기록
+            output_file = None
+            try:
+                output_file = write_step_output(self.step_output_dir(), step_name, stdout, stderr)
+            except IOError as e:
+                print(f"[WARNING] 단계 출력 저장 실패: {e}")
+
+            if timed_out:
+                message = f'타임아웃 발생 ({timeout:.0f}초 초과)'
+                self.log_event(agent_name, 'TIMEOUT', message, elapsed,
+                               returncode=result.returncode, output_file=output_file, **step_fields)
+                self.record_step(agent_num, node_num, 'TIMEOUT', message, elapsed, started_at)
+                return False, "타임아웃"
+            elif result.returncode == 0:
+                self.log_event(agent_name, 'SUCCESS', '정상 완료', elapsed,
+                               output_file=output_file, **step_fields)
+                self.record_step(agent_num, node_num, 'SUCCESS', '정상 완료', elapsed, started_at)
                 return True, stdout
             else:
                 error_msg = stderr or stdout
-                self.log_event(agent_name, 'FAILED', f'실행 실패: {error_msg[:200]}', elapsed)
+                self.log_event(agent_name, 'FAILED', f'실행 실패: {tail_text(error_msg)}', elapsed,
+                               returncode=result.returncode, output_file=output_file, **step_fields)
+                self.record_step(agent_num, node_num, 'FAILED', tail_text(error_msg), elapsed, started_at)
                 return False, error_msg
 
         except Exception as e:
             elapsed = time.time() - start
-            self.log_event(agent_name, 'ERROR', f'예외 발생: {str(e)}', elapsed)
+            self.log_event(agent_name, 'ERROR', f'예외 발생: {str(e)}', elapsed, **step_fields)
+            self.record_step(agent_num, node_num, 'ERROR', str(e), elapsed, started_at)
             return False, str(e)
 
+    def render_charts(self):
+        """Agent4 확률 그래프 후처리 (모든 노드를 한 프로세스에서 생성)"""
+        print(f"\n{'='*60}")
+        print("  확률 그래프 생성 중...")
+        print(f"{'='*60}")
+
+        start = time.time()
+        try:
+            # matplotlib은 후처리 단계에서만 로드
+            from render_probability_charts import render_all_charts
+            summary = render_all_charts()
+            elapsed = time.time() - start
+            self.log_event('Charts', 'SUCCESS',
+                           f"생성 {len(summary['rendered'])}개, 건너뜀 {len(summary['skipped'])}개, "
+                           f"실패 {len(summary['failed'])}개", elapsed)
+        except Exception as e:
+            elapsed = time.time() - start
+            self.log_event('Charts', 'ERROR', f'예외 발생: {str(e)}', elapsed)
+
+    def event_log_path(self):
+        """이번 실행의 이벤트 로그 경로"""
+        return os.path.join(self.log_dir, f"events_all_nodes_{self.start_time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+
     def run_pipeline(self):
-        """전체 파이프라인 실행"""
+        """전체 파이프라인 실행 (실행 이력 레지스트리에 시작/종료 기록)"""
         self.start_time = datetime.now()
+        if self.registry:
+            try:
+                self.run_id = self.registry.start_run('all_nodes', self.agents_to_run,
+                                                      started_at=self.start_time)
+                print(f"[INFO] 실행 ID: {self.run_id}")
+            except Exception as e:
+                print(f"[WARNING] 레지스트리 기록 실패: {e}")
+
+        self.events = EventLogger(self.event_log_path(), run_id=self.run_id)
+        batched_agents = [3] if self.agent3_batch and 3 in self.agents_to_run else []
+        self.events.emit('run_start', pipeline='all_nodes', agents=self.agents_to_run,
+                         batched_agents=batched_agents)
+        print(f"[LOG] 이벤트 로그: {self.events.path}")
+        monitor_server = self.start_monitor()
+
+        status = 'INTERRUPTED'
+        try:
+            success = self.run_steps()
+            status = 'SUCCESS' if success else 'FAILED'
+            return success
+        finally:
+            self.events.emit('run_end', status=status, nodes=len(self.nodes),
+                             elapsed_time=(datetime.now() - self.start_time).total_seconds())
+            self.events.close()
+            self.finish_run(status)
+            if self.profile:
+                self.summarize_profiles()
+            if monitor_server:
+                monitor_server.shutdown()
+
+    def start_monitor(self):
+        """진행 상황 /status 엔드포인트 시작 (monitor_port 지정 시)"""
+        if not self.monitor_port:
+            return None
+        try:
+            from progress_monitor import start_monitor
+            _, server = start_monitor(self.events.path, self.monitor_port)
+            print(f"[INFO] 진행 상황: http://127.0.0.1:{self.monitor_port}/status")
+            return server
+        except OSError as e:
+            print(f"[WARNING] 진행 상황 모니터 시작 실패: {e}")
+            return None
+
+    def finish_run(self, status):
+        """실행 종료 및 산출물 해시를 레지스트리에 기록"""
+        if not self.registry or not self.run_id:
+            return
+        try:
+            total_elapsed = (datetime.now() - self.start_time).total_seconds()
+            self.registry.finish_run(self.run_id, status, total_elapsed, len(self.nodes))
+            self.registry.record_artifacts(self.run_id)
+        except Exception as e:
+            print(f"[WARNING] 레지스트리 기록 실패: {e}")
+
+    def run_steps(self):
+        """Agent 단계 실행 (pipeline_dag.ALL_NODES_PIPELINE의 의존 관계에 따라 스케줄링)"""
         print(f"\n{'#'*60}")
         print(f"  HAZOP 자동화 통합 실행 시작")
         print(f"  실행할 Agent: {self.agents_to_run}")
+        print(f"  동시 실행 단계 수: {self.workers}")
         print(f"  시작 시간: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'#'*60}\n")
 
-        # Step 1: Agent1 - P&ID 분석
-        if 1 in self.agents_to_run:
-            success, output = self.run_agent(1, "gpt4o_P&ID_input(Agent1).py")
-            if not success:
-                print("[ERROR] Agent1 실패. 파이프라인 중단.")
-                return False
-        else:
-            print("[SKIP] Agent1 건너뜀")
-
-        # Step 2: Agent2 - 노드 분리
-        if 2 in self.agents_to_run:
-            success, output = self.run_agent(2, "GPT4o Node (Agent2).py")
-            if not success:
-                print("[ERROR] Agent2 실패. 파이프라인 중단.")
-                return False
-        else:
-            print("[SKIP] Agent2 건너뜀")
-
-        # Agent2 결과에서 노드 추출 (Agent 3,4,5 실행 시 필요)
-        if any(agent in self.agents_to_run for agent in [3, 4, 5]):
-            agent2_output = read_txt(get_output_path('Agent2.txt'))
-            self.nodes = self.extract_nodes(agent2_output)
-
-            if not self.nodes:
-                print("[ERROR] 노드가 추출되지 않았습니다.")
-                return False
+        for step in ALL_NODES_PIPELINE:
+            if 'agent' in step and step['agent'] not in self.agents_to_run and not step.get('fan_out'):
+                print(f"[SKIP] {step['name']} 건너뜀")
 
-        # Step 3-5: 각 노드별로 Agent3~5 실행
-        all_agent3_results = []
-        all_agent4_results = []
-        all_agent5_results = []
-
-        if any(agent in self.agents_to_run for agent in [3, 4, 5]):
-            for node in self.nodes:
-                node_num = node['number']
-                node_name = node['name']
-
-                print(f"\n{'#'*60}")
-                print(f"  Node {node_num}: {node_name} 처리 시작")
-                print(f"{'#'*60}")
-
-                # Agent3: 공정 변수 식별
-                if 3 in self.agents_to_run:
-                    success, _ = self.run_agent(3, "GPT4o Parameter_Guideword (Agent3).py", node_num)
-                    if success:
-                        # 파일에서 결과 읽기
-                        try:
-                            output = read_txt(get_output_path('Agent3.txt'))
-                            all_agent3_results.append(output)
-                        except:
-                            print(f"[WARNING] Node {node_num} Agent3 파일 읽기 실패")
-                    else:
-                        print(f"[WARNING] Node {node_num} Agent3 실패")
-                else:
-                    print(f"[SKIP] Node {node_num} Agent3 건너뜀")
-
-                # Agent4: 이탈 생성
-                if 4 in self.agents_to_run:
-                    success, _ = self.run_agent(4, "GPT4o CreateDeviation (Agent4).py", node_num)
-                    if success:
-                        # 파일에서 결과 읽기
-                        try:
-                            output = read_txt(get_output_path('Agent4.txt'))
-                            all_agent4_results.append(output)
-                        except:
-                            print(f"[WARNING] Node {node_num} Agent4 파일 읽기 실패")
-                    else:
-                        print(f"[WARNING] Node {node_num} Agent4 실패")
-                else:
-                    print(f"[SKIP] Node {node_num} Agent4 건너뜀")
-
-                # Agent5: 안전장치 분석
-                if 5 in self.agents_to_run:
-                    success, _ = self.run_agent(5, "GPT4o Safeguard (Agent5).py", node_num)
-                    if success:
-                        # 파일에서 결과 읽기
-                        try:
-                            output = read_txt(get_output_path('Agent5.txt'))
-                            all_agent5_results.append(output)
-                        except:
-                            print(f"[WARNING] Node {node_num} Agent5 파일 읽기 실패")
-                    else:
-                        print(f"[WARNING] Node {node_num} Agent5 실패")
-                else:
-                    print(f"[SKIP] Node {node_num} Agent5 건너뜀")
-
-        # 통합 결과 저장
-        if any(agent in self.agents_to_run for agent in [3, 4, 5]):
-            print(f"\n{'='*60}")
-            print("  모든 노드 결과 통합 중...")
-            print(f"{'='*60}")
-
-            # Agent3 통합 결과
-            if 3 in self.agents_to_run and all_agent3_results:
-                agent3_combined = '\n\n'.join(all_agent3_results)
-                write_txt(get_output_path('Agent3_all_nodes.txt'), agent3_combined)
-                print(f"[OK] Agent3 통합 결과 저장")
-
-            # Agent4 통합 결과
-            if 4 in self.agents_to_run and all_agent4_results:
-                agent4_combined = '\n\n'.join(all_agent4_results)
-                write_txt(get_output_path('Agent4_all_nodes.txt'), agent4_combined)
-                print(f"[OK] Agent4 통합 결과 저장")
-
-            # Agent5 통합 결과
-            if 5 in self.agents_to_run and all_agent5_results:
-                agent5_combined = '\n\n'.join(all_agent5_results)
-                write_txt(get_output_path('Agent5_all_nodes.txt'), agent5_combined)
-                print(f"[OK] Agent5 통합 결과 저장")
-
-        # Step 6: Agent6 - 최종 테이블 생성
-        if 6 in self.agents_to_run:
-            print(f"\n{'='*60}")
-            print("  최종 HAZOP 테이블 생성 중...")
-            print(f"{'='*60}")
-
-            success, output = self.run_agent(6, "GPT4o HAZOP Table (Agent6).py")
-            if not success:
-                print("[WARNING] Agent6 실행 실패")
-        else:
-            print("\n[SKIP] Agent6 건너뜀")
+        scheduler = DAGScheduler(ALL_NODES_PIPELINE, self.run_dag_task, self.step_enabled,
+                                 self.load_nodes, self.workers, on_skip=self.step_skipped)
+        if not scheduler.run():
+            print(f"[ERROR] {format_task(scheduler.failed_critical)} 실패. 파이프라인 중단.")
+            return False
+        scheduler.print_critical_path()
 
         # 실행 요약
         end_time = datetime.now()
@@ -294,17 +353,126 @@ class HAZOPPipelineAllNodes:
 
         return True
 
+    def step_enabled(self, step):
+        """DAG 단계 실행 여부 (실행할 Agent 목록과 when 조건)"""
+        if 'agent' in step and step['agent'] not in self.agents_to_run:
+            return False
+        conditions = {
+            'agent3_batch': self.agent3_batch,
+            'agent4': 4 in self.agents_to_run,
+            'agent5': 5 in self.agents_to_run,
+            'charts': config.RENDER_CHARTS,
+            'node_agents': any(agent in self.agents_to_run for agent in [3, 4, 5]),
+        }
+        return all(conditions[name] for name in step.get('when', []))
+
+    def load_nodes(self):
+        """Agent2 결과에서 노드 추출 (노드별 단계를 펼칠 때 스케줄러가 한 번 호출)"""
+        agent2_output = read_txt(get_output_path('Agent2.txt'))
+        self.nodes = self.extract_nodes(agent2_output)
+        if self.nodes:
+            self.events.emit('nodes_extracted', nodes=[n['number'] for n in self.nodes])
+        return [n['number'] for n in self.nodes]
+
+    def run_dag_task(self, step, node_num):
+        """DAG 작업 1개 실행 (Agent 스크립트 또는 프로세스 내 작업)"""
+        if 'task' in step:
+            return getattr(self, f"task_{step['task']}")(node_num)
+
+        agent_num = step['agent']
+        if agent_num == 3 and node_num in self.batched_nodes:
+            print(f"[SKIP] Node {node_num} Agent3: 일괄 실행 결과 사용")
+            self.completed.setdefault(agent_num, set()).add(node_num)
+            return True
+
+        if agent_num == 3 and node_num is None:
+            return self.run_agent3_batch(step['script'])
+
+        success, _ = self.run_agent(agent_num, step['script'], node_num)
+        if success:
+            self.completed.setdefault(agent_num, set()).add(node_num)
+        elif node_num is not None:
+            print(f"[WARNING] Node {node_num} Agent{agent_num} 실패")
+        elif agent_num == 6:
+            print("[WARNING] Agent6 실행 실패")
+        return success
+
+    def step_skipped(self, step, node_num):
+        """선행 단계 실패로 건너뛴 Agent 단계를 이벤트 로그에 기록 (진행 모니터의 남은 단계에서 제외)"""
+        if self.events and 'task' not in step:
+            self.events.emit('step_skipped', agent_name=f"Agent{step['agent']} (Node {node_num})",
+                             status='SKIPPED', agent=step['agent'], node=node_num)
+
+    def run_agent3_batch(self, script_name):
+        """Agent3 일괄 실행: 이번 실행에서 저장된 Agent3_node{n}.json이 있는 노드는 노드별 Agent3 생략"""
+        batch_start = time.time()
+        success, _ = self.run_agent(3, script_name)
+        agent2_path = get_output_path('Agent2.txt')
+        node_numbers = ([node['number'] for node in self.extract_nodes(read_txt(agent2_path))]
+                        if os.path.exists(agent2_path) else [])
+        if success:
+            for node_num in node_numbers:
+                json_path = get_output_path(f"Agent3_node{node_num}.json")
+                if os.path.exists(json_path) and os.path.getmtime(json_path) >= batch_start:
+                    self.batched_nodes.add(node_num)
+        print(f"[INFO] Agent3 일괄 결과 {len(self.batched_nodes)}개 노드, 나머지 노드는 노드별로 실행")
+        if self.events:
+            # 진행 모니터가 노드별로 다시 실행할 Agent3 단계를 계획에 추가
+            self.events.emit('agent3_fallback',
+                             nodes=[n for n in node_numbers if n not in self.batched_nodes])
+        return success
+
+    def task_table_fragment(self, node_num):
+        """Agent5가 끝난 노드의 HAZOP 테이블 조각 생성 (Agent6는 조각을 모아 Excel만 작성)"""
+        try:
+            rows = build_fragment(node_num)
+        except (IOError, ValueError) as e:
+            print(f"[WARNING] Node {node_num} HAZOP 테이블 조각 생성 실패 (Agent6에서 직접 변환): {e}")
+            return False
+        print(f"[OK] Node {node_num} HAZOP 테이블 조각 저장 ({rows}행)")
+        return True
+
+    def task_charts(self, node_num=None):
+        """Agent4 확률 그래프 후처리 (모든 노드의 Agent4가 끝난 뒤)"""
+        self.render_charts()
+        return True
+
+    def task_combine(self, node_num=None):
+        """노드별 Agent3~5 JSON을 통합 결과 파일로 저장 (성공한 노드만, 노드 순서대로)"""
+        print(f"\n{'='*60}")
+        print("  모든 노드 결과 통합 중...")
+        print(f"{'='*60}")
+
+        for agent_num in [3, 4, 5]:
+            completed = self.completed.get(agent_num, set())
+            if agent_num not in self.agents_to_run or not completed:
+                continue
+            results = []
+            for node in self.nodes:
+                json_path = get_output_path(f"Agent{agent_num}_node{node['number']}.json")
+                if node['number'] not in completed:
+                    continue
+                if os.path.exists(json_path):
+                    results.append(read_txt(json_path))
+                else:
+                    print(f"[WARNING] Node {node['number']} Agent{agent_num} 파일 읽기 실패")
+            write_txt(get_output_path(f'Agent{agent_num}_all_nodes.txt'), '\n\n'.join(results))
+            print(f"[OK] Agent{agent_num} 통합 결과 저장")
+        return True
+
     def save_log(self):
         """실행 로그를 JSON 파일로 저장"""
         log_filename = f"execution_log_all_nodes_{self.start_time.strftime('%Y%m%d_%H%M%S')}.json"
         log_path = os.path.join(self.log_dir, log_filename)
 
         log_data = {
+            'run_id': self.run_id,
             'start_time': self.start_time.isoformat(),
             'end_time': datetime.now().isoformat(),
             'total_elapsed': (datetime.now() - self.start_time).total_seconds(),
             'nodes_processed': [{'number': n['number'], 'name': n['name']} for n in self.nodes],
-            'events': self.execution_log
+            'event_log': self.events.path if self.events else None,
+            'event_counts': self.event_counts
         }
 
         try:
@@ -330,6 +498,26 @@ def main():
         choices=[1, 2, 3, 4, 5, 6],
         help='실행할 Agent 번호들 (예: --agents 1 2 또는 --agents 6)'
     )
+    parser.add_argument(
+        '--monitor-port',
+        type=int,
+        help='진행 상황 HTTP /status 포트 (예: --monitor-port 8765)'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='각 Agent 단계를 cProfile + tracemalloc으로 프로파일링 (logs/profiles/)'
+    )
+    parser.add_argument(
+        '--agent3-batch',
+        action='store_true',
+        help='Agent3를 모든 노드에 대해 한 번의 vision 요청으로 실행 (AGENT3_BATCH)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='동시에 실행할 단계 수, 2 이상이면 여러 노드를 겹쳐 실행 (PIPELINE_MAX_WORKERS)'
+    )
     args = parser.parse_args()
 
     print("HAZOP 자동화 시스템 v2.0")
@@ -341,7 +529,9 @@ def main():
     print("=" * 60)
 
     try:
-        pipeline = HAZOPPipelineAllNodes(agents_to_run=agents_to_run)
+        pipeline = HAZOPPipelineAllNodes(agents_to_run=agents_to_run, monitor_port=args.monitor_port,
+                                         profile=args.profile or None, agent3_batch=args.agent3_batch or None,
+                                         workers=args.workers)
         success = pipeline.run_pipeline()
 
         if success:
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+오프라인 벤치마크용 Chat Completions mock 서버
+실제 API 비용과 네트워크 편차 없이 파이프라인 성능을 측정하기 위해
+/v1/chat/completions 요청에 Agent1~5 형식의 결정적(deterministic) 응답을 돌려줍니다.
+
+- 요청의 system prompt로 어느 Agent의 호출인지 판별
+- 응답 지연: 로그정규분포 (중앙값, sigma) / 오류(500)와 429 비율 설정 가능
+- --recorded 로 실제 실행 결과 디렉토리를 지정하면 그 응답을 노드 번호만 바꿔 재사용
+
+이 모듈은 config.py를 import하지 않습니다 (API 키 검증 없이 단독 실행 가능).
+
+사용 예:
+    python mock_llm_server.py --port 8900 --nodes 10 --latency-median 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 python main_integrated_all_nodes.py
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# system prompt 판별 문구 → Agent 종류 (위에서부터 검사)
+AGENT_MARKERS = [
+    ('agent4_score', '발생 가능성을 평가'),
+    ('agent1', 'P&ID(Piping and Instrumentation Diagram) 도면 분석'),
+    ('agent2', 'HAZOP 노드 분리 전문가'),
+    ('agent3_batch', '여러 노드의 공정 변수를 한 번에'),
+    ('agent3', 'HAZOP 공정변수 식별 전문가'),
+    ('agent4', 'HAZOP deviation 시나리오 생성 전문가'),
+    ('agent5_adapt', '이전 노드의 분석 결과를 이 노드에 맞게'),
+    ('agent5', 'HAZOP 안전 분석 전문가'),
+]
+
+# --recorded 디렉토리에서 읽을 파일 (노드별 파일은 {node} 치환)
+RECORDED_FILES = {
+    'agent1': '공정요소.txt',
+    'agent2': 'Agent2.txt',
+    'agent3': 'Agent3_node{node}.json',
+    'agent4': 'Agent4_node{node}.json',
+    'agent5': 'Agent5_node{node}.json',
+}
+
+NODE_PATTERN = re.compile(r'Node\s+(\d+)')
+DEVIATION_ID_PATTERN = re.compile(r'"deviation_id":\s*(\d+)')
+TABLE_ID_PATTERN = re.compile(r'^(\d+)\|', re.MULTILINE)  # prompt_encoding table 방식의 첫 열 (id)
+
+PROMPT_CACHE_SIZE = 64  # 앞부분 비교에 보관할 최근 요청 수
+
+PARAMETERS = ['Flow', 'Pressure', 'Temperature', 'Level', 'Composition']
+GUIDEWORDS = ['None', 'More', 'Less', 'Reverse']
+
+
+def _message_text(message):
+    """메시지 content에서 텍스트만 추출 (vision 요청은 text 항목만)"""
+    content = message.get('content', '')
+    if isinstance(content, list):
+        return '\n'.join(part.get('text', '') for part in content if part.get('type') == 'text')
+    return content or ''
+
+
+def classify_request(payload):
+    """요청 payload → (Agent 종류, 노드 번호)"""
+    messages = payload.get('messages', [])
+    system_text = '\n'.join(_message_text(m) for m in messages if m.get('role') == 'system')
+    user_text = '\n'.join(_message_text(m) for m in messages if m.get('role') == 'user')
+
+    kind = 'unknown'
+    for name, marker in AGENT_MARKERS:
+        if marker in system_text:
+            kind = name
+            break
+
+    match = NODE_PATTERN.search(user_text)
+    node = int(match.group(1)) if match else 1
+    return kind, node, user_text
+
+
+# ========== 합성 응답 ==========
+
+def _tags(node):
+    """노드별 결정적 장비/계기 태그"""
+    base = 1100 + node
+    return [f"V-{base}", f"B-{base}"], [f"PT-{base}", f"TT-{base}", f"FT-{base}"]
+
+
+def synthetic_agent1(node_count):
+    equipment = []
+    instruments = []
+    for node in range(1, node_count + 1):
+        equipment_tags, instrument_tags = _tags(node)
+        equipment += [{'tag': tag, 'type': 'Vessel' if tag.startswith('V') else 'Blower',
+                       'location': f'Node {node}'} for tag in equipment_tags]
+        instruments += [{'tag': tag, 'type': 'Transmitter', 'measured_equipment': equipment_tags[0]}
+                        for tag in instrument_tags]
+    return {
+        'equipment_list': equipment,
+        'instrument_list': instruments,
+        'total_count': {'equipment': len(equipment), 'instruments': len(instruments)},
+    }
+
+
+def synthetic_agent2(node_count):
+    nodes = []
+    for node in range(1, node_count + 1):
+        equipment_tags, instrument_tags = _tags(node)
+        nodes.append({
+            'node_id': node,
+            'node_name': f'벤치마크 노드 {node}',
+            'design_intent': f'노드 {node}의 바이오가스 이송 및 압력 유지',
+            'equipment_tags': equipment_tags,
+            'instrument_tags': instrument_tags,
+            'boundary': {'inlet': f'Node {node - 1} 출구' if node > 1 else '공정 입구',
+                         'outlet': f'Node {node + 1} 입구'},
+        })
+    return {'nodes': nodes, 'total_nodes': node_count}
+
+
+def synthetic_agent3(node):
+    return {
+        'node_id': node,
+        'node_name': f'벤치마크 노드 {node}',
+        'applicable_parameters': [
+            {'parameter': p, 'applicable': True, 'reason': f'{p} 계기가 설치되어 있음'} for p in PARAMETERS[:3]
+        ],
+        'selected_parameters': PARAMETERS[:3],
+        'total_count': 3,
+    }
+
+
+def synthetic_agent3_batch(user_text):
+    nodes = sorted({int(n) for n in NODE_PATTERN.findall(user_text)}) or [1]
+    return {'nodes': [synthetic_agent3(node) for node in nodes]}
+
+
+def synthetic_agent4(node, user_text):
+    equipment_tags, _ = _tags(node)
+    parameters = [p for p in PARAMETERS if p in user_text][:3] or PARAMETERS[:3]
+    deviations = []
+    for parameter in parameters:
+        # 가이드워드 행렬로 제시된 조합이 있으면 그 조합만 생성
+        listed = re.search(rf'^- {parameter}: (.+)$', user_text, re.MULTILINE)
+        guidewords = [g for g in GUIDEWORDS if g in listed.group(1).split(', ')] if listed else GUIDEWORDS
+        for guideword in guidewords:
+            deviations.append({
+                'parameter': parameter,
+                'guideword': guideword,
+                'deviation': f'{guideword} {parameter}',
+                'description': (f'{equipment_tags[1]} 이상으로 {parameter} 값이 설계 범위를 벗어남. '
+                                f'{equipment_tags[0]} 운전 조건 변화로 하류 공정에 영향.'),
+                'probability_score': (len(deviations) * 3 + node) % 10 + 1,
+            })
+    return {'node_id': node, 'node_name': f'벤치마크 노드 {node}', 'deviations': deviations}
+
+
+def _deviation_ids(user_text):
+    """프롬프트의 deviation_id 목록 (JSON 또는 table 인코딩)"""
+    return {int(i) for i in DEVIATION_ID_PATTERN.findall(user_text) + TABLE_ID_PATTERN.findall(user_text)}
+
+
+def synthetic_agent4_scores(user_text):
+    ids = sorted(_deviation_ids(user_text))
+    return {'scores': [{'deviation_id': i, 'probability_score': i % 10 + 1} for i in ids]}
+
+
+def synthetic_agent5(node, user_text):
+    _, instrument_tags = _tags(node)
+    ids = sorted(_deviation_ids(user_text)) or range(1, 13)
+    severities = ['High', 'Medium', 'Low']
+    analysis = []
+    for i in ids:
+        parameter = PARAMETERS[(i - 1) // len(GUIDEWORDS) % len(PARAMETERS)]
+        guideword = GUIDEWORDS[(i - 1) % len(GUIDEWORDS)]
+        analysis.append({
+            'deviation_id': i,
+            'parameter': parameter,
+            'guideword': guideword,
+            'deviation': f'{guideword} {parameter}',
+            'causes': ['제어밸브 오작동', '계기 고장'],
+            'consequences': ['공정 중단', '설비 손상 가능성'],
+            'severity': severities[i % 3],
+            'safeguards': [f'{instrument_tags[0]} (알람)'],
+            'recommendations': ['인터록 추가 검토'],
+        })
+    return {'node_id': node, 'node_name': f'벤치마크 노드 {node}', 'hazop_analysis': analysis}
+
+
+def synthetic_agent5_adapt(node, user_text):
+    _, instrument_tags = _tags(node)
+    return {'adapted': [{'deviation_id': i, 'safeguards': [f'{instrument_tags[0]} (알람)']}
+                        for i in sorted(_deviation_ids(user_text))]}
+
+
+def _as_json_block(data):
+    """실제 모델처럼 ```json 블록으로 감싼 응답"""
+    return "```json\n" + json.dumps(data, ensure_ascii=False, indent=2) + "\n```"
+
+
+# ========== 서버 ==========
+
+class MockLLM:
+    """응답 생성 + 지연/오류 주입 (시드 고정으로 결정적)"""
+
+    def __init__(self, node_count=3, latency_median=0.0, latency_sigma=0.0,
+                 error_rate=0.0, rate_limit_rate=0.0, seed=42, recorded_dir=None, invalid_json_rate=0.0):
+        self.node_count = node_count
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.invalid_json_rate = invalid_json_rate
+        self.recorded_dir = recorded_dir
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'invalid_json': 0, 'cached_tokens': 0,
+                      'by_agent': {}}
+        self._seen_prompts = []  # 프롬프트 캐시 흉내 (최근 요청의 직렬화된 messages)
+
+    def _draw(self):
+        """(지연 시간, 결과 종류) 추첨"""
+        with self._lock:
+            latency = 0.0
+            if self.latency_median > 0:
+                latency = self.latency_median * math.exp(self._random.gauss(0, self.latency_sigma))
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return latency, 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return latency, 500
+        return latency, 200
+
+    def _recorded(self, kind, node):
+        """기록된 응답 (노드 번호만 교체), 없으면 None"""
+        if not self.recorded_dir or kind not in RECORDED_FILES:
+            return None
+        if kind == 'agent2':
+            return None  # 노드 수를 바꿀 수 있도록 항상 합성
+        filename = RECORDED_FILES[kind]
+        path = os.path.join(self.recorded_dir, filename.format(node=node))
+        if '{node}' in filename and not os.path.exists(path):
+            # 기록된 노드 수보다 많으면 1번 노드 응답 재사용
+            path = os.path.join(self.recorded_dir, filename.format(node=1))
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        if '{node}' in filename:
+            text = re.sub(r'"node_id":\s*\d+', f'"node_id": {node}', text, count=1)
+        return text
+
+    def _cached_tokens(self, serialized):
+        """
+        이전 요청과 공유하는 앞부분 토큰 수 (OpenAI 프롬프트 캐시 규칙 흉내)
+        1024 토큰 이상부터 128 토큰 단위, 토큰 = 문자 4개로 근사
+        """
+        with self._lock:
+            shared = max((len(os.path.commonprefix([serialized, seen])) for seen in self._seen_prompts), default=0)
+            self._seen_prompts = (self._seen_prompts + [serialized])[-PROMPT_CACHE_SIZE:]
+        tokens = shared // 4
+        if tokens < 1024:
+            return 0
+        return 1024 + (tokens - 1024) // 128 * 128
+
+    def respond(self, payload):
+        """요청 payload → (HTTP 상태, 응답 본문 딕셔너리)"""
+        kind, node, user_text = classify_request(payload)
+        latency, status = self._draw()
+        if latency:
+            time.sleep(latency)
+
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['by_agent'][kind] = self.stats['by_agent'].get(kind, 0) + 1
+            if status == 429:
+                self.stats['rate_limited'] += 1
+            elif status != 200:
+                self.stats['errors'] += 1
+
+        if status == 429:
+            return 429, {'error': {'message': 'Rate limit reached (mock)', 'type': 'rate_limit_error'}}
+        if status != 200:
+            return status, {'error': {'message': 'Internal error (mock)', 'type': 'server_error'}}
+
+        content = self._recorded(kind, node)
+        if content is None:
+            if kind == 'agent1':
+                content = _as_json_block(synthetic_agent1(self.node_count))
+            elif kind == 'agent2':
+                content = _as_json_block(synthetic_agent2(self.node_count))
+            elif kind == 'agent3':
+                content = _as_json_block(synthetic_agent3(node))
+            elif kind == 'agent3_batch':
+                content = _as_json_block(synthetic_agent3_batch(user_text))
+            elif kind == 'agent4':
+                content = _as_json_block(synthetic_agent4(node, user_text))
+            elif kind == 'agent4_score':
+                content = _as_json_block(synthetic_agent4_scores(user_text))
+            elif kind == 'agent5_adapt':
+                content = _as_json_block(synthetic_agent5_adapt(node, user_text))
+            elif kind == 'agent5':
+                content = _as_json_block(synthetic_agent5(node, user_text))
+            else:
+                content = '{}'
+
+        # structured output 요청이면 코드 블록 없는 JSON (실제 API와 동일)
+        if (payload.get('response_format') or {}).get('type') == 'json_schema' and content.startswith('```json'):
+            content = content.split('```json')[1].split('```')[0].strip()
+        # 잘린 JSON 주입 (파싱 실패/재요청 경로 측정)
+        if self.invalid_json_rate > 0:
+            with self._lock:
+                invalid = self._random.random() < self.invalid_json_rate
+                if invalid:
+                    self.stats['invalid_json'] += 1
+            if invalid:
+                content = content[:len(content) // 2]
+
+        serialized = json.dumps(payload.get('messages', []), ensure_ascii=False)
+        prompt_tokens = len(serialized) // 4
+        cached_tokens = self._cached_tokens(serialized)
+        with self._lock:
+            self.stats['cached_tokens'] += cached_tokens
+        return 200, {
+            'id': f'mock-{kind}-{node}',
+            'object': 'chat.completion',
+            'model': payload.get('model', 'mock'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(content) // 4,
+                'total_tokens': prompt_tokens + len(content) // 4,
+                'prompt_tokens_details': {'cached_tokens': cached_tokens},
+            },
+        }
+
+
+def start_mock_server(mock, port=0, host='127.0.0.1'):
+    """mock 서버를 백그라운드 스레드로 시작, (서버, 실제 포트) 반환"""
+
+    class ChatHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self.send_error(404)
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError:
+                self.send_error(400)
+                return
+
+            status, body = mock.respond(payload)
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            # 상태 확인용: 지금까지의 요청 통계
+            data = json.dumps(mock.stats, ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), ChatHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def main():
+    """메인 실행 함수"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Chat Completions mock 서버 (오프라인 벤치마크용)')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--nodes', type=int, default=3, help='Agent2 응답의 노드 수')
+    parser.add_argument('--latency-median', type=float, default=0.0, help='응답 지연 중앙값 (초)')
+    parser.add_argument('--latency-sigma', type=float, default=0.0, help='로그정규 지연 분산 (0이면 고정)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='500 오류 비율 (0-1)')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='429 응답 비율 (0-1)')
+    parser.add_argument('--invalid-json-rate', type=float, default=0.0, help='잘린 JSON 응답 비율 (0-1)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--recorded', help='실제 실행 결과 디렉토리 (Agent1,3,4,5 응답 재사용)')
+    args = parser.parse_args()
+
+    mock = MockLLM(args.nodes, args.latency_median, args.latency_sigma,
+                   args.error_rate, args.rate_limit_rate, args.seed, args.recorded, args.invalid_json_rate)
+    server, port = start_mock_server(mock, args.port)
+    print(f"[INFO] mock 서버 시작: http://127.0.0.1:{port}/v1 (노드 {args.nodes}개)")
+    print(f"[INFO] 사용: OPENAI_BASE_URL=http://127.0.0.1:{port}/v1")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\n[INFO] 요청 통계: {json.dumps(mock.stats, ensure_ascii=False)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+규칙 기반 공정 변수 사전 선택 (Agent3 LLM 호출 생략용)
+노드의 계기 태그 접두어(PI→Pressure, TI→Temperature, FI→Flow, LI→Level, AI→Composition)와
+장비 종류(Agent1 equipment_list의 type)로 공정 변수를 결정적으로 선택합니다.
+
+신뢰도 = 인식한 계기 비율 × 인식한 장비 비율 × min(1, 계기로 확인된 변수 수 / 3)
+신뢰도가 PARAMETER_PRESELECT_MIN_CONFIDENCE 이상이면 Agent3는 vision 요청 없이 이 결과를 사용하고,
+낮거나 PARAMETER_PRESELECT_LLM_NODES에 지정된 노드는 기존대로 LLM이 선택합니다.
+
+사용 예:
+    python parameter_preselector.py   # 현재 Agent1/Agent2 결과로 노드별 사전 선택 결과와 신뢰도 확인
+"""
+
+import os
+import re
+import sys
+import json
+
+from config import config
+from hazop_utils import get_output_path
+
+
+# ISA 계기 태그 첫 글자(측정 변수) → 공정 변수
+INSTRUMENT_PARAMETERS = {
+    'P': 'Pressure',
+    'T': 'Temperature',
+    'F': 'Flow',
+    'L': 'Level',
+    'A': 'Composition',
+}
+
+# 장비 종류 키워드 → 공정 변수 (Agent1 equipment_list의 type, 영문/한글)
+EQUIPMENT_PARAMETERS = [
+    (('reactor', 'digester', '반응기', '소화조'), ['Reaction', 'Temperature']),
+    (('exchanger', 'heater', 'cooler', 'condenser', 'boiler', 'chiller',
+      '열교환기', '히터', '가열기', '냉각기', '응축기', '보일러'), ['Temperature']),
+    (('column', 'tower', 'scrubber', 'absorber', '탑', '스크러버', '흡수'), ['Pressure', 'Level', 'Composition']),
+    (('vessel', 'tank', 'drum', 'separator', 'holder', '탱크', '저장조', '드럼', '분리기', '용기'),
+     ['Level', 'Pressure']),
+    (('pump', '펌프'), ['Flow', 'Pressure']),
+    (('blower', 'compressor', 'fan', '송풍기', '블로워', '압축기'), ['Flow', 'Pressure']),
+    (('mixer', 'agitator', '교반기', '혼합기'), ['Mixing']),
+    (('filter', 'strainer', '필터', '여과기'), ['Flow', 'Pressure']),
+    (('valve', '밸브'), ['Flow']),
+]
+
+# Agent1에 장비 종류가 없을 때 장비 태그 접두어로 추정
+EQUIPMENT_TAG_TYPES = {
+    'V': 'vessel', 'D': 'drum', 'TK': 'tank', 'T': 'tower',
+    'P': 'pump', 'B': 'blower', 'C': 'compressor', 'K': 'compressor',
+    'E': 'exchanger', 'H': 'heater', 'R': 'reactor', 'M': 'mixer', 'AG': 'agitator',
+}
+
+# 출력 순서 (Agent3 프롬프트의 변수 목록 순서)
+PARAMETER_ORDER = ['Flow', 'Pressure', 'Temperature', 'Level', 'Composition', 'Phase', 'Viscosity',
+                   'Reaction', 'Mixing', 'Corrosion/Erosion', 'Maintenance']
+
+MIN_INSTRUMENTED_PARAMETERS = 3  # 이 수 이상의 변수가 계기로 확인되어야 신뢰도 1
+
+_TAG_PREFIX = re.compile(r'^([A-Z]+)')
+
+
+def _tag_prefix(tag):
+    """태그의 영문 접두어 (예: 'PIC-1101' → 'PIC')"""
+    match = _TAG_PREFIX.match((tag or '').strip().upper())
+    return match.group(1) if match else ''
+
+
+def instrument_parameter(tag):
+    """계기 태그의 측정 변수 (인식하지 못하면 None)"""
+    prefix = _tag_prefix(tag)
+    return INSTRUMENT_PARAMETERS.get(prefix[:1]) if prefix else None
+
+
+def equipment_parameters(tag, equipment_type=None):
+    """장비의 공정 변수 목록 (인식하지 못하면 빈 리스트)"""
+    if not equipment_type:
+        prefix = _tag_prefix(tag)
+        equipment_type = EQUIPMENT_TAG_TYPES.get(prefix) or EQUIPMENT_TAG_TYPES.get(prefix[:1], '')
+    equipment_type = equipment_type.lower()
+    for keywords, parameters in EQUIPMENT_PARAMETERS:
+        if any(keyword in equipment_type for keyword in keywords):
+            return parameters
+    return []
+
+
+def load_equipment_types():
+    """Agent1 결과(공정요소.txt)의 {장비 태그: 종류} (없거나 파싱 실패 시 빈 딕셔너리)"""
+    path = get_output_path('공정요소.txt')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    json_str = content.split("```json")[1].split("```")[0] if "```json" in content else content
+    try:
+        data = json.loads(json_str)
+    except json.JSONDecodeError:
+        return {}
+    return {item.get('tag'): item.get('type', '') for item in data.get('equipment_list', []) if item.get('tag')}
+
+
+def preselect_node(node, equipment_types=None):
+    """
+    노드 하나의 규칙 기반 변수 선택
+
+    Args:
+        node: Agent2 노드 딕셔너리 (node_id, node_name, equipment_tags, instrument_tags)
+        equipment_types: {장비 태그: 종류} (load_equipment_types 결과)
+
+    Returns:
+        Agent3 JSON과 같은 형식의 딕셔너리 + 'selection_method', 'confidence'
+    """
+    equipment_types = equipment_types or {}
+    instrument_tags = node.get('instrument_tags', [])
+    equipment_tags = node.get('equipment_tags', [])
+
+    evidence = {}  # {변수: [근거]}
+    instrumented = set()
+    recognized_instruments = 0
+    for tag in instrument_tags:
+        parameter = instrument_parameter(tag)
+        if parameter:
+            recognized_instruments += 1
+            instrumented.add(parameter)
+            evidence.setdefault(parameter, []).append(f"{tag} 계기")
+
+    recognized_equipment = 0
+    for tag in equipment_tags:
+        parameters = equipment_parameters(tag, equipment_types.get(tag))
+        if parameters:
+            recognized_equipment += 1
+        for parameter in parameters:
+            label = f"{tag} ({equipment_types[tag]})" if equipment_types.get(tag) else tag
+            evidence.setdefault(parameter, []).append(label)
+
+    instrument_ratio = recognized_instruments / len(instrument_tags) if instrument_tags else 0.0
+    equipment_ratio = recognized_equipment / len(equipment_tags) if equipment_tags else 1.0
+    strength = min(1.0, len(instrumented) / MIN_INSTRUMENTED_PARAMETERS)
+    confidence = round(instrument_ratio * equipment_ratio * strength, 2)
+
+    selected = [parameter for parameter in PARAMETER_ORDER if parameter in evidence]
+    return {
+        'node_id': node.get('node_id'),
+        'node_name': node.get('node_name'),
+        'applicable_parameters': [
+            {'parameter': parameter, 'applicable': True, 'reason': ', '.join(evidence[parameter])}
+            for parameter in selected
+        ],
+        'selected_parameters': selected,
+        'total_count': len(selected),
+        'selection_method': 'rule',
+        'confidence': confidence,
+    }
+
+
+def llm_override_nodes():
+    """항상 LLM으로 선택할 노드 번호 (PARAMETER_PRESELECT_LLM_NODES)"""
+    nodes = set()
+    for value in config.PARAMETER_PRESELECT_LLM_NODES.split(','):
+        value = value.strip()
+        if value.isdigit():
+            nodes.add(int(value))
+    return nodes
+
+
+def accepted_preselection(node, equipment_types=None):
+    """
+    LLM 호출 없이 사용할 사전 선택 결과 (사용하지 않으면 None)
+
+    PARAMETER_PRESELECT가 꺼져 있거나, 노드가 LLM 지정 노드이거나, 신뢰도가 기준 미만이면 None
+    """
+    if not config.PARAMETER_PRESELECT or node.get('node_id') in llm_override_nodes():
+        return None
+    result = preselect_node(node, equipment_types)
+    if result['confidence'] < config.PARAMETER_PRESELECT_MIN_CONFIDENCE or not result['selected_parameters']:
+        print(f"[INFO] Node {node.get('node_id')}: 규칙 기반 선택 신뢰도 {result['confidence']:.2f} "
+              f"< {config.PARAMETER_PRESELECT_MIN_CONFIDENCE:.2f} → LLM 선택")
+        return None
+    return result
+
+
+def main():
+    """메인 실행 함수: Agent2 노드별 사전 선택 결과 출력"""
+    path = get_output_path('Agent2.txt')
+    if not os.path.exists(path):
+        print(f"[ERROR] Agent2 결과가 없습니다: {path}")
+        return 1
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    json_str = content.split("```json")[1].split("```")[0] if "```json" in content else content
+    nodes = json.loads(json_str).get('nodes', [])
+
+    equipment_types = load_equipment_types()
+    overrides = llm_override_nodes()
+    threshold = config.PARAMETER_PRESELECT_MIN_CONFIDENCE
+    print(f"\n기준 신뢰도 {threshold:.2f}, 장비 종류 {len(equipment_types)}개 (Agent1)")
+    skipped = 0
+    for node in nodes:
+        result = preselect_node(node, equipment_types)
+        use_rule = result['confidence'] >= threshold and result['selected_parameters'] \
+            and node.get('node_id') not in overrides
+        skipped += bool(use_rule)
+        print(f"  Node {node.get('node_id'):<4} {result['confidence']:.2f}  {'규칙' if use_rule else 'LLM ':<4}  "
+              f"{', '.join(result['selected_parameters']) or '(없음)'}")
+    print(f"\nLLM 호출 생략 가능: {skipped}/{len(nodes)}개 노드")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
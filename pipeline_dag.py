@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+파이프라인 단계 DAG 정의 및 스케줄러
+통합 실행의 Agent 순서를 코드에 고정하는 대신, 단계마다 선행 단계·입출력·노드별 실행 여부를 선언하고
+선행 단계가 끝나는 즉시 다음 단계를 시작합니다 (PIPELINE_MAX_WORKERS > 1이면 노드별 단계가 겹쳐 실행).
+
+단계 정의 키:
+- name: 단계 이름 (after에서 참조)
+- agent: Agent 번호 (실행할 Agent 선택에 사용, 없으면 항상 대상)
+- script: 서브프로세스로 실행할 Agent 스크립트 / task: 오케스트레이터의 프로세스 내 작업 이름
+- after: 선행 단계 이름 목록
+- fan_out: True면 노드마다 한 번씩 실행 (inputs/outputs의 {node}는 노드 번호)
+- inputs / outputs: 읽고 쓰는 파일 (표시 및 DAG 검증용)
+- when: 추가 실행 조건 이름 목록 (오케스트레이터가 판단)
+- critical: 실패하면 남은 단계를 취소하고 실행 실패로 처리
+
+의존 관계:
+- 노드별 단계 → 노드별 단계: 같은 노드끼리 연결, 선행 단계가 실패한 노드는 건너뜀
+- 노드별 단계 → 일반 단계: 모든 노드가 끝난 뒤 실행 (성공한 노드 결과로 진행)
+- 실행하지 않는 단계는 그 선행 단계를 대신 물려받음
+
+사용 예:
+    python pipeline_dag.py all_nodes   # 단계 그래프와 최근 실행 기록 기준 예상 임계 경로
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+SINGLE_PIPELINE = [
+    {'name': 'Agent1', 'agent': 1, 'script': "gpt4o_P&ID_input(Agent1).py",
+     'outputs': ['공정요소.txt'], 'critical': True},
+    {'name': 'Agent2', 'agent': 2, 'script': "GPT4o Node (Agent2).py", 'after': ['Agent1'],
+     'inputs': ['공정요소.txt'], 'outputs': ['Agent2.txt'], 'critical': True},
+    {'name': 'Agent3', 'agent': 3, 'script': "GPT4o Parameter_Guideword (Agent3).py", 'after': ['Agent2'],
+     'inputs': ['Agent2.txt'], 'outputs': ['Agent3.txt'], 'critical': True},
+    {'name': 'Agent4', 'agent': 4, 'script': "GPT4o CreateDeviation (Agent4).py", 'after': ['Agent3'],
+     'inputs': ['Agent2.txt', 'Agent3.txt'], 'outputs': ['Agent4.txt'], 'critical': True},
+    {'name': 'Charts', 'task': 'charts', 'after': ['Agent4'], 'when': ['charts'],
+     'inputs': ['Agent4.txt']},
+    {'name': 'Agent5', 'agent': 5, 'script': "GPT4o Safeguard (Agent5).py", 'after': ['Agent4'],
+     'inputs': ['Agent2.txt', 'Agent4.txt'], 'outputs': ['Agent5.txt'], 'critical': True},
+    {'name': 'Agent6', 'agent': 6, 'script': "GPT4o HAZOP Table (Agent6).py", 'after': ['Agent5'],
+     'inputs': ['Agent5.txt'], 'outputs': ['HAZOP_table.xlsx'], 'critical': True},
+]
+
+ALL_NODES_PIPELINE = [
+    {'name': 'Agent1', 'agent': 1, 'script': "gpt4o_P&ID_input(Agent1).py",
+     'outputs': ['공정요소.txt'], 'critical': True},
+    {'name': 'Agent2', 'agent': 2, 'script': "GPT4o Node (Agent2).py", 'after': ['Agent1'],
+     'inputs': ['공정요소.txt'], 'outputs': ['Agent2.txt'], 'critical': True},
+    {'name': 'Agent3 일괄', 'agent': 3, 'script': "GPT4o Parameter_Guideword Batch (Agent3).py",
+     'after': ['Agent2'], 'when': ['agent3_batch'], 'inputs': ['Agent2.txt'], 'outputs': ['Agent3.txt']},
+    {'name': 'Agent3', 'agent': 3, 'script': "GPT4o Parameter_Guideword (Agent3).py", 'fan_out': True,
+     'after': ['Agent2', 'Agent3 일괄'], 'inputs': ['Agent2.txt'], 'outputs': ['Agent3_node{node}.json']},
+    {'name': 'Agent4', 'agent': 4, 'script': "GPT4o CreateDeviation (Agent4).py", 'fan_out': True,
+     'after': ['Agent3'], 'inputs': ['Agent2.txt', 'Agent3_node{node}.json'], 'outputs': ['Agent4_node{node}.json']},
+    {'name': 'Agent5', 'agent': 5, 'script': "GPT4o Safeguard (Agent5).py", 'fan_out': True,
+     'after': ['Agent4'], 'inputs': ['Agent2.txt', 'Agent4_node{node}.json'], 'outputs': ['Agent5_node{node}.json']},
+    {'name': 'Agent6 조각', 'agent': 6, 'task': 'table_fragment', 'fan_out': True, 'after': ['Agent5'],
+     'when': ['agent5'], 'inputs': ['Agent5_node{node}.json'], 'outputs': ['Agent6_node{node}.json']},
+    {'name': 'Charts', 'task': 'charts', 'after': ['Agent4'], 'when': ['agent4', 'charts'],
+     'inputs': ['Agent4_node{node}.json']},
+    {'name': '통합 결과', 'task': 'combine', 'after': ['Agent3', 'Agent4', 'Agent5'], 'when': ['node_agents'],
+     'inputs': ['Agent3_node{node}.json', 'Agent4_node{node}.json', 'Agent5_node{node}.json'],
+     'outputs': ['Agent3_all_nodes.txt', 'Agent4_all_nodes.txt', 'Agent5_all_nodes.txt']},
+    {'name': 'Agent6', 'agent': 6, 'script': "GPT4o HAZOP Table (Agent6).py", 'after': ['Agent6 조각'],
+     'inputs': ['Agent5_node{node}.json', 'Agent6_node{node}.json'], 'outputs': ['HAZOP_table.xlsx']},
+]
+
+PIPELINES = {'single': SINGLE_PIPELINE, 'all_nodes': ALL_NODES_PIPELINE}
+
+
+def _ancestors(steps_by_name, name, seen=None):
+    """단계의 모든 선행 단계 이름"""
+    seen = set() if seen is None else seen
+    for dep in steps_by_name[name].get('after', []):
+        if dep not in seen:
+            seen.add(dep)
+            _ancestors(steps_by_name, dep, seen)
+    return seen
+
+
+def validate_dag(steps):
+    """
+    DAG 정의 검증 (이름 중복, 없는 선행 단계, 순환, 실행 대상, 선행 단계가 만들지 않는 입력)
+
+    Raises:
+        ValueError: 정의 오류
+    """
+    steps_by_name = {}
+    for step in steps:
+        if step['name'] in steps_by_name:
+            raise ValueError(f"단계 이름 중복: {step['name']}")
+        if ('script' in step) == ('task' in step):
+            raise ValueError(f"{step['name']}: script와 task 중 하나만 지정해야 합니다")
+        steps_by_name[step['name']] = step
+
+    for step in steps:
+        for dep in step.get('after', []):
+            if dep not in steps_by_name:
+                raise ValueError(f"{step['name']}: 정의되지 않은 선행 단계 {dep}")
+    topological_order(steps)
+
+    producers = {}
+    for step in steps:
+        for output in step.get('outputs', []):
+            producers.setdefault(output, []).append(step['name'])
+    for step in steps:
+        ancestors = _ancestors(steps_by_name, step['name'])
+        for item in step.get('inputs', []):
+            names = producers.get(item, [])
+            if names and not ancestors.intersection(names):
+                raise ValueError(f"{step['name']}: 입력 {item}을 만드는 단계({', '.join(names)})가 선행 단계에 없습니다")
+    return steps_by_name
+
+
+def topological_order(steps):
+    """선언 순서를 유지한 위상 정렬 (순환이 있으면 ValueError)"""
+    remaining = [step['name'] for step in steps]
+    after = {step['name']: set(step.get('after', [])) for step in steps}
+    order = []
+    while remaining:
+        ready = [name for name in remaining if after[name] <= set(order)]
+        if not ready:
+            raise ValueError(f"단계 의존 관계에 순환이 있습니다: {', '.join(remaining)}")
+        order.append(ready[0])
+        remaining.remove(ready[0])
+    return order
+
+
+def critical_path(steps, durations):
+    """
+    단계 그래프의 가장 긴 경로 (노드별 단계는 한 노드 기준)
+
+    Args:
+        durations: {단계 이름: 예상 소요 시간(초)}
+
+    Returns:
+        (총 소요 시간, [단계 이름, ...])
+    """
+    steps_by_name = {step['name']: step for step in steps}
+    finish = {}
+    previous = {}
+    for name in topological_order(steps):
+        deps = steps_by_name[name].get('after', [])
+        start, previous[name] = max(((finish[dep], dep) for dep in deps), default=(0.0, None))
+        finish[name] = start + durations.get(name, 0.0)
+    if not finish:
+        return 0.0, []
+    name = max(finish, key=finish.get)
+    total, path = finish[name], []
+    while name:
+        path.append(name)
+        name = previous[name]
+    return total, path[::-1]
+
+
+class DAGScheduler:
+    """
+    DAG 단계 스케줄러 (선행 단계가 끝난 작업부터 스레드 풀에서 실행)
+
+    작업 = (단계 이름, 노드 번호 또는 None). 같은 시점에 실행 가능한 작업이 여럿이면 노드 번호, 선언 순서 순으로
+    시작하므로 max_workers=1이면 노드 하나의 Agent3~5를 끝낸 뒤 다음 노드로 넘어갑니다.
+    """
+
+    def __init__(self, steps, run_task, enabled=None, nodes_provider=None, max_workers=1, on_skip=None):
+        """
+        Args:
+            steps: 단계 정의 목록
+            run_task: (단계 정의, 노드 번호 또는 None) → 성공 여부
+            enabled: 단계 정의 → 실행 여부 (None이면 모두 실행)
+            nodes_provider: 노드별 단계를 펼칠 때 한 번 호출, 노드 번호 목록 반환
+            max_workers: 동시에 실행할 작업 수
+            on_skip: 선행 단계 실패로 건너뛴 작업마다 호출 (단계 정의, 노드 번호)
+        """
+        self.steps = validate_dag(steps)
+        self.priority = {step['name']: i for i, step in enumerate(steps)}
+        self.run_task = run_task
+        self.nodes_provider = nodes_provider
+        self.on_skip = on_skip
+        self.max_workers = max(1, max_workers)
+        enabled = enabled or (lambda step: True)
+        self.active = [step['name'] for step in steps if enabled(step)]
+        self.after = {name: self._effective_after(name) for name in self.active}
+
+        self.nodes = None
+        self.status = {}  # (단계, 노드) → SUCCESS, FAILED, SKIPPED, CANCELLED
+        self.timing = {}  # (단계, 노드) → (시작, 종료) monotonic 초
+        self.failed_critical = None
+
+    def _effective_after(self, name):
+        """실행하지 않는 선행 단계를 그 선행 단계로 대체한 의존 목록"""
+        result = []
+        for dep in self.steps[name].get('after', []):
+            for resolved in ([dep] if dep in self.active else self._effective_after(dep)):
+                if resolved not in result:
+                    result.append(resolved)
+        return result
+
+    def _fan_out(self, name):
+        return bool(self.steps[name].get('fan_out'))
+
+    def _dependencies(self, task):
+        """작업의 선행 작업 목록 [(작업, 같은 노드 연결 여부)] (노드가 아직 없으면 None)"""
+        name, node = task
+        deps = []
+        for dep in self.after[name]:
+            if not self._fan_out(dep):
+                deps.append(((dep, None), False))
+            elif node is not None:
+                deps.append(((dep, node), True))
+            elif self.nodes is None:
+                return None
+            else:
+                deps += [((dep, n), False) for n in self.nodes]
+        return deps
+
+    def _state(self, task):
+        """ready, wait, blocked 중 하나"""
+        deps = self._dependencies(task)
+        if deps is None:
+            return 'wait'
+        for dep, same_node in deps:
+            status = self.status.get(dep)
+            if status is None:
+                return 'wait'
+            if same_node and status != 'SUCCESS':
+                return 'blocked'
+        return 'ready'
+
+    def _expand_ready(self):
+        """노드별 단계를 펼칠 시점인지 (노드별 단계 앞의 일반 단계가 모두 끝났는지)"""
+        fan_out = [name for name in self.active if self._fan_out(name)]
+        if not fan_out or self.nodes is not None:
+            return False
+        before = set()
+        for name in fan_out:
+            before |= {dep for dep in _ancestors(self.steps, name) if dep in self.active and not self._fan_out(dep)}
+        return all((dep, None) in self.status for dep in before)
+
+    def _finish(self, task, status, started=None):
+        """작업 상태 기록 (스케줄러 스레드에서만 호출)"""
+        self.status[task] = status
+        if started is not None:
+            self.timing[task] = (started, time.monotonic())
+        if status != 'SUCCESS' and self.steps[task[0]].get('critical') and self.failed_critical is None:
+            self.failed_critical = task
+
+    def _execute(self, task):
+        started = time.monotonic()
+        try:
+            success = self.run_task(self.steps[task[0]], task[1])
+        except Exception as e:
+            print(f"[ERROR] {format_task(task)} 실행 중 예외: {e}")
+            success = False
+        return task, success, started
+
+    def run(self):
+        """
+        모든 단계 실행
+
+        Returns:
+            critical 단계가 모두 성공했으면 True
+        """
+        pending = [(name, None) for name in self.active if not self._fan_out(name)]
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                if self.failed_critical is None and self._expand_ready():
+                    self.nodes = list(self.nodes_provider() if self.nodes_provider else [])
+                    if not self.nodes:
+                        print("[ERROR] 노드가 없어 노드별 단계를 실행할 수 없습니다.")
+                        self.failed_critical = ('노드 추출', None)
+                    pending += [(name, node) for node in self.nodes
+                                for name in self.active if self._fan_out(name)]
+
+                if self.failed_critical is not None:
+                    for task in pending:
+                        self.status[task] = 'CANCELLED'
+                    pending = []
+
+                for task in sorted(pending, key=lambda t: (t[1] or 0, self.priority[t[0]])):
+                    state = self._state(task)
+                    if state == 'blocked':
+                        print(f"[SKIP] {format_task(task)} 건너뜀 (선행 단계 실패)")
+                        self._finish(task, 'SKIPPED')
+                        if self.on_skip:
+                            self.on_skip(self.steps[task[0]], task[1])
+                        pending.remove(task)
+                    elif state == 'ready' and len(running) < self.max_workers:
+                        running[executor.submit(self._execute, task)] = task
+                        pending.remove(task)
+
+                if not running:
+                    if pending:
+                        # 노드가 정해지지 않아 시작할 수 없는 작업 (노드별 단계 앞 단계 실패)
+                        for task in pending:
+                            self.status[task] = 'CANCELLED'
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    task, success, started = future.result()
+                    self._finish(task, 'SUCCESS' if success else 'FAILED', started)
+
+        return self.failed_critical is None
+
+    def critical_path(self):
+        """
+        실제 실행의 임계 경로 (마지막에 끝난 작업부터 가장 늦게 끝난 선행 작업을 거슬러 올라감)
+
+        Returns:
+            (경로 작업 소요 시간 합계(초, 동시 실행 수 제한으로 기다린 시간 제외), [(단계, 노드), ...])
+        """
+        if not self.timing:
+            return 0.0, []
+        task = max(self.timing, key=lambda t: self.timing[t][1])
+        path = []
+        while task is not None:
+            path.append(task)
+            deps = [dep for dep, _ in (self._dependencies(task) or []) if dep in self.timing]
+            task = max(deps, key=lambda t: self.timing[t][1], default=None)
+        path.reverse()
+        return sum(self.timing[t][1] - self.timing[t][0] for t in path), path
+
+    def print_critical_path(self):
+        """임계 경로 출력"""
+        total, path = self.critical_path()
+        if not path:
+            return
+        print(f"\n[INFO] 임계 경로 ({total:.1f}초): "
+              + ' → '.join(f"{format_task(task)} {self.timing[task][1] - self.timing[task][0]:.1f}초"
+                           for task in path))
+
+
+def format_task(task):
+    """작업 표시 이름 (예: 'Agent4 (Node 2)')"""
+    name, node = task
+    return f"{name} (Node {node})" if node is not None else name
+
+
+def main():
+    """메인 실행 함수: 단계 그래프와 최근 실행 기록 기준 예상 임계 경로 출력"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='통합 실행 단계 DAG 확인')
+    parser.add_argument('pipeline', nargs='?', choices=list(PIPELINES), default='all_nodes')
+    args = parser.parse_args()
+
+    steps = PIPELINES[args.pipeline]
+    validate_dag(steps)
+    print(f"\n{args.pipeline} 파이프라인 단계 ({len(steps)}개)")
+    for name in topological_order(steps):
+        step = next(s for s in steps if s['name'] == name)
+        kind = '노드별' if step.get('fan_out') else '전체'
+        print(f"  {name:<12} {kind:<4} ← {', '.join(step.get('after', [])) or '-'}")
+        if step.get('outputs'):
+            print(f"  {'':<12} {'':<4} → {', '.join(step['outputs'])}")
+
+    from run_registry import get_registry
+    registry = get_registry()
+    if registry is None:
+        return 0
+    stats = {row['agent']: row['avg_elapsed'] for row in registry.agent_latency_stats()}
+    if not stats:
+        print("\n[INFO] 실행 기록이 없어 임계 경로를 추정하지 않습니다.")
+        return 0
+    durations = {step['name']: stats.get(step.get('agent'), 0.0) or 0.0
+                 for step in steps if 'script' in step}
+    total, path = critical_path(steps, durations)
+    print(f"\n예상 임계 경로 (최근 실행 Agent별 평균, 노드 1개 기준): {total:.1f}초")
+    print('  ' + ' → '.join(f"{name} {durations.get(name, 0.0):.1f}초" for name in path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Agent 단계 프로파일링 (cProfile + tracemalloc)
+Agent 스크립트를 같은 프로세스에서 실행하면서 함수별 CPU 시간과 메모리 최대 사용량을 기록합니다.
+API 응답 대기(socket/ssl/select)와 sleep은 네트워크 대기로 따로 집계하여,
+로컬 처리(import, base64 인코딩, JSON 파싱, openpyxl, matplotlib 등) 병목만 보이도록 합니다.
+Agent4 변수 그룹, Agent3 일괄 처리, 중복 요청(hedge) 등 작업 스레드는 스레드마다 프로파일러를 두어 합산합니다
+(대기 시간은 스레드별 합계라 실행 시간보다 길 수 있음).
+
+사용 예:
+    python profile_agent.py run --output logs/profiles/x --name Agent3_node1 "GPT4o Parameter_Guideword (Agent3).py"
+    python profile_agent.py summary logs/profiles/20250101_120000
+    python main_integrated_all_nodes.py --profile   # 모든 단계를 프로파일링
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import pstats
+import runpy
+import cProfile
+import threading
+import tracemalloc
+
+
+# 네트워크/대기로 분류할 함수 (pstats 키의 파일명 또는 함수명에 포함된 문자열)
+WAIT_MARKERS = (
+    '_socket.', '_ssl.', 'select.', 'selectors.py', 'socket.py', 'ssl.py',
+    'time.sleep', '_thread.lock', '_queue.SimpleQueue',  # 스레드 풀 작업 대기
+)
+
+TOP_N = 30
+
+
+def _is_wait(func_key):
+    """pstats 함수 키 (파일명, 줄, 함수명)가 네트워크/대기인지 여부"""
+    filename, _, name = func_key
+    label = f"{filename}:{name}"
+    return any(marker in label for marker in WAIT_MARKERS)
+
+
+def _format_func(func_key):
+    """pstats 함수 키 → 읽기 쉬운 문자열"""
+    filename, line, name = func_key
+    if filename == '~':
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def hot_spots(stats, top=TOP_N):
+    """
+    로컬 처리 병목 (tottime 기준, 네트워크/대기 제외)
+
+    Returns:
+        (hot spot 리스트, 네트워크/대기 시간 합계)
+    """
+    wait_seconds = 0.0
+    rows = []
+    for func_key, (cc, nc, tottime, cumtime, _) in stats.stats.items():
+        if _is_wait(func_key):
+            wait_seconds += tottime
+            continue
+        rows.append({
+            'function': _format_func(func_key),
+            'calls': nc,
+            'tottime': round(tottime, 4),
+            'cumtime': round(cumtime, 4),
+        })
+    rows.sort(key=lambda r: r['tottime'], reverse=True)
+    return rows[:top], wait_seconds
+
+
+def _peak_rss_mb():
+    """프로세스 최대 RSS (MB), 지원하지 않는 OS면 None"""
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 byte 단위
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _profile_threads():
+    """
+    이후 시작되는 스레드마다 cProfile 프로파일러를 붙임 (cProfile은 호출한 스레드만 기록)
+
+    Returns:
+        (끝난 스레드의 프로파일러 리스트, 원래 Thread.run) - 끝나면 threading.Thread.run 복원 필요
+    """
+    profilers = []
+    lock = threading.Lock()
+    original_run = threading.Thread.run
+
+    def run(thread):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+는 프로파일러가 프로세스 전체에 하나 (이미 모든 스레드를 기록)
+            return original_run(thread)
+        try:
+            return original_run(thread)
+        finally:
+            profiler.disable()
+            with lock:
+                profilers.append(profiler)
+
+    threading.Thread.run = run
+    return profilers, original_run
+
+
+def profile_script(script_path, output_dir, step_name, script_args=None, trace_memory=True):
+    """
+    Agent 스크립트를 프로파일링하며 실행
+
+    Args:
+        script_path: Agent 스크립트 경로
+        output_dir: 프로파일 저장 디렉토리
+        step_name: 파일명에 사용할 단계 이름 (예: Agent3_node1)
+        script_args: 스크립트에 전달할 인자
+        trace_memory: tracemalloc으로 Python 메모리 최대 사용량 추적
+
+    Returns:
+        스크립트 종료 코드
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    sys.argv = [script_path] + list(script_args or [])
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script_path)))
+
+    if trace_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    exit_code = 0
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    thread_profilers, original_run = _profile_threads()
+    profiler.enable()
+    try:
+        runpy.run_path(script_path, run_name='__main__')
+    except SystemExit as e:
+        # Agent는 오류 시 exit(1)로 종료
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        profiler.disable()
+        threading.Thread.run = original_run
+        wall_seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+        traced_peak = None
+        if trace_memory:
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        profile_path = os.path.join(output_dir, f"{step_name}.prof")
+        stats = pstats.Stats(profiler)
+        for thread_profiler in list(thread_profilers):
+            stats.add(thread_profiler)
+        stats.dump_stats(profile_path)
+
+        top, wait_seconds = hot_spots(stats)
+        summary = {
+            'step': step_name,
+            'script': os.path.basename(script_path),
+            'exit_code': exit_code,
+            'wall_seconds': round(wall_seconds, 3),
+            'cpu_seconds': round(cpu_seconds, 3),
+            'wait_seconds': round(wait_seconds, 3),
+            'profiled_threads': 1 + len(thread_profilers),
+            'tracemalloc_peak_mb': round(traced_peak / (1024 * 1024), 2) if traced_peak is not None else None,
+            'peak_rss_mb': _peak_rss_mb(),
+            'hot_spots': top,
+        }
+        with open(os.path.join(output_dir, f"{step_name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    return exit_code
+
+
+def summarize_profiles(profile_dir, top=TOP_N):
+    """
+    한 실행의 모든 단계 프로파일을 합쳐 로컬 병목 요약 생성 (profile_summary.json)
+
+    Returns:
+        요약 딕셔너리 (프로파일이 없으면 None)
+    """
+    profile_paths = sorted(glob.glob(os.path.join(profile_dir, '*.prof')))
+    if not profile_paths:
+        return None
+
+    combined = pstats.Stats(profile_paths[0])
+    for path in profile_paths[1:]:
+        combined.add(path)
+    top_spots, wait_seconds = hot_spots(combined, top)
+
+    steps = []
+    for path in profile_paths:
+        step_json = os.path.splitext(path)[0] + '.json'
+        if os.path.exists(step_json):
+            with open(step_json, 'r', encoding='utf-8') as f:
+                step = json.load(f)
+            step.pop('hot_spots', None)
+            steps.append(step)
+
+    summary = {
+        'profile_dir': os.path.abspath(profile_dir),
+        'step_count': len(profile_paths),
+        'total_wall_seconds': round(sum(s['wall_seconds'] for s in steps), 3),
+        'total_cpu_seconds': round(sum(s['cpu_seconds'] for s in steps), 3),
+        'total_wait_seconds': round(wait_seconds, 3),
+        'steps': steps,
+        'hot_spots': top_spots,
+    }
+    with open(os.path.join(profile_dir, 'profile_summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def print_summary(summary, top=15):
+    """요약 콘솔 출력"""
+    print(f"\n{'='*60}")
+    print(f"  프로파일 요약 ({summary['step_count']}개 단계)")
+    print(f"{'='*60}")
+    print(f"  총 실행 시간: {summary['total_wall_seconds']:.2f}초 "
+          f"(CPU {summary['total_cpu_seconds']:.2f}초, 네트워크/대기 {summary['total_wait_seconds']:.2f}초)")
+
+    print("\n  단계별:")
+    for step in summary['steps']:
+        memory = f", 메모리 최대 {step['tracemalloc_peak_mb']}MB" if step.get('tracemalloc_peak_mb') is not None else ''
+        print(f"    {step['step']:<20} {step['wall_seconds']:>8.2f}초 "
+              f"(CPU {step['cpu_seconds']:.2f}초, 대기 {step['wait_seconds']:.2f}초{memory})")
+
+    print("\n  로컬 처리 병목 (tottime 기준, 네트워크/대기 제외):")
+    for spot in summary['hot_spots'][:top]:
+        print(f"    {spot['tottime']:>8.3f}초  {spot['calls']:>8}회  {spot['function']}")
+    print(f"\n  상세: {os.path.join(summary['profile_dir'], 'profile_summary.json')}")
+
+
+def main():
+    """메인 실행 함수"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Agent 단계 프로파일링')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Agent 스크립트를 프로파일링하며 실행')
+    run_parser.add_argument('--output', required=True, help='프로파일 저장 디렉토리')
+    run_parser.add_argument('--name', help='단계 이름 (기본값: 스크립트 파일명)')
+    run_parser.add_argument('--no-tracemalloc', action='store_true', help='메모리 추적 끄기 (오버헤드 감소)')
+    run_parser.add_argument('script', help='Agent 스크립트 경로')
+    run_parser.add_argument('script_args', nargs=argparse.REMAINDER)
+
+    summary_parser = subparsers.add_parser('summary', help='실행의 단계 프로파일 요약')
+    summary_parser.add_argument('profile_dir', help='프로파일 디렉토리 (logs/profiles/<실행>)')
+    summary_parser.add_argument('--top', type=int, default=TOP_N)
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        step_name = args.name or os.path.splitext(os.path.basename(args.script))[0]
+        return profile_script(args.script, args.output, step_name, args.script_args,
+                              trace_memory=not args.no_tracemalloc)
+
+    summary = summarize_profiles(args.profile_dir, args.top)
+    if summary is None:
+        print(f"[ERROR] 프로파일이 없습니다: {args.profile_dir}")
+        return 1
+    print_summary(summary, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
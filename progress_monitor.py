@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+HAZOP 통합 실행 진행 상황 모니터
+실행 중인 파이프라인의 이벤트 로그(logs/events_*.jsonl)를 추적하여
+진행 중인 (Agent, 노드) 단계, 처리량, 남은 단계 수, 예상 종료 시간(ETA)을
+터미널 화면과 로컬 HTTP JSON 엔드포인트(/status)로 제공합니다.
+
+ETA는 실행 이력 레지스트리의 Agent별 평균 소요 시간을 사용하고,
+이력이 없으면 현재 실행에서 관측한 평균을 사용합니다.
+
+사용 예:
+    python progress_monitor.py                       # 가장 최근 이벤트 로그 추적
+    python progress_monitor.py --port 8765           # + http://127.0.0.1:8765/status
+    python progress_monitor.py --log <events.jsonl> --no-ui
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import config
+from event_log import follow
+
+
+# 노드마다 반복 실행되는 Agent
+NODE_AGENTS = (3, 4, 5)
+
+# 진행 중 단계가 평균 소요 시간의 이 배수를 넘으면 정체로 표시
+STUCK_FACTOR = 3.0
+
+
+class ProgressTracker:
+    """이벤트 스트림으로 실행 진행 상태 계산 (스레드 안전)"""
+
+    def __init__(self, agent_averages=None):
+        # agent_averages: {agent 번호: 과거 평균 소요 시간(초)}
+        self.agent_averages = agent_averages or {}
+        self._lock = threading.Lock()
+        self.run_id = None
+        self.pipeline = None
+        self.agents = []
+        self.batched_agents = []  # 노드 단계지만 모든 노드에 대해 한 번만 실행되는 Agent
+        self.fallback_agents = []  # 일괄 결과에 없어 노드별로 다시 실행하는 단계의 Agent 번호 (노드마다 1개)
+        self.nodes = None
+        self.status = 'WAITING'
+        self.started_at = None
+        self.run_start_mono = None
+        self.last_mono = 0.0
+        self.in_flight = {}
+        self.completed = 0
+        self.skipped = 0  # 선행 단계 실패로 건너뛴 단계 (step_skipped)
+        self.finished_agents = {}  # {agent: 끝나거나 건너뛴 단계 수}
+        self.failed = []
+        self.observed = {}  # {agent: [합계, 건수]}
+
+    def handle(self, event):
+        """이벤트 1건 반영"""
+        with self._lock:
+            self.last_mono = event.get('mono', self.last_mono)
+            event_type = event.get('event')
+
+            if event_type == 'run_start':
+                self.run_id = event.get('run_id')
+                self.pipeline = event.get('pipeline')
+                self.agents = event.get('agents') or []
+                self.batched_agents = event.get('batched_agents') or []
+                self.status = 'RUNNING'
+                self.started_at = event.get('timestamp')
+                self.run_start_mono = event.get('mono', 0.0)
+            elif event_type == 'nodes_extracted':
+                self.nodes = event.get('nodes') or []
+            elif event_type == 'agent3_fallback':
+                self.fallback_agents += [3] * len(event.get('nodes') or [])
+            elif event_type == 'step_start':
+                key = (event.get('agent'), event.get('node'))
+                self.in_flight[key] = {
+                    'agent_name': event.get('agent_name'),
+                    'agent': event.get('agent'),
+                    'node': event.get('node'),
+                    'start_mono': event.get('mono', 0.0),
+                }
+            elif event_type == 'step_end':
+                agent = event.get('agent')
+                self.in_flight.pop((agent, event.get('node')), None)
+                if agent is None:
+                    return  # 그래프 후처리 등 Agent 단계가 아닌 이벤트
+                self.completed += 1
+                self.finished_agents[agent] = self.finished_agents.get(agent, 0) + 1
+                if event.get('status') != 'SUCCESS':
+                    self.failed.append(event.get('agent_name'))
+                if event.get('elapsed_time') is not None:
+                    total, count = self.observed.get(agent, (0.0, 0))
+                    self.observed[agent] = (total + event['elapsed_time'], count + 1)
+            elif event_type == 'step_skipped':
+                agent = event.get('agent')
+                self.skipped += 1
+                self.finished_agents[agent] = self.finished_agents.get(agent, 0) + 1
+            elif event_type == 'run_end':
+                self.status = event.get('status', 'FINISHED')
+                self.in_flight.clear()
+
+    def _planned_steps(self):
+        """전체 계획 단계 수 (노드 추출 전에는 노드 단계 수를 알 수 없어 None)"""
+        node_agents = [a for a in self.agents if a in NODE_AGENTS and a not in self.batched_agents]
+        single_agents = [a for a in self.agents if a not in node_agents]
+        if node_agents and self.pipeline == 'all_nodes':
+            if self.nodes is None:
+                return None
+            return len(single_agents) + len(node_agents) * len(self.nodes) + len(self.fallback_agents)
+        return len(self.agents) + len(self.fallback_agents)
+
+    def _remaining_agents(self):
+        """아직 시작하지 않은 단계의 Agent 번호 목록 (계획을 알 수 없으면 None)"""
+        planned = self._planned_steps()
+        if planned is None:
+            return None
+
+        if self.pipeline == 'all_nodes':
+            plan = [a for a in self.agents if a in (1, 2) or a in self.batched_agents]
+            for _ in self.nodes or []:
+                plan += [a for a in self.agents if a in NODE_AGENTS and a not in self.batched_agents]
+            plan += self.fallback_agents
+            plan += [a for a in self.agents if a == 6]
+        else:
+            plan = list(self.agents)
+
+        # Agent별로 끝났거나 건너뛰었거나 진행 중인 단계 수만큼 계획에서 제외 (노드가 겹쳐 실행되어도 맞도록)
+        started = dict(self.finished_agents)
+        for step in self.in_flight.values():
+            started[step['agent']] = started.get(step['agent'], 0) + 1
+        remaining = []
+        for agent in plan:
+            if started.get(agent, 0) > 0:
+                started[agent] -= 1
+            else:
+                remaining.append(agent)
+        return remaining
+
+    def average_for(self, agent):
+        """Agent 평균 소요 시간 (이력 → 현재 실행 관측값 → None)"""
+        if agent in self.agent_averages:
+            return self.agent_averages[agent]
+        total, count = self.observed.get(agent, (0.0, 0))
+        return total / count if count else None
+
+    def snapshot(self):
+        """현재 진행 상태 (JSON 직렬화 가능)"""
+        with self._lock:
+            now_mono = self._now_mono()
+            elapsed = now_mono - self.run_start_mono if self.run_start_mono is not None else 0.0
+
+            in_flight = []
+            eta = 0.0
+            eta_known = True
+            for step in self.in_flight.values():
+                running = now_mono - step['start_mono']
+                average = self.average_for(step['agent'])
+                in_flight.append({
+                    'agent_name': step['agent_name'],
+                    'agent': step['agent'],
+                    'node': step['node'],
+                    'running_seconds': round(running, 1),
+                    'expected_seconds': round(average, 1) if average else None,
+                    'stuck': bool(average and running > average * STUCK_FACTOR),
+                })
+                if average:
+                    eta += max(average - running, 0.0)
+                else:
+                    eta_known = False
+
+            remaining = self._remaining_agents()
+            if remaining is None:
+                eta_known = False
+            else:
+                for agent in remaining:
+                    average = self.average_for(agent)
+                    if average:
+                        eta += average
+                    else:
+                        eta_known = False
+
+            planned = self._planned_steps()
+            throughput = self.completed / (elapsed / 60.0) if elapsed > 0 else 0.0
+
+            return {
+                'run_id': self.run_id,
+                'pipeline': self.pipeline,
+                'status': self.status,
+                'started_at': self.started_at,
+                'elapsed_seconds': round(elapsed, 1),
+                'nodes': self.nodes,
+                'planned_steps': planned,
+                'completed_steps': self.completed,
+                'skipped_steps': self.skipped,
+                'failed_steps': list(self.failed),
+                'in_flight': in_flight,
+                'queue_depth': len(remaining) if remaining is not None else None,
+                'throughput_per_min': round(throughput, 2),
+                'eta_seconds': round(eta, 1) if eta_known and self.status == 'RUNNING' else None,
+                'eta_source': 'registry' if self.agent_averages else 'observed',
+            }
+
+    def _now_mono(self):
+        """
+        이벤트 로그 기준 현재 시간 (실행 중이 아니면 마지막 이벤트 시간)
+
+        모니터가 실행 도중에 붙어도 맞도록 run_start의 시각으로부터 경과한 벽시계 시간을 더합니다.
+        """
+        if self.status == 'RUNNING' and self.started_at:
+            since_start = (datetime.now() - datetime.fromisoformat(self.started_at)).total_seconds()
+            return max(self.run_start_mono + since_start, self.last_mono)
+        return self.last_mono
+
+
+def load_agent_averages(last_runs=30):
+    """실행 이력 레지스트리에서 Agent별 평균 소요 시간 조회"""
+    from run_registry import get_registry
+
+    registry = get_registry()
+    if registry is None:
+        return {}
+    try:
+        return {row['agent']: row['avg_elapsed'] for row in registry.agent_latency_stats(last_runs)
+                if row['agent'] is not None}
+    except Exception as e:
+        print(f"[WARNING] 실행 이력 조회 실패: {e}")
+        return {}
+    finally:
+        registry.close()
+
+
+def latest_event_log(log_dir=None):
+    """가장 최근 이벤트 로그 경로 (없으면 None)"""
+    log_dir = log_dir or os.path.join(config.BASE_DIRECTORY, 'logs')
+    candidates = glob.glob(os.path.join(log_dir, 'events_*.jsonl'))
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+def format_seconds(seconds):
+    """초 → 'H:MM:SS'"""
+    if seconds is None:
+        return '-'
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def render_status(status):
+    """터미널 표시용 문자열"""
+    planned = status['planned_steps'] if status['planned_steps'] is not None else '?'
+    lines = [
+        f"HAZOP 진행 상황  ({datetime.now().strftime('%H:%M:%S')})",
+        "=" * 60,
+        f"실행 ID : {status['run_id'] or '-'}  [{status['status']}]",
+        f"노드    : {status['nodes'] if status['nodes'] is not None else '(추출 전)'}",
+        f"진행    : {status['completed_steps']}/{planned} 단계 완료"
+        + (f", 건너뜀 {status['skipped_steps']}" if status['skipped_steps'] else '')
+        + f", 대기 {status['queue_depth'] if status['queue_depth'] is not None else '?'}",
+        f"처리량  : {status['throughput_per_min']:.2f} 단계/분",
+        f"경과    : {format_seconds(status['elapsed_seconds'])}   "
+        f"ETA: {format_seconds(status['eta_seconds'])} ({status['eta_source']})",
+        "-" * 60,
+        "진행 중:",
+    ]
+    if not status['in_flight']:
+        lines.append("  (없음)")
+    for step in status['in_flight']:
+        expected = format_seconds(step['expected_seconds']) if step['expected_seconds'] else '?'
+        flag = '  ⚠ 정체 의심' if step['stuck'] else ''
+        lines.append(f"  {step['agent_name']:<20} {format_seconds(step['running_seconds'])} / 예상 {expected}{flag}")
+    if status['failed_steps']:
+        lines.append("-" * 60)
+        lines.append(f"실패: {', '.join(status['failed_steps'])}")
+    return '\n'.join(lines)
+
+
+def start_status_server(tracker, port, host='127.0.0.1'):
+    """/status JSON 엔드포인트를 백그라운드 스레드로 시작, 서버 반환"""
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('', '/status'):
+                self.send_error(404)
+                return
+            body = json.dumps(tracker.snapshot(), ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # 요청마다 콘솔에 출력하지 않음
+
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_monitor(log_path, port=None, last_runs=30):
+    """
+    이벤트 로그 추적을 백그라운드 스레드로 시작 (파이프라인 내장용)
+
+    Returns:
+        (tracker, server) - port가 없으면 server는 None
+    """
+    tracker = ProgressTracker(load_agent_averages(last_runs))
+
+    def consume():
+        for event in follow(log_path):
+            tracker.handle(event)
+
+    threading.Thread(target=consume, daemon=True).start()
+    server = start_status_server(tracker, port) if port else None
+    return tracker, server
+
+
+def main():
+    """메인 실행 함수"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HAZOP 통합 실행 진행 상황 모니터')
+    parser.add_argument('--log', help='이벤트 로그 경로 (기본값: 가장 최근 logs/events_*.jsonl)')
+    parser.add_argument('--port', type=int, default=config.MONITOR_PORT,
+                        help='HTTP /status 포트 (0이면 비활성화, 기본값: MONITOR_PORT)')
+    parser.add_argument('--interval', type=float, default=2.0, help='화면 갱신 간격 (초)')
+    parser.add_argument('--runs', type=int, default=30, help='ETA 계산에 사용할 최근 실행 수')
+    parser.add_argument('--no-ui', action='store_true', help='터미널 화면 없이 HTTP만 제공')
+    args = parser.parse_args()
+
+    log_path = args.log or latest_event_log()
+    if not log_path:
+        print("[ERROR] 이벤트 로그를 찾을 수 없습니다. --log로 경로를 지정하세요.")
+        return 1
+
+    tracker, server = start_monitor(log_path, args.port, args.runs)
+    print(f"[INFO] 이벤트 로그 추적: {log_path}")
+    if server:
+        print(f"[INFO] 상태 엔드포인트: http://127.0.0.1:{args.port}/status")
+
+    try:
+        while True:
+            status = tracker.snapshot()
+            if not args.no_ui:
+                # ANSI: 화면 지우고 커서를 맨 위로
+                sys.stdout.write('\033[2J\033[H' + render_status(status) + '\n')
+                sys.stdout.flush()
+            if status['status'] not in ('WAITING', 'RUNNING'):
+                print(f"\n[INFO] 실행 종료: {status['status']}")
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server:
+            server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
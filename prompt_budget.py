@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+프롬프트 토큰 예산 (API 호출 전 크기 추정)
+API 호출 전에 입력/출력 토큰을 로컬에서 추정하여
+- 모델 context 한도를 넘는 요청은 보내기 전에 중단하고
+- 큰 섹션(CSV 시나리오, deviation 목록, Agent1 결과)은 예산에 맞게 압축/축소/분할합니다.
+
+토크나이저: tiktoken이 설치되어 있으면 사용, 없으면 문자 기반 근사
+(영문/숫자 4자당 1토큰, 한글 등 비ASCII 1자당 1토큰 → 실제보다 약간 크게 추정)
+이미지: OpenAI vision 타일 계산 (detail=high: 85 + 타일당 170)
+
+사용 예:
+    python prompt_budget.py ./output/공정요소.txt ./output/Agent4_node1.json   # 파일별 토큰 수
+"""
+
+import io
+import re
+import sys
+import json
+import math
+import base64
+import struct
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# 모델별 context 한도 (입력 + 출력), 접두어가 가장 긴 항목 사용
+MODEL_CONTEXT_LIMITS = {
+    'gpt-4o': 128000,
+    'gpt-4.1': 1047576,
+    'gpt-5': 400000,
+}
+DEFAULT_CONTEXT_LIMIT = 128000
+
+MESSAGE_OVERHEAD_TOKENS = 4  # 메시지당 role/구분자
+REPLY_PRIMING_TOKENS = 3
+IMAGE_FALLBACK_TOKENS = 1445  # 크기를 알 수 없는 이미지 (detail=high 최대 타일 수 기준)
+
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+_encoders = {}
+
+
+def _get_encoder(model):
+    """tiktoken 인코더 (설치되지 않았으면 None)"""
+    if tiktoken is None:
+        return None
+    if model not in _encoders:
+        try:
+            _encoders[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoders[model] = tiktoken.get_encoding('o200k_base')
+    return _encoders[model]
+
+
+def tokenizer_name():
+    """사용 중인 토큰 계산 방식"""
+    return 'tiktoken' if tiktoken is not None else 'heuristic'
+
+
+def count_text_tokens(text, model=None):
+    """텍스트 토큰 수"""
+    if not text:
+        return 0
+    encoder = _get_encoder(model or 'gpt-4o')
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    non_ascii = len(_NON_ASCII.findall(text))
+    return math.ceil((len(text) - non_ascii) / 4) + non_ascii
+
+
+def _image_size(data_url):
+    """data URL 이미지의 (가로, 세로), 알 수 없으면 None"""
+    encoded = data_url.split(',', 1)[-1]
+    try:
+        # PNG는 헤더(IHDR)만 디코딩
+        head = base64.b64decode(encoded[:44])
+        if head.startswith(b'\x89PNG') and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        from PIL import Image
+        with Image.open(io.BytesIO(base64.b64decode(encoded))) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def count_image_tokens(data_url, detail='high'):
+    """이미지 입력 토큰 수 (OpenAI vision 타일 계산)"""
+    if detail == 'low':
+        return 85
+    size = _image_size(data_url)
+    if size is None:
+        return IMAGE_FALLBACK_TOKENS
+
+    width, height = size
+    # 2048x2048 안으로 축소 후 짧은 변을 768로 축소
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+
+def context_limit(model):
+    """모델 context 한도"""
+    matches = [name for name in MODEL_CONTEXT_LIMITS if (model or '').startswith(name)]
+    return MODEL_CONTEXT_LIMITS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_LIMIT
+
+
+def estimate_payload_tokens(payload):
+    """
+    Chat Completions payload의 토큰 예산 추정
+
+    Returns:
+        {'text_tokens', 'image_tokens', 'input_tokens', 'max_output_tokens',
+         'context_limit', 'fits', 'tokenizer'} 딕셔너리
+    """
+    model = payload.get('model')
+    text_tokens = REPLY_PRIMING_TOKENS
+    image_tokens = 0
+    for message in payload.get('messages', []):
+        text_tokens += MESSAGE_OVERHEAD_TOKENS
+        content = message.get('content')
+        if isinstance(content, list):
+            for part in content:
+                if part.get('type') == 'text':
+                    text_tokens += count_text_tokens(part.get('text', ''), model)
+                elif part.get('type') == 'image_url':
+                    image_url = part.get('image_url', {})
+                    image_tokens += count_image_tokens(image_url.get('url', ''), image_url.get('detail', 'high'))
+        else:
+            text_tokens += count_text_tokens(content or '', model)
+
+    max_output = payload.get('max_completion_tokens') or payload.get('max_tokens') or 0
+    limit = context_limit(model)
+    input_tokens = text_tokens + image_tokens
+    return {
+        'text_tokens': text_tokens,
+        'image_tokens': image_tokens,
+        'input_tokens': input_tokens,
+        'max_output_tokens': max_output,
+        'context_limit': limit,
+        'fits': input_tokens + max_output <= limit,
+        'tokenizer': tokenizer_name(),
+    }
+
+
+def estimate_prompt_tokens(system_prompt, user_text, image_base64=None, model=None):
+    """system/user 프롬프트(+이미지) 입력 토큰 수 (payload 생성 전 섹션 크기 조정용)"""
+    tokens = REPLY_PRIMING_TOKENS + 2 * MESSAGE_OVERHEAD_TOKENS
+    tokens += count_text_tokens(system_prompt, model) + count_text_tokens(user_text, model)
+    if image_base64:
+        tokens += count_image_tokens(f"data:image/png;base64,{image_base64}")
+    return tokens
+
+
+# ========== 섹션 압축 / 분할 ==========
+
+def compact_json(data):
+    """공백 없는 JSON (들여쓰기 대비 토큰 절감)"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def compact_json_text(text):
+    """LLM 응답 텍스트의 JSON(```json 블록 포함)을 공백 없이 재작성, JSON이 아니면 그대로 반환"""
+    json_str = text.split("```json")[1].split("```")[0] if "```json" in text else text
+    try:
+        return compact_json(json.loads(json_str))
+    except (json.JSONDecodeError, ValueError):
+        return text
+
+
+def fit_items(items, render, max_tokens, model=None):
+    """
+    render(items[:n])가 max_tokens 이하가 되는 가장 긴 앞부분
+
+    Returns:
+        (남긴 항목 리스트, 제외된 항목 수)
+    """
+    if count_text_tokens(render(items), model) <= max_tokens:
+        return list(items), 0
+    low, high = 0, len(items)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_text_tokens(render(items[:middle]), model) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return list(items[:low]), len(items) - low
+
+
+def split_items(items, render, max_tokens, model=None):
+    """render(chunk)가 각각 max_tokens 이하가 되도록 순서대로 분할 (항목 하나가 넘으면 단독 chunk)"""
+    chunks = []
+    remaining = list(items)
+    while remaining:
+        chunk, _ = fit_items(remaining, render, max_tokens, model)
+        chunk = chunk or remaining[:1]
+        chunks.append(chunk)
+        remaining = remaining[len(chunk):]
+    return chunks
+
+
+def main():
+    """메인 실행 함수: 텍스트 파일 토큰 수 출력"""
+    if len(sys.argv) < 2:
+        print("사용법: python prompt_budget.py <파일> [파일 ...]")
+        return 1
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        compact = compact_json_text(text)
+        line = f"{path}: {count_text_tokens(text):,} tokens ({tokenizer_name()})"
+        if compact != text:
+            line += f", 공백 없는 JSON: {count_text_tokens(compact):,} tokens"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+프롬프트용 구조화 데이터 인코딩
+Agent 간 전달되는 레코드 목록(deviation 등)을 프롬프트에 넣을 때 토큰을 줄이는 표현으로 변환합니다.
+
+- indent: json.dumps(indent=2) (기존 방식)
+- minified: 공백 없는 JSON
+- table: 짧은 열 이름의 구분자(|) 표, 모든 행이 같은 값인 필드는 '공통' 항목으로 한 번만 표시
+
+내용(값)은 세 방식 모두 동일하며 표현만 다릅니다.
+
+사용 예:
+    python prompt_encoding.py ./output/Agent4_node1.json   # 방식별 토큰 수 비교
+"""
+
+import sys
+import json
+
+from prompt_budget import count_text_tokens, compact_json
+
+
+ENCODING_STYLES = ('indent', 'minified', 'table')
+
+# table 방식의 짧은 열 이름 (범례로 원래 필드명을 함께 제공)
+SHORT_KEYS = {
+    'deviation_id': 'id',
+    'parameter': 'param',
+    'guideword': 'gw',
+    'deviation': 'dev',
+    'description': 'desc',
+    'probability_score': 'score',
+    'causes': 'cause',
+    'consequences': 'conseq',
+    'safeguards': 'guard',
+    'recommendations': 'rec',
+    'severity': 'sev',
+}
+
+
+def _cell(value):
+    """표 셀 문자열 (리스트는 '; '로 연결, 구분자/줄바꿈 이스케이프)"""
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        value = '; '.join(str(v) for v in value)
+    elif isinstance(value, dict):
+        value = compact_json(value)
+    return str(value).replace('|', '\\|').replace('\n', ' ')
+
+
+def encode_table(records):
+    """레코드 목록 → 공통 필드 + 짧은 열 이름 표"""
+    if not records:
+        return '(없음)'
+
+    columns = []
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns.append(key)
+
+    first = records[0]
+    common = [key for key in columns
+              if len(records) > 1 and all(key in r and r[key] == first[key] for r in records)]
+    varying = [key for key in columns if key not in common]
+
+    lines = []
+    if common:
+        lines.append('공통 (모든 행 동일):')
+        lines += [f"- {key}: {_cell(first[key])}" for key in common]
+    legend = [f"{SHORT_KEYS[key]}={key}" for key in varying if key in SHORT_KEYS]
+    if legend:
+        lines.append('열: ' + ', '.join(legend))
+    lines.append('|'.join(SHORT_KEYS.get(key, key) for key in varying))
+    for record in records:
+        lines.append('|'.join(_cell(record.get(key)) for key in varying))
+    return '\n'.join(lines)
+
+
+def encode_records(records, style='table'):
+    """
+    레코드 목록을 프롬프트용 문자열로 변환
+
+    Args:
+        records: 딕셔너리 리스트
+        style: 'indent', 'minified', 'table'
+               (table은 딕셔너리가 아닌 항목이 있으면 minified로 대체)
+    """
+    if style not in ENCODING_STYLES:
+        raise ValueError(f"PROMPT_ENCODING은 {', '.join(ENCODING_STYLES)} 중 하나여야 합니다: {style}")
+    if style == 'indent':
+        return json.dumps(records, ensure_ascii=False, indent=2)
+    if style == 'table' and all(isinstance(r, dict) for r in records):
+        return encode_table(records)
+    return compact_json(records)
+
+
+def measure_encodings(records, model=None):
+    """방식별 토큰 수 {style: tokens}"""
+    return {style: count_text_tokens(encode_records(records, style), model) for style in ENCODING_STYLES}
+
+
+def main():
+    """메인 실행 함수: JSON 파일의 레코드 목록을 방식별로 인코딩하여 토큰 수 비교"""
+    if len(sys.argv) < 2:
+        print("사용법: python prompt_encoding.py <JSON 파일> [파일 ...]")
+        return 1
+
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # {"deviations": [...]} 형태면 첫 번째 리스트 필드 사용
+        if isinstance(data, dict):
+            key = next((k for k, v in data.items() if isinstance(v, list)), None)
+            if key is None:
+                print(f"[SKIP] 레코드 목록이 없습니다: {path}")
+                continue
+            records = data[key]
+        else:
+            key, records = None, data
+
+        counts = measure_encodings(records)
+        baseline = counts['indent']
+        print(f"\n{path}" + (f" ({key}, {len(records)}개)" if key else f" ({len(records)}개)"))
+        for style, tokens in counts.items():
+            saving = (1 - tokens / baseline) * 100 if baseline else 0
+            print(f"  {style:<9} {tokens:>8,} tokens  ({saving:.1f}% 절감)" if style != 'indent'
+                  else f"  {style:<9} {tokens:>8,} tokens  (기준)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
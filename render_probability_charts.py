@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Agent4 확률 그래프 일괄 생성 (후처리 단계)
+모든 노드의 Agent4_node*.json을 읽어 확률 분석 그래프를 한 프로세스에서 생성합니다.
+데이터 해시가 이전 생성과 같으면 다시 그리지 않습니다.
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from config import config
+
+
+MANIFEST_FILENAME = 'probability_charts.json'
+SUPPORTED_FORMATS = ('png', 'svg')
+
+
+def load_chart_data(json_path):
+    """Agent4 JSON에서 그래프 데이터 추출 (점수 있는 deviation만)"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        agent4_data = json.load(f)
+
+    node_id = agent4_data.get('node_id')
+    if node_id is None:
+        match = re.search(r'Agent4_node(\d+)\.json$', json_path)
+        node_id = int(match.group(1)) if match else 0
+
+    scored = [
+        dev for dev in agent4_data.get('deviations', [])
+        if isinstance(dev.get('probability_score'), int)
+    ]
+
+    return {
+        'node_id': node_id,
+        'node_name': agent4_data.get('node_name', ''),
+        'deviation_ids': [dev.get('deviation_id', i + 1) for i, dev in enumerate(scored)],
+        'scores': [dev['probability_score'] for dev in scored],
+    }
+
+
+def chart_data_hash(data, dpi, fmt):
+    """그래프 입력 데이터 + 렌더링 옵션의 해시"""
+    canonical = json.dumps({'data': data, 'dpi': dpi, 'format': fmt},
+                           ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def chart_filename(node_id, fmt):
+    """노드별 그래프 파일명"""
+    return f"Agent4_node{node_id}_probability_graph.{fmt}"
+
+
+def render_chart(data, output_path, dpi):
+    """확률 분석 그래프 1개 렌더링 (matplotlib은 이 함수에서만 import)"""
+    import matplotlib
+    matplotlib.use('Agg')  # GUI 없이 그래프 생성
+    import matplotlib.pyplot as plt
+    from matplotlib.lines import Line2D
+
+    # 한글 폰트 설정 (Windows)
+    plt.rcParams['font.family'] = 'Malgun Gothic'
+    plt.rcParams['axes.unicode_minus'] = False
+
+    prob_scores = data['scores']
+
+    # 누적 확률 계산 (정규화)
+    total_score = sum(prob_scores)
+    cumulative_probs = []
+    current_sum = 0
+    for score in prob_scores:
+        current_sum += score / total_score
+        cumulative_probs.append(current_sum)
+
+    # Figure 생성
+    fig, ax1 = plt.subplots(figsize=(14, 8), dpi=dpi)
+
+    # Bar plot (발생 가능성 점수)
+    color_primary = '#3776ab'
+    x_pos = range(len(prob_scores))
+    ax1.set_xlabel('Deviation Number', fontsize=12)
+    ax1.set_ylabel('Probability Score (1-10)', color=color_primary, fontsize=12)
+    bars = ax1.bar(x_pos, prob_scores, color=color_primary, alpha=0.7)
+    ax1.tick_params(axis='y', labelcolor=color_primary)
+    ax1.set_ylim(0, 10)
+    ax1.grid(axis='y', alpha=0.3)
+
+    # 막대 위에 점수 표시
+    for bar, score in zip(bars, prob_scores):
+        ax1.text(bar.get_x() + bar.get_width()/2., bar.get_height(),
+                 f'{score}',
+                 ha='center', va='bottom', fontsize=9)
+
+    # Cumulative probability (누적 확률)
+    ax2 = ax1.twinx()
+    color_secondary = '#ab373b'
+    ax2.set_ylabel('Cumulative Probability', color=color_secondary, fontsize=12)
+    ax2.plot(x_pos, cumulative_probs, color=color_secondary, marker='o', linewidth=2, markersize=6)
+    ax2.tick_params(axis='y', labelcolor=color_secondary)
+    ax2.set_ylim(0, 1.0)
+
+    # 제목 및 레이블
+    plt.title(f"Deviation Probability Analysis - Node {data['node_id']}: {data['node_name']}",
+              fontsize=14, fontweight='bold', pad=20)
+    ax1.set_xticks(x_pos)
+    ax1.set_xticklabels([str(dev_id) for dev_id in data['deviation_ids']], rotation=0)
+
+    # 범례
+    legend_elements = [
+        Line2D([0], [0], color=color_primary, lw=4, label='Probability Score'),
+        Line2D([0], [0], color=color_secondary, lw=4, label='Cumulative Probability')
+    ]
+    ax1.legend(handles=legend_elements, loc='upper left', fontsize=10)
+
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return output_path
+
+
+def _render_job(job):
+    """프로세스 풀 작업 단위: (data, output_path, dpi) → (output_path, 오류)"""
+    data, output_path, dpi = job
+    try:
+        render_chart(data, output_path, dpi)
+        return output_path, None
+    except Exception as e:
+        return output_path, str(e)
+
+
+def load_manifest(output_dir):
+    """이전 생성 해시 목록 로드"""
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    """생성 해시 목록 저장"""
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def render_all_charts(output_dir=None, dpi=None, fmt=None, workers=None, force=False):
+    """
+    모든 노드의 확률 그래프를 일괄 생성
+
+    Args:
+        output_dir: Agent4 JSON이 있는 디렉토리 (None이면 config.BASE_DIRECTORY)
+        dpi: 해상도 (None이면 config.CHART_DPI)
+        fmt: 'png' 또는 'svg' (None이면 config.CHART_FORMAT)
+        workers: 병렬 프로세스 수 (None이면 config.CHART_WORKERS)
+        force: True면 해시가 같아도 다시 생성
+
+    Returns:
+        {'rendered': [...], 'skipped': [...], 'failed': [...]}
+    """
+    output_dir = output_dir or config.BASE_DIRECTORY
+    dpi = dpi or config.CHART_DPI
+    fmt = (fmt or config.CHART_FORMAT).lower()
+    workers = workers or config.CHART_WORKERS
+
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"지원하지 않는 그래프 형식: {fmt} (png 또는 svg)")
+
+    summary = {'rendered': [], 'skipped': [], 'failed': []}
+    manifest = load_manifest(output_dir)
+
+    jobs = []
+    job_hashes = {}
+    for json_path in sorted(glob.glob(os.path.join(output_dir, 'Agent4_node*.json'))):
+        try:
+            data = load_chart_data(json_path)
+        except (IOError, json.JSONDecodeError) as e:
+            print(f"[WARNING] {os.path.basename(json_path)} 읽기 실패: {e}")
+            summary['failed'].append(json_path)
+            continue
+
+        if not data['scores']:
+            print(f"[SKIP] Node {data['node_id']}: probability_score 없음")
+            continue
+
+        filename = chart_filename(data['node_id'], fmt)
+        output_path = os.path.join(output_dir, filename)
+        data_hash = chart_data_hash(data, dpi, fmt)
+
+        if not force and manifest.get(filename) == data_hash and os.path.exists(output_path):
+            summary['skipped'].append(output_path)
+            continue
+
+        jobs.append((data, output_path, dpi))
+        job_hashes[output_path] = (filename, data_hash)
+
+    if jobs:
+        print(f"[INFO] 확률 그래프 생성: {len(jobs)}개 (변경 없음 {len(summary['skipped'])}개 건너뜀)")
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+                results = list(executor.map(_render_job, jobs))
+        else:
+            results = [_render_job(job) for job in jobs]
+
+        for output_path, error in results:
+            if error:
+                print(f"[WARNING] 그래프 생성 실패 ({os.path.basename(output_path)}): {error}")
+                summary['failed'].append(output_path)
+            else:
+                filename, data_hash = job_hashes[output_path]
+                manifest[filename] = data_hash
+                summary['rendered'].append(output_path)
+                print(f"[SUCCESS] 확률 그래프 저장: {output_path}")
+
+        save_manifest(output_dir, manifest)
+    else:
+        print(f"[INFO] 새로 생성할 확률 그래프 없음 (변경 없음 {len(summary['skipped'])}개)")
+
+    return summary
+
+
+def main():
+    """메인 실행 함수"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Agent4 확률 그래프 일괄 생성')
+    parser.add_argument('--dir', help='Agent4 JSON 디렉토리 (기본값: BASE_DIRECTORY)')
+    parser.add_argument('--dpi', type=int, help='해상도 (기본값: CHART_DPI)')
+    parser.add_argument('--format', choices=SUPPORTED_FORMATS, help='그래프 형식 (기본값: CHART_FORMAT)')
+    parser.add_argument('--workers', type=int, help='병렬 프로세스 수 (기본값: CHART_WORKERS)')
+    parser.add_argument('--force', action='store_true', help='변경 여부와 관계없이 다시 생성')
+    args = parser.parse_args()
+
+    summary = render_all_charts(args.dir, args.dpi, args.format, args.workers, args.force)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+"""
+HAZOP 실행 이력 레지스트리 (SQLite)
+실행(run), 단계(step), API 호출 텔레메트리, 산출물 해시, 품질 평가 점수를
+인덱스가 있는 로컬 SQLite DB에 기록하고 조회합니다.
+
+사용 예:
+    python run_registry.py runs
+    python run_registry.py slowest --agent 5 --runs 30
+    python run_registry.py calls --run <run_id>
+    python run_registry.py import-logs
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+
+from config import config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    pipeline TEXT,
+    started_at TEXT,
+    ended_at TEXT,
+    status TEXT,
+    total_elapsed REAL,
+    agents TEXT,
+    node_count INTEGER,
+    model TEXT,
+    base_directory TEXT
+);
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    agent INTEGER,
+    node_id INTEGER,
+    status TEXT,
+    started_at TEXT,
+    elapsed REAL,
+    message TEXT
+);
+CREATE TABLE IF NOT EXISTS api_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    agent INTEGER,
+    node_id INTEGER,
+    model TEXT,
+    started_at TEXT,
+    latency REAL,
+    status TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cached_tokens INTEGER,
+    error TEXT,
+    estimated_prompt_tokens INTEGER
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    filename TEXT,
+    sha256 TEXT,
+    size INTEGER,
+    recorded_at TEXT
+);
+CREATE TABLE IF NOT EXISTS evaluations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    result_dir TEXT,
+    agent TEXT,
+    total_score REAL,
+    evaluated_at TEXT,
+    report_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at);
+CREATE INDEX IF NOT EXISTS idx_steps_run ON steps(run_id);
+CREATE INDEX IF NOT EXISTS idx_steps_agent_elapsed ON steps(agent, elapsed);
+CREATE INDEX IF NOT EXISTS idx_calls_run ON api_calls(run_id);
+CREATE INDEX IF NOT EXISTS idx_calls_agent_latency ON api_calls(agent, latency);
+CREATE INDEX IF NOT EXISTS idx_artifacts_run_file ON artifacts(run_id, filename);
+CREATE INDEX IF NOT EXISTS idx_evaluations_run ON evaluations(run_id);
+CREATE INDEX IF NOT EXISTS idx_evaluations_dir ON evaluations(result_dir, evaluated_at);
+"""
+
+# 기존 DB에 추가할 컬럼 (테이블, 컬럼, 타입)
+MIGRATIONS = [
+    ('api_calls', 'estimated_prompt_tokens', 'INTEGER'),
+]
+
+# 레지스트리에 해시를 기록할 산출물 패턴
+ARTIFACT_PATTERNS = ['공정요소.*', 'Agent*.txt', 'Agent*.json', 'HAZOP_table.xlsx']
+
+# 오케스트레이터 로그의 agent 이름 ("Agent3 (Node 2)") 파싱
+AGENT_NAME_PATTERN = re.compile(r'Agent(\d+)(?:\s*\(Node\s+(\d+)\))?')
+
+
+def new_run_id():
+    """실행 ID 생성 (시간순 정렬 가능)"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def parse_agent_name(agent_name):
+    """'Agent3 (Node 2)' → (3, 2), 해석 불가 시 (None, None)"""
+    match = AGENT_NAME_PATTERN.search(str(agent_name or ''))
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2)) if match.group(2) else None
+
+
+class RunRegistry:
+    """SQLite 기반 실행 이력 레지스트리"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or config.RUN_REGISTRY_PATH
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # 여러 Agent 프로세스가 동시에 기록할 수 있도록 WAL 모드 사용
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        """이전 버전 DB에 없는 컬럼 추가"""
+        for table, column, column_type in MIGRATIONS:
+            columns = {row['name'] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def close(self):
+        """연결 종료"""
+        self.conn.close()
+
+    def _execute(self, sql, params=()):
+        """쓰기 쿼리 실행 (스레드 안전)"""
+        with self._lock:
+            cursor = self.conn.execute(sql, params)
+            self.conn.commit()
+            return cursor
+
+    def query(self, sql, params=()):
+        """읽기 쿼리 실행 → 딕셔너리 리스트"""
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    # ========== 기록 ==========
+
+    def start_run(self, pipeline, agents=None, run_id=None, started_at=None):
+        """실행 시작 기록, run_id 반환"""
+        run_id = run_id or new_run_id()
+        self._execute(
+            "INSERT OR REPLACE INTO runs (run_id, pipeline, started_at, status, agents, model, base_directory) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (run_id, pipeline, (started_at or datetime.now()).isoformat(), 'RUNNING',
+             json.dumps(agents or []), config.MODEL_NAME, os.path.abspath(config.BASE_DIRECTORY))
+        )
+        return run_id
+
+    def finish_run(self, run_id, status, total_elapsed=None, node_count=None):
+        """실행 종료 기록"""
+        self._execute(
+            "UPDATE runs SET ended_at = ?, status = ?, total_elapsed = ?, node_count = ? WHERE run_id = ?",
+            (datetime.now().isoformat(), status, total_elapsed, node_count, run_id)
+        )
+
+    def record_step(self, run_id, agent, node_id, status, elapsed, message='', started_at=None):
+        """Agent 단계 실행 결과 기록"""
+        self._execute(
+            "INSERT INTO steps (run_id, agent, node_id, status, started_at, elapsed, message) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (run_id, agent, node_id, status, (started_at or datetime.now()).isoformat(),
+             elapsed, (message or '')[:1000])
+        )
+
+    def record_api_call(self, run_id, agent, node_id, model, latency, status,
+                        usage=None, error=None, started_at=None, estimated_tokens=None):
+        """API 호출 텔레메트리 기록 (usage: OpenAI 응답의 usage 딕셔너리, estimated_tokens: 호출 전 입력 토큰 추정치)"""
+        usage = usage or {}
+        cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+        self._execute(
+            "INSERT INTO api_calls (run_id, agent, node_id, model, started_at, latency, status, "
+            "prompt_tokens, completion_tokens, cached_tokens, error, estimated_prompt_tokens) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, agent, node_id, model, (started_at or datetime.now()).isoformat(), latency,
+             status, usage.get('prompt_tokens'), usage.get('completion_tokens'), cached_tokens,
+             (error or '')[:1000] or None, estimated_tokens)
+        )
+
+    def record_artifacts(self, run_id, directory=None):
+        """출력 디렉토리의 산출물 해시 기록"""
+        from hazop_utils import compute_file_hash
+
+        directory = directory or config.BASE_DIRECTORY
+        recorded_at = datetime.now().isoformat()
+        rows = []
+        for pattern in ARTIFACT_PATTERNS:
+            for path in glob.glob(os.path.join(directory, pattern)):
+                if os.path.isfile(path):
+                    rows.append((run_id, os.path.basename(path), compute_file_hash(path),
+                                 os.path.getsize(path), recorded_at))
+
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO artifacts (run_id, filename, sha256, size, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+        return len(rows)
+
+    def record_evaluation(self, result_dir, evaluations, run_id=None, report_path=None):
+        """품질 평가 점수 기록 (HAZOPQualityEvaluator.evaluate_all 결과)"""
+        evaluated_at = datetime.now().isoformat()
+        rows = [
+            (run_id, os.path.abspath(result_dir), agent, result.get('total_score'), evaluated_at, report_path)
+            for agent, result in evaluations.items()
+            if isinstance(result, dict) and 'total_score' in result
+        ]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO evaluations (run_id, result_dir, agent, total_score, evaluated_at, report_path) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+
+    # ========== 조회 ==========
+
+    def recent_runs(self, limit=20):
+        """최근 실행 목록"""
+        return self.query(
+            "SELECT run_id, pipeline, started_at, status, total_elapsed, node_count, model "
+            "FROM runs ORDER BY started_at DESC LIMIT ?",
+            (limit,)
+        )
+
+    def slowest_steps(self, agent=None, last_runs=30, limit=10):
+        """최근 N개 실행 중 가장 느린 단계 (agent 지정 시 해당 Agent만)"""
+        sql = (
+            "SELECT s.run_id, s.agent, s.node_id, s.status, s.elapsed, s.started_at "
+            "FROM steps s "
+            "WHERE s.run_id IN (SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?)"
+        )
+        params = [last_runs]
+        if agent is not None:
+            sql += " AND s.agent = ?"
+            params.append(agent)
+        sql += " ORDER BY s.elapsed DESC LIMIT ?"
+        params.append(limit)
+        return self.query(sql, params)
+
+    def agent_latency_stats(self, last_runs=30):
+        """Agent별 단계 소요 시간 통계 (성공한 단계 기준)"""
+        return self.query(
+            "SELECT agent, COUNT(*) AS count, AVG(elapsed) AS avg_elapsed, "
+            "MIN(elapsed) AS min_elapsed, MAX(elapsed) AS max_elapsed "
+            "FROM steps "
+            "WHERE status = 'SUCCESS' "
+            "AND run_id IN (SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?) "
+            "GROUP BY agent ORDER BY agent",
+            (last_runs,)
+        )
+
+    def cache_stats(self, last_runs=30):
+        """Agent별 프롬프트 캐시 적중률 (최근 N개 실행의 성공 호출)"""
+        return self.query(
+            "SELECT agent, COUNT(*) AS calls, SUM(prompt_tokens) AS prompt_tokens, "
+            "SUM(cached_tokens) AS cached_tokens, "
+            "ROUND(100.0 * SUM(cached_tokens) / MAX(SUM(prompt_tokens), 1), 1) AS cached_pct, "
+            "ROUND(AVG(latency), 2) AS avg_latency "
+            "FROM api_calls WHERE status = 'SUCCESS' AND run_id IN "
+            "(SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?) "
+            "GROUP BY agent ORDER BY agent",
+            (last_runs,)
+        )
+
+    def api_latencies(self, agent, run_id=None, last_runs=30):
+        """Agent의 성공 호출 지연 시간 목록 (run_id 지정 시 해당 실행만, 아니면 최근 N개 실행)"""
+        sql = "SELECT latency FROM api_calls WHERE status = 'SUCCESS' AND agent IS ? AND latency IS NOT NULL"
+        params = [agent]
+        if run_id is not None:
+            sql += " AND run_id = ?"
+            params.append(run_id)
+        else:
+            sql += " AND run_id IN (SELECT run_id FROM runs ORDER BY started_at DESC LIMIT ?)"
+            params.append(last_runs)
+        return [row['latency'] for row in self.query(sql, params)]
+
+    def hedge_spend(self, run_id):
+        """실행의 중복 요청(HEDGE) 입력 토큰과 전체 입력 토큰 (추정치, 실제 사용량이 있으면 실제값)"""
+        rows = self.query(
+            "SELECT COALESCE(SUM(CASE WHEN status = 'HEDGE' THEN estimated_prompt_tokens END), 0) AS hedge_tokens, "
+            "COALESCE(SUM(CASE WHEN status IN ('SUCCESS', 'HEDGE') "
+            "THEN COALESCE(prompt_tokens, estimated_prompt_tokens) END), 0) AS total_tokens "
+            "FROM api_calls WHERE run_id = ?",
+            (run_id,)
+        )
+        return rows[0]['hedge_tokens'], rows[0]['total_tokens']
+
+    def latest_run_id(self, base_directory):
+        """해당 출력 디렉토리를 사용한 가장 최근 실행 ID (없으면 None)"""
+        rows = self.query(
+            "SELECT run_id FROM runs WHERE base_directory = ? ORDER BY started_at DESC LIMIT 1",
+            (os.path.abspath(base_directory),)
+        )
+        return rows[0]['run_id'] if rows else None
+
+    def run_calls(self, run_id):
+        """특정 실행의 API 호출 목록"""
+        return self.query(
+            "SELECT agent, node_id, model, started_at, latency, status, prompt_tokens, "
+            "completion_tokens, cached_tokens, error "
+            "FROM api_calls WHERE run_id = ? ORDER BY started_at",
+            (run_id,)
+        )
+
+    def run_budget(self, run_id):
+        """단계(Agent/노드)별 입력 토큰 추정치와 실제 사용량"""
+        return self.query(
+            "SELECT agent, node_id, COUNT(*) AS calls, SUM(estimated_prompt_tokens) AS estimated, "
+            "SUM(prompt_tokens) AS actual, SUM(cached_tokens) AS cached, "
+            "SUM(completion_tokens) AS completion "
+            "FROM api_calls WHERE run_id = ? GROUP BY agent, node_id ORDER BY agent, node_id",
+            (run_id,)
+        )
+
+    def artifact_changes(self, run_id1, run_id2):
+        """두 실행 간 해시가 다른 산출물 (한쪽 실행에만 있는 파일 포함)"""
+        return self.query(
+            "SELECT a.filename AS filename, a.sha256 AS sha256_1, b.sha256 AS sha256_2 "
+            "FROM (SELECT filename, sha256 FROM artifacts WHERE run_id = ?) a "
+            "LEFT JOIN (SELECT filename, sha256 FROM artifacts WHERE run_id = ?) b "
+            "ON a.filename = b.filename "
+            "WHERE b.sha256 IS NULL OR a.sha256 != b.sha256 "
+            "UNION ALL "
+            "SELECT b.filename AS filename, NULL AS sha256_1, b.sha256 AS sha256_2 "
+            "FROM (SELECT filename, sha256 FROM artifacts WHERE run_id = ?) b "
+            "LEFT JOIN (SELECT filename, sha256 FROM artifacts WHERE run_id = ?) a "
+            "ON a.filename = b.filename "
+            "WHERE a.filename IS NULL "
+            "ORDER BY filename",
+            (run_id1, run_id2, run_id2, run_id1)
+        )
+
+    # ========== 기존 로그 가져오기 ==========
+
+    def import_execution_log(self, log_path):
+        """logs/execution_log_*.json 파일 1개를 레지스트리로 가져오기"""
+        with open(log_path, 'r', encoding='utf-8') as f:
+            log_data = json.load(f)
+
+        # 레지스트리 활성화 상태에서 실행된 로그는 이미 기록되어 있음
+        if log_data.get('run_id') and self.query("SELECT 1 FROM runs WHERE run_id = ?", (log_data['run_id'],)):
+            return log_data['run_id']
+
+        pipeline = 'all_nodes' if 'nodes_processed' in log_data else 'single'
+        run_id = f"log_{os.path.splitext(os.path.basename(log_path))[0]}"
+        started_at = datetime.fromisoformat(log_data['start_time'])
+
+        # 이전 형식은 events 리스트, 현재 형식은 JSONL 이벤트 로그 경로(event_log)를 가짐
+        if log_data.get('event_log'):
+            from event_log import read_events
+            events = (e for e in read_events(log_data['event_log']) if e.get('event') == 'step_end')
+        else:
+            events = log_data.get('events', [])
+
+        self.start_run(pipeline, run_id=run_id, started_at=started_at)
+        failed = False
+        for event in events:
+            failed = failed or event.get('status') != 'SUCCESS'
+            agent, node_id = parse_agent_name(event.get('agent_name') or event.get('agent'))
+            if agent is None or event.get('elapsed_time') is None:
+                continue
+            self.record_step(run_id, agent, node_id, event.get('status'), event.get('elapsed_time'),
+                             event.get('message'), datetime.fromisoformat(event['timestamp']))
+
+        self._execute(
+            "UPDATE runs SET ended_at = ?, status = ?, total_elapsed = ?, node_count = ? WHERE run_id = ?",
+            (log_data.get('end_time'), 'FAILED' if failed else 'SUCCESS', log_data.get('total_elapsed'),
+             len(log_data.get('nodes_processed', [])) or None, run_id)
+        )
+        return run_id
+
+
+def get_registry():
+    """설정에 따라 레지스트리 반환 (비활성화 또는 열기 실패 시 None)"""
+    if not config.RUN_REGISTRY_ENABLED:
+        return None
+    try:
+        return RunRegistry()
+    except sqlite3.Error as e:
+        print(f"[WARNING] 실행 레지스트리 열기 실패: {e}")
+        return None
+
+
+def print_rows(rows):
+    """조회 결과를 표 형태로 출력"""
+    if not rows:
+        print("(결과 없음)")
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(_format_cell(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join('-' * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(_format_cell(row[c]).ljust(widths[c]) for c in columns))
+
+
+def _format_cell(value):
+    """표 셀 문자열 변환"""
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return '' if value is None else str(value)
+
+
+def main():
+    """메인 실행 함수"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HAZOP 실행 이력 레지스트리 조회')
+    parser.add_argument('--db', help='레지스트리 DB 경로 (기본값: RUN_REGISTRY_PATH)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    runs_parser = subparsers.add_parser('runs', help='최근 실행 목록')
+    runs_parser.add_argument('--limit', type=int, default=20)
+
+    slowest_parser = subparsers.add_parser('slowest', help='가장 느린 단계')
+    slowest_parser.add_argument('--agent', type=int, choices=[1, 2, 3, 4, 5, 6])
+    slowest_parser.add_argument('--runs', type=int, default=30, help='최근 N개 실행 대상')
+    slowest_parser.add_argument('--limit', type=int, default=10)
+
+    stats_parser = subparsers.add_parser('stats', help='Agent별 소요 시간 통계')
+    stats_parser.add_argument('--runs', type=int, default=30)
+
+    cache_parser = subparsers.add_parser('cache', help='Agent별 프롬프트 캐시 적중률')
+    cache_parser.add_argument('--runs', type=int, default=30)
+
+    calls_parser = subparsers.add_parser('calls', help='실행의 API 호출 목록')
+    calls_parser.add_argument('--run', required=True, help='run_id')
+
+    budget_parser = subparsers.add_parser('budget', help='단계별 입력 토큰 추정치와 실제 사용량')
+    budget_parser.add_argument('--run', required=True, help='run_id')
+
+    diff_parser = subparsers.add_parser('artifacts-diff', help='두 실행 간 변경된 산출물')
+    diff_parser.add_argument('run1')
+    diff_parser.add_argument('run2')
+
+    import_parser = subparsers.add_parser('import-logs', help='기존 execution_log JSON 가져오기')
+    import_parser.add_argument('--log-dir', help='로그 디렉토리 (기본값: BASE_DIRECTORY/logs)')
+
+    args = parser.parse_args()
+    registry = RunRegistry(args.db)
+
+    if args.command == 'runs':
+        print_rows(registry.recent_runs(args.limit))
+    elif args.command == 'slowest':
+        print_rows(registry.slowest_steps(args.agent, args.runs, args.limit))
+    elif args.command == 'stats':
+        print_rows(registry.agent_latency_stats(args.runs))
+    elif args.command == 'cache':
+        print_rows(registry.cache_stats(args.runs))
+    elif args.command == 'calls':
+        print_rows(registry.run_calls(args.run))
+    elif args.command == 'budget':
+        print_rows(registry.run_budget(args.run))
+    elif args.command == 'artifacts-diff':
+        print_rows(registry.artifact_changes(args.run1, args.run2))
+    elif args.command == 'import-logs':
+        log_dir = args.log_dir or os.path.join(config.BASE_DIRECTORY, 'logs')
+        log_files = sorted(glob.glob(os.path.join(log_dir, 'execution_log_*.json')))
+        for log_path in log_files:
+            try:
+                run_id = registry.import_execution_log(log_path)
+                print(f"[OK] {os.path.basename(log_path)} → {run_id}")
+            except (IOError, ValueError, KeyError) as e:
+                print(f"[WARNING] {os.path.basename(log_path)} 가져오기 실패: {e}")
+        print(f"[INFO] {len(log_files)}개 로그 처리 완료")
+
+    registry.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
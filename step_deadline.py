@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Agent 단계 마감 시간 (deadline 전파)
+오케스트레이터가 단계마다 Agent별 제한 시간(STEP_TIMEOUTS)으로 마감 시각을 정해 HAZOP_STEP_DEADLINE 환경변수로 넘기고,
+Agent의 API 호출은 남은 시간을 넘지 않는 timeout을 사용합니다.
+
+- 남은 시간이 STEP_DEADLINE_MARGIN초 미만이면 API 호출을 보내지 않고 바로 실패 (느린 단계는 빨리 실패)
+- 마감을 넘긴 서브프로세스는 먼저 종료 요청(SIGTERM)을 보내 출력이 저장되도록 하고,
+  STEP_KILL_GRACE초 안에 끝나지 않으면 강제 종료
+- 형식: STEP_TIMEOUTS="1=300,4=900" (Agent 번호=초, 없는 Agent는 STEP_TIMEOUT_DEFAULT, 0이면 제한 없음)
+
+사용 예:
+    python step_deadline.py   # 현재 Agent별 제한 시간 확인
+"""
+
+import os
+import sys
+import time
+import signal
+import subprocess
+
+from config import config
+
+
+DEADLINE_ENV = 'HAZOP_STEP_DEADLINE'  # 마감 시각 (epoch 초)
+
+AGENTS = [1, 2, 3, 4, 5, 6]
+
+
+def step_timeouts():
+    """Agent별 제한 시간 {Agent 번호: 초} (0이면 제한 없음)"""
+    timeouts = {agent: config.STEP_TIMEOUT_DEFAULT for agent in AGENTS}
+    for item in config.STEP_TIMEOUTS.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        agent, _, seconds = item.partition('=')
+        try:
+            timeouts[int(agent)] = float(seconds)
+        except ValueError:
+            print(f"[WARNING] STEP_TIMEOUTS 항목 무시 (형식: Agent번호=초): {item}")
+    return timeouts
+
+
+def step_timeout(agent_num):
+    """Agent 단계 제한 시간 (초, 제한 없으면 None)"""
+    seconds = step_timeouts().get(agent_num, config.STEP_TIMEOUT_DEFAULT)
+    return seconds if seconds > 0 else None
+
+
+def deadline_env(env, timeout):
+    """서브프로세스 환경변수에 마감 시각 설정 (timeout이 None이면 제거)"""
+    if timeout is None:
+        env.pop(DEADLINE_ENV, None)
+    else:
+        env[DEADLINE_ENV] = f"{time.time() + timeout:.3f}"
+    return env
+
+
+def remaining_seconds():
+    """현재 단계의 남은 시간 (초, 마감이 없으면 None)"""
+    value = os.environ.get(DEADLINE_ENV, '')
+    try:
+        return float(value) - time.time() if value else None
+    except ValueError:
+        return None
+
+
+def install_termination_handler():
+    """SIGTERM을 SystemExit로 바꿔 종료 요청 시에도 출력 버퍼와 finally 블록이 처리되도록 설정"""
+    def handle(signum, frame):
+        print(f"\n[ERROR] 단계 마감 시간 초과로 종료 요청을 받았습니다 (signal {signum})")
+        sys.exit(128 + signum)
+
+    if hasattr(signal, 'SIGTERM'):
+        try:
+            signal.signal(signal.SIGTERM, handle)
+        except ValueError:
+            pass  # 메인 스레드가 아니면 설치 불가
+
+
+def run_step(command, timeout, grace=None, **popen_args):
+    """
+    마감 시간이 있는 서브프로세스 실행
+
+    Args:
+        command: 실행 명령
+        timeout: 제한 시간 (초, None이면 제한 없음)
+        grace: 종료 요청 후 강제 종료까지 대기 시간 (None이면 config.STEP_KILL_GRACE)
+        popen_args: subprocess.Popen 인자 (cwd, env, text, encoding 등)
+
+    Returns:
+        (subprocess.CompletedProcess, 시간 초과 여부) - 시간 초과 시에도 그때까지의 출력 포함
+    """
+    grace = config.STEP_KILL_GRACE if grace is None else grace
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_args)
+    timed_out = False
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        process.terminate()
+        try:
+            stdout, stderr = process.communicate(timeout=grace)
+        except subprocess.TimeoutExpired:
+            print(f"[WARNING] 종료 요청 후 {grace:.0f}초 안에 끝나지 않아 강제 종료합니다")
+            process.kill()
+            stdout, stderr = process.communicate()
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr), timed_out
+
+
+def main():
+    """메인 실행 함수: Agent별 제한 시간 출력"""
+    print(f"\nAgent별 단계 제한 시간 (STEP_TIMEOUTS={config.STEP_TIMEOUTS or '-'}, "
+          f"기본값 {config.STEP_TIMEOUT_DEFAULT:.0f}초)")
+    for agent, seconds in sorted(step_timeouts().items()):
+        print(f"  Agent{agent}  {f'{seconds:.0f}초' if seconds > 0 else '제한 없음'}")
+    print(f"\nAPI 호출 여유 시간 {config.STEP_DEADLINE_MARGIN:.0f}초, 강제 종료 대기 {config.STEP_KILL_GRACE:.0f}초")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())